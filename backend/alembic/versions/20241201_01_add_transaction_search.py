@@ -0,0 +1,54 @@
+"""add_transaction_search
+
+Full-text and trigram search over transaction descriptions.
+
+Adds a stored ``search_vector`` tsvector column generated from
+``description`` plus two GIN indexes: one on the tsvector for ranked
+word search and one trigram index (pg_trgm) for partial and fuzzy matches.
+The indexes are built CONCURRENTLY so writes are not blocked while they build.
+
+Revision ID: 20241201_01
+Revises: 20241110_01
+Create Date: 2024-12-01
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20241201_01"
+down_revision = "20241110_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Generated columns are kept in sync by Postgres on every insert/update
+    op.execute(
+        "ALTER TABLE transactions ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS "
+        "(to_tsvector('english', coalesce(description, ''))) STORED"
+    )
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_search "
+            "ON transactions USING GIN (search_vector)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+            "ix_transactions_description_trgm "
+            "ON transactions USING GIN (description gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_transactions_description_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_transactions_search")
+    op.execute("ALTER TABLE transactions DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP EXTENSION IF EXISTS pg_trgm")
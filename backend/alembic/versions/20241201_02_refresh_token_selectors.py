@@ -0,0 +1,57 @@
+"""refresh_token_selectors
+
+Switch refresh tokens to a selector/verifier scheme.
+
+Adds an indexed ``refresh_token_selector`` column for lookup and a
+``replaced_by_id`` link for rotation/reuse detection. The old index on
+``refresh_token_hash`` is dropped: bcrypt hashes are salted, so it could
+never be used for lookup. Existing bcrypt-hashed sessions cannot be
+verified under the new scheme and are revoked (users simply log in again).
+
+Revision ID: 20241201_02
+Revises: 20241201_01
+Create Date: 2024-12-01
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+# revision identifiers, used by Alembic.
+revision = "20241201_02"
+down_revision = "20241201_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("sessions", sa.Column("refresh_token_selector", sa.Text()))
+    op.add_column(
+        "sessions",
+        sa.Column(
+            "replaced_by_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("sessions.id", ondelete="SET NULL"),
+        ),
+    )
+    op.create_index(
+        "ix_sessions_refresh_token_selector",
+        "sessions",
+        ["refresh_token_selector"],
+        unique=True,
+    )
+    op.drop_index("ix_sessions_refresh_hash", table_name="sessions")
+
+    op.execute(
+        "UPDATE sessions SET revoked_at = now() "
+        "WHERE refresh_token_selector IS NULL AND revoked_at IS NULL"
+    )
+
+
+def downgrade():
+    op.create_index("ix_sessions_refresh_hash", "sessions", ["refresh_token_hash"])
+    op.drop_index("ix_sessions_refresh_token_selector", table_name="sessions")
+    op.drop_column("sessions", "replaced_by_id")
+    op.drop_column("sessions", "refresh_token_selector")
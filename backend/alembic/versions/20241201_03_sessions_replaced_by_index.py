@@ -0,0 +1,37 @@
+"""sessions_replaced_by_index
+
+Index ``sessions.replaced_by_id``.
+
+The self-referencing foreign key is ``ON DELETE SET NULL``, so deleting a
+session makes Postgres look for rows pointing at it. Without an index that
+is a sequential scan per deleted row, which made batched purges of expired
+sessions take seconds per batch. The index is partial (only rotated sessions
+have a value) and built CONCURRENTLY.
+
+Revision ID: 20241201_03
+Revises: 20241201_02
+Create Date: 2024-12-01
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20241201_03"
+down_revision = "20241201_02"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sessions_replaced_by_id "
+            "ON sessions (replaced_by_id) WHERE replaced_by_id IS NOT NULL"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_sessions_replaced_by_id")
@@ -0,0 +1,46 @@
+"""users_email_lower_index
+
+Case-insensitive email lookups through an index.
+
+Login, registration and password reset looked users up with
+``email ILIKE :email``, which cannot use a btree index and so scanned the
+whole ``users`` table. They now compare ``lower(email) = lower(:email)``,
+backed by a unique functional index that also makes emails unique
+regardless of case. The plain ``ix_users_email`` index duplicated the
+``users_email_key`` unique constraint and is dropped.
+
+Building the index fails if two accounts differ only by case; merge or
+rename them first. Both indexes are changed CONCURRENTLY.
+
+Revision ID: 20241202_01
+Revises: 20241201_03
+Create Date: 2024-12-02
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20241202_01"
+down_revision = "20241201_03"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_lower "
+            "ON users (lower(email))"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email "
+            "ON users (email)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email_lower")
@@ -0,0 +1,160 @@
+"""partition_transactions
+
+Range-partition ``transactions`` by month on ``occurred_at``.
+
+The table is rebuilt as ``PARTITION BY RANGE (occurred_at)`` with one
+partition per month (``transactions_yYYYYmMM``) from the oldest row up to a
+few months ahead, plus a ``transactions_default`` partition that catches
+anything outside those ranges. Date-bounded queries then only touch the
+partitions they need, and old months can be detached and archived (see
+``app.partitions``), which also keeps vacuum and index maintenance small.
+
+Postgres requires the partition key in every unique constraint, so the
+primary key becomes ``(id, occurred_at)``. All indexes, the generated
+``search_vector`` column and the foreign keys are recreated on the parent.
+
+The rows are copied while ``transactions`` is locked, so run this in a
+maintenance window. Future partitions are created by the app's scheduled
+partition maintenance (``python -m app.partitions ensure``).
+
+Revision ID: 20241203_01
+Revises: 20241202_01
+Create Date: 2024-12-03
+
+"""
+
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20241203_01"
+down_revision = "20241202_01"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = (
+    "id, user_id, category_id, type, amount_cents, occurred_at, "
+    "description, receipt_url, metadata, created_at"
+)
+
+CREATE_TABLE = """
+    CREATE TABLE transactions (
+        id uuid NOT NULL DEFAULT gen_random_uuid(),
+        user_id uuid NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        category_id uuid REFERENCES categories (id) ON DELETE SET NULL,
+        type varchar NOT NULL,
+        amount_cents integer NOT NULL,
+        occurred_at timestamptz NOT NULL,
+        description text,
+        receipt_url text,
+        metadata jsonb,
+        created_at timestamptz NOT NULL DEFAULT now(),
+        search_vector tsvector GENERATED ALWAYS AS
+            (to_tsvector('english', coalesce(description, ''))) STORED,
+        CONSTRAINT transactions_pkey PRIMARY KEY ({pk}),
+        CONSTRAINT transactions_type_check CHECK (type IN ('income', 'expense'))
+    ){partition_by}
+"""
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes():
+    op.execute("CREATE INDEX ix_transactions_user_id ON transactions (user_id)")
+    op.execute(
+        "CREATE INDEX ix_transactions_user_occurred "
+        "ON transactions (user_id, occurred_at)"
+    )
+    op.execute(
+        "CREATE INDEX ix_transactions_user_category "
+        "ON transactions (user_id, category_id, occurred_at)"
+    )
+    op.execute(
+        "CREATE INDEX ix_transactions_user_type "
+        "ON transactions (user_id, type, occurred_at)"
+    )
+    op.execute(
+        "CREATE INDEX ix_transactions_metadata ON transactions USING GIN (metadata)"
+    )
+    op.execute(
+        "CREATE INDEX ix_transactions_search ON transactions USING GIN (search_vector)"
+    )
+    op.execute(
+        "CREATE INDEX ix_transactions_description_trgm "
+        "ON transactions USING GIN (description gin_trgm_ops)"
+    )
+
+
+def upgrade():
+    op.execute("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE transactions RENAME TO transactions_unpartitioned")
+    op.execute(
+        "ALTER INDEX transactions_pkey RENAME TO transactions_unpartitioned_pkey"
+    )
+
+    op.execute(
+        CREATE_TABLE.format(
+            pk="id, occurred_at", partition_by=" PARTITION BY RANGE (occurred_at)"
+        )
+    )
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    oldest = (
+        op.get_bind()
+        .execute(sa.text("SELECT min(occurred_at) FROM transactions_unpartitioned"))
+        .scalar()
+    )
+    today = date.today().replace(day=1)
+    month = min(oldest.date().replace(day=1), today) if oldest else today
+    while month <= _add_months(today, MONTHS_AHEAD):
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE transactions_y{month.year}m{month.month:02d} "
+            f"PARTITION OF transactions FOR VALUES "
+            f"FROM ('{month.isoformat()} 00:00+00') "
+            f"TO ('{following.isoformat()} 00:00+00')"
+        )
+        month = following
+
+    # Copy before indexing: building indexes once is faster than maintaining them
+    op.execute(
+        f"INSERT INTO transactions ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM transactions_unpartitioned"
+    )
+    op.execute("DROP TABLE transactions_unpartitioned")
+    _create_indexes()
+    op.execute("ANALYZE transactions")
+
+
+def downgrade():
+    op.execute("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+    op.execute("ALTER INDEX transactions_pkey RENAME TO transactions_partitioned_pkey")
+    for name in (
+        "ix_transactions_user_id",
+        "ix_transactions_user_occurred",
+        "ix_transactions_user_category",
+        "ix_transactions_user_type",
+        "ix_transactions_metadata",
+        "ix_transactions_search",
+        "ix_transactions_description_trgm",
+    ):
+        op.execute(f"DROP INDEX {name}")
+
+    op.execute(CREATE_TABLE.format(pk="id", partition_by=""))
+    op.execute(
+        f"INSERT INTO transactions ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM transactions_partitioned"
+    )
+    # Dropping the parent drops every attached partition
+    op.execute("DROP TABLE transactions_partitioned")
+    _create_indexes()
+    op.execute("ANALYZE transactions")
@@ -0,0 +1,79 @@
+"""transaction_covering_indexes
+
+Indexes for the transaction query shapes flagged by ``app.index_advisor``.
+
+* ``ix_transactions_user_occurred_covering``: ``(user_id, occurred_at)``
+  INCLUDE ``(type, category_id, amount_cents, id)``. It replaces
+  ``ix_transactions_user_occurred`` with the same key and lets the per-user
+  category and period aggregates run as index-only scans.
+* ``ix_transactions_user_amount``: ``(user_id, amount_cents)`` for listing
+  with ``sort_by=amount_cents`` and amount range filters without a sort.
+* ``ix_transactions_occurred_at``: ``(occurred_at)`` for the admin listing,
+  which has no user filter.
+
+``CREATE INDEX CONCURRENTLY`` is not supported on a partitioned table, so
+each index is created on the parent only (invalid until complete), built
+CONCURRENTLY on every partition and attached partition by partition.
+
+Revision ID: 20241204_01
+Revises: 20241203_01
+Create Date: 2024-12-04
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20241204_01"
+down_revision = "20241203_01"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_transactions_user_occurred_covering": (
+        "(user_id, occurred_at) INCLUDE (type, category_id, amount_cents, id)"
+    ),
+    "ix_transactions_user_amount": "(user_id, amount_cents)",
+    "ix_transactions_occurred_at": "(occurred_at)",
+}
+
+
+def _partitions():
+    rows = op.get_bind().execute(
+        sa.text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'transactions'::regclass"
+        )
+    )
+    return [r[0] for r in rows]
+
+
+def _create_partitioned_index(name, definition):
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY transactions {definition}")
+    for partition in _partitions():
+        child = f"{partition}_{name.removeprefix('ix_transactions_')}_idx"
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} "
+            f"ON {partition} {definition}"
+        )
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            _create_partitioned_index(name, definition)
+    # Same key as the covering index; dropping cascades to the partitions
+    op.execute("DROP INDEX IF EXISTS ix_transactions_user_occurred")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        _create_partitioned_index(
+            "ix_transactions_user_occurred", "(user_id, occurred_at)"
+        )
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
@@ -0,0 +1,82 @@
+"""category_monthly_totals
+
+Rollup table for the threshold alert engine (``app.alerts``).
+
+* ``category_monthly_totals`` holds one row per (user, category, UTC month,
+  type), kept in step with ``transactions`` by ``app.rollups``. The unique
+  key is NULLS NOT DISTINCT so uncategorized transactions share one row per
+  month. Existing transactions are backfilled.
+* ``notification_events.dedupe_key`` lets an alert be queued once per
+  threshold, month and channel.
+
+Revision ID: 20241205_01
+Revises: 20241204_01
+Create Date: 2024-12-05
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "20241205_01"
+down_revision = "20241204_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "category_monthly_totals",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "category_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("categories.id", ondelete="CASCADE"),
+        ),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("total_cents", sa.BigInteger(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint(
+            "user_id",
+            "category_id",
+            "month",
+            "type",
+            name="uq_category_monthly_totals_key",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+    op.execute(
+        """
+        INSERT INTO category_monthly_totals
+            (id, user_id, category_id, month, type, total_cents, count)
+        SELECT gen_random_uuid(), user_id, category_id,
+               date_trunc('month', occurred_at AT TIME ZONE 'UTC')::date,
+               type, sum(amount_cents), count(*)
+        FROM transactions
+        GROUP BY user_id, category_id,
+                 date_trunc('month', occurred_at AT TIME ZONE 'UTC')::date, type
+        """
+    )
+
+    op.add_column("notification_events", sa.Column("dedupe_key", sa.Text()))
+    op.create_unique_constraint(
+        "notification_events_dedupe_key_key", "notification_events", ["dedupe_key"]
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        "notification_events_dedupe_key_key", "notification_events", type_="unique"
+    )
+    op.drop_column("notification_events", "dedupe_key")
+    op.drop_table("category_monthly_totals")
@@ -0,0 +1,60 @@
+"""notification_outbox
+
+Delivery bookkeeping for the notification outbox worker (``app.outbox``).
+
+* ``notification_events.attempts``, ``next_attempt_at`` and ``last_error``
+  drive retries with backoff, quiet-hour deferrals and claim leases.
+* ``ix_notification_events_due`` is a partial index on ``next_attempt_at``
+  over queued events only, which is all the claim query reads. It is built
+  CONCURRENTLY.
+* ``notification_preferences.sms_number`` is where SMS alerts go.
+
+Revision ID: 20241206_01
+Revises: 20241205_01
+Create Date: 2024-12-06
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20241206_01"
+down_revision = "20241205_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "notification_events",
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "notification_events",
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.add_column("notification_events", sa.Column("last_error", sa.Text()))
+    op.add_column(
+        "notification_preferences", sa.Column("sms_number", sa.String(length=32))
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notification_events_due "
+            "ON notification_events (next_attempt_at) WHERE status = 'queued'"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notification_events_due")
+    op.drop_column("notification_preferences", "sms_number")
+    op.drop_column("notification_events", "last_error")
+    op.drop_column("notification_events", "next_attempt_at")
+    op.drop_column("notification_events", "attempts")
@@ -0,0 +1,42 @@
+"""digest_runs
+
+Checkpoint table for the weekly digest job (``app.digests``): one row per
+week recording the last user whose digest was queued, so an interrupted
+run resumes where it stopped.
+
+Revision ID: 20241207_01
+Revises: 20241206_01
+Create Date: 2024-12-07
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "20241207_01"
+down_revision = "20241206_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "digest_runs",
+        sa.Column("week", sa.Date(), primary_key=True),
+        sa.Column("last_user_id", postgresql.UUID(as_uuid=True)),
+        sa.Column("events", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "started_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    op.drop_table("digest_runs")
@@ -0,0 +1,122 @@
+"""delta_sync
+
+Bookkeeping for ``GET /api/sync`` (``app.sync``):
+
+* ``change_xid`` on ``transactions`` and ``categories``, stamped by a
+  BEFORE INSERT OR UPDATE trigger with the writing transaction's ID. The
+  column is nullable with no default, so adding it does not rewrite the
+  tables; existing rows stay NULL and only appear in full syncs.
+* ``sync_tombstones``, written by an AFTER DELETE trigger.
+* ``(user_id, change_xid)`` indexes, built CONCURRENTLY (per partition for
+  ``transactions``, as in 20241204_01).
+
+Revision ID: 20241208_01
+Revises: 20241207_01
+Create Date: 2024-12-08
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "20241208_01"
+down_revision = "20241207_01"
+branch_labels = None
+depends_on = None
+
+TABLES = {"categories": "category", "transactions": "transaction"}
+
+SYNC_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION sync_stamp_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END $$;
+
+CREATE OR REPLACE FUNCTION sync_record_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sync_tombstones (user_id, entity, entity_id, change_xid)
+    VALUES (OLD.user_id, TG_ARGV[0], OLD.id, pg_current_xact_id()::text::bigint);
+    RETURN NULL;
+END $$;
+"""
+SYNC_TRIGGERS = """
+CREATE TRIGGER {table}_sync_stamp BEFORE INSERT OR UPDATE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION sync_stamp_change();
+CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION sync_record_delete('{entity}');
+"""
+
+
+def _partitions():
+    rows = op.get_bind().execute(
+        sa.text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'transactions'::regclass"
+        )
+    )
+    return [r[0] for r in rows]
+
+
+def upgrade():
+    op.create_table(
+        "sync_tombstones",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("entity", sa.Text(), nullable=False),
+        sa.Column("entity_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("change_xid", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "deleted_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+        ),
+    )
+    op.create_index(
+        "ix_sync_tombstones_user_change", "sync_tombstones", ["user_id", "change_xid"]
+    )
+    op.create_index("ix_sync_tombstones_deleted_at", "sync_tombstones", ["deleted_at"])
+
+    op.execute(SYNC_FUNCTIONS)
+    for table, entity in TABLES.items():
+        op.add_column(table, sa.Column("change_xid", sa.BigInteger()))
+        op.execute(SYNC_TRIGGERS.format(table=table, entity=entity))
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_categories_user_change "
+            "ON categories (user_id, change_xid)"
+        )
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_transactions_user_change "
+            "ON ONLY transactions (user_id, change_xid)"
+        )
+        for partition in _partitions():
+            child = f"{partition}_user_change_idx"
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} "
+                f"ON {partition} (user_id, change_xid)"
+            )
+            op.execute(
+                f"ALTER INDEX ix_transactions_user_change ATTACH PARTITION {child}"
+            )
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_stamp ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_tombstone ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS sync_stamp_change()")
+    op.execute("DROP FUNCTION IF EXISTS sync_record_delete()")
+    op.execute("DROP INDEX IF EXISTS ix_transactions_user_change")
+    op.execute("DROP INDEX IF EXISTS ix_categories_user_change")
+    for table in TABLES:
+        op.drop_column(table, "change_xid")
+    op.drop_table("sync_tombstones")
@@ -0,0 +1,46 @@
+"""idempotency_keys
+
+Stored responses for writes sent with an ``Idempotency-Key`` header
+(``app.idempotency``), keyed by ``(user_id, key)`` and purged after
+``expires_at``.
+
+Revision ID: 20241209_01
+Revises: 20241208_01
+Create Date: 2024-12-09
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "20241209_01"
+down_revision = "20241208_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "idempotency_keys",
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("request_hash", sa.String(64), nullable=False),
+        sa.Column("status_code", sa.SmallInteger()),
+        sa.Column("response", postgresql.JSONB()),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index(
+        "ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"]
+    )
+
+
+def downgrade():
+    op.drop_table("idempotency_keys")
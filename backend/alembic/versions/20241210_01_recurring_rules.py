@@ -0,0 +1,131 @@
+"""recurring_rules
+
+Recurring transactions (``app.recurrence``):
+
+* ``recurring_rules``: a transaction template, an RRULE-like schedule and
+  the high-water mark of occurrences already created.
+* ``transactions.recurring_rule_id``, nullable with no default so adding it
+  does not rewrite the table.
+* A unique ``(recurring_rule_id, occurred_at)`` index so an occurrence is
+  never created twice, built CONCURRENTLY per partition (as in 20241204_01).
+
+Revision ID: 20241210_01
+Revises: 20241209_01
+Create Date: 2024-12-10
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "20241210_01"
+down_revision = "20241209_01"
+branch_labels = None
+depends_on = None
+
+
+def _partitions():
+    rows = op.get_bind().execute(
+        sa.text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'transactions'::regclass"
+        )
+    )
+    return [r[0] for r in rows]
+
+
+def upgrade():
+    op.create_table(
+        "recurring_rules",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "category_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("categories.id", ondelete="SET NULL"),
+        ),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("amount_cents", sa.Integer(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("metadata", postgresql.JSONB()),
+        sa.Column("freq", sa.String(), nullable=False),
+        sa.Column("interval", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer()),
+        sa.Column("until", sa.Date()),
+        sa.Column("starts_on", sa.Date(), nullable=False),
+        sa.Column("materialized_through", sa.Date()),
+        sa.Column("generated_count", sa.Integer(), nullable=False),
+        sa.Column("next_occurrence_on", sa.Date()),
+        sa.Column("active", sa.Boolean(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+        ),
+        sa.CheckConstraint(
+            "type IN ('income', 'expense')", name="recurring_rules_type_check"
+        ),
+        sa.CheckConstraint(
+            "freq IN ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')",
+            name="recurring_rules_freq_check",
+        ),
+    )
+    op.create_index("ix_recurring_rules_user_id", "recurring_rules", ["user_id"])
+    op.create_index(
+        "ix_recurring_rules_due",
+        "recurring_rules",
+        ["next_occurrence_on"],
+        postgresql_where=sa.text("active AND next_occurrence_on IS NOT NULL"),
+    )
+
+    op.add_column(
+        "transactions",
+        sa.Column("recurring_rule_id", postgresql.UUID(as_uuid=True)),
+    )
+    op.create_foreign_key(
+        "transactions_recurring_rule_id_fkey",
+        "transactions",
+        "recurring_rules",
+        ["recurring_rule_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_transactions_recurring_occurrence "
+            "ON ONLY transactions (recurring_rule_id, occurred_at) "
+            "WHERE recurring_rule_id IS NOT NULL"
+        )
+        for partition in _partitions():
+            child = f"{partition}_recurring_occurrence_idx"
+            op.execute(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {child} "
+                f"ON {partition} (recurring_rule_id, occurred_at) "
+                "WHERE recurring_rule_id IS NOT NULL"
+            )
+            op.execute(
+                "ALTER INDEX ix_transactions_recurring_occurrence "
+                f"ATTACH PARTITION {child}"
+            )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_transactions_recurring_occurrence")
+    op.drop_constraint(
+        "transactions_recurring_rule_id_fkey", "transactions", type_="foreignkey"
+    )
+    op.drop_column("transactions", "recurring_rule_id")
+    op.drop_index("ix_recurring_rules_due", table_name="recurring_rules")
+    op.drop_index("ix_recurring_rules_user_id", table_name="recurring_rules")
+    op.drop_table("recurring_rules")
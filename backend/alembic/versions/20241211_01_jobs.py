@@ -0,0 +1,66 @@
+"""jobs
+
+Queue for background jobs (``app.jobs``), first used by the admin
+analytics reports in async mode.
+
+Revision ID: 20241211_01
+Revises: 20241210_01
+Create Date: 2024-12-11
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "20241211_01"
+down_revision = "20241210_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("params", postgresql.JSONB(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("lease_until", sa.DateTime(timezone=True)),
+        sa.Column("result", postgresql.JSONB()),
+        sa.Column("error", sa.Text()),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+        ),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+        sa.CheckConstraint(
+            "status IN ('queued', 'running', 'succeeded', 'failed')",
+            name="jobs_status_check",
+        ),
+    )
+    op.create_index("ix_jobs_user_id", "jobs", ["user_id"])
+    op.create_index(
+        "ix_jobs_pending",
+        "jobs",
+        ["created_at"],
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_jobs_pending", table_name="jobs")
+    op.drop_index("ix_jobs_user_id", table_name="jobs")
+    op.drop_table("jobs")
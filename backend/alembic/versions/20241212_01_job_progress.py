@@ -0,0 +1,47 @@
+"""job progress
+
+Progress reporting and cancellation for background jobs, used by the
+annual reports (``app.reports``).
+
+Revision ID: 20241212_01
+Revises: 20241211_01
+Create Date: 2024-12-12
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20241212_01"
+down_revision = "20241211_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "jobs",
+        sa.Column("progress", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.drop_constraint("jobs_status_check", "jobs", type_="check")
+    op.create_check_constraint(
+        "jobs_status_check",
+        "jobs",
+        "status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')",
+    )
+
+
+def downgrade():
+    op.execute(
+        "UPDATE jobs SET status = 'failed', error = 'Cancelled' "
+        "WHERE status = 'cancelled'"
+    )
+    op.drop_constraint("jobs_status_check", "jobs", type_="check")
+    op.create_check_constraint(
+        "jobs_status_check",
+        "jobs",
+        "status IN ('queued', 'running', 'succeeded', 'failed')",
+    )
+    op.drop_column("jobs", "progress")
@@ -0,0 +1,33 @@
+"""redact reset links
+
+Password reset events used to carry the full reset link in their payload.
+They now carry only the token id (``app.security.reset_token_for``), so
+clear the links still stored in queued or failed events; a user whose
+email had not gone out yet requests a new one.
+
+Revision ID: 20241213_01
+Revises: 20241212_01
+Create Date: 2024-12-13
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20241213_01"
+down_revision = "20241212_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "UPDATE notification_events SET payload = NULL "
+        "WHERE kind = 'PASSWORD_RESET' AND payload ? 'reset_url'"
+    )
+
+
+def downgrade():
+    # The links cannot be restored
+    pass
@@ -0,0 +1,195 @@
+"""Cross-user analytics for admins.
+
+Every report reads ``category_monthly_totals`` (``app.rollups``), one row
+per user, category, month and type, rather than re-aggregating
+``transactions``, so a year of history for every user is a scan of the
+rollup instead of every partition. Reports run on a replica when one is
+healthy, under a ``statement_timeout``: ``settings.admin_analytics_timeout_ms``
+inline, or ``settings.admin_analytics_job_timeout_ms`` when queued as a
+background job (``app.jobs``) for heavy ranges.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Callable
+
+from psycopg2 import errors
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import jobs, schemas
+from .config import settings
+from .partitions import add_months
+from .replicas import read_session
+
+ACTIVE_USERS = text(
+    """
+    WITH months AS (
+        SELECT CAST(m AS date) AS month
+        FROM generate_series(CAST(:first AS date), CAST(:last AS date),
+                             interval '1 month') AS m
+    ),
+    active AS (
+        SELECT month, count(DISTINCT user_id) AS users
+        FROM category_monthly_totals
+        WHERE month >= :first AND month <= :last AND count > 0
+        GROUP BY month
+    ),
+    signups AS (
+        SELECT CAST(date_trunc('month', created_at AT TIME ZONE 'UTC') AS date)
+                   AS month,
+               count(*) AS users
+        FROM users
+        WHERE created_at >= :first
+        GROUP BY 1
+    )
+    SELECT m.month, coalesce(a.users, 0) AS active_users,
+           coalesce(s.users, 0) AS new_users
+    FROM months m
+    LEFT JOIN active a ON a.month = m.month
+    LEFT JOIN signups s ON s.month = m.month
+    ORDER BY m.month
+    """
+)
+CATEGORY_TOTALS = text(
+    """
+    SELECT coalesce(min(c.name), 'Uncategorized') AS category_name,
+           CAST(sum(t.total_cents) AS bigint) AS total_cents,
+           CAST(sum(t.count) AS bigint) AS count,
+           count(DISTINCT t.user_id) AS users
+    FROM category_monthly_totals t
+    LEFT JOIN categories c ON c.id = t.category_id
+    WHERE t.month >= :first AND t.month <= :last AND t.type = :type
+    GROUP BY lower(btrim(c.name))
+    HAVING sum(t.count) > 0
+    ORDER BY total_cents DESC
+    """
+)
+SPEND_DISTRIBUTION = text(
+    """
+    WITH spend AS (
+        SELECT user_id, sum(total_cents) AS spent
+        FROM category_monthly_totals
+        WHERE month = :month AND type = 'expense'
+        GROUP BY user_id
+        HAVING sum(total_cents) > 0
+    )
+    SELECT CAST(date_trunc(:unit, u.created_at AT TIME ZONE 'UTC') AS date)
+               AS cohort,
+           count(*) AS users,
+           CAST(avg(s.spent) AS bigint) AS mean_cents,
+           percentile_cont(ARRAY[0.1, 0.25, 0.5, 0.75, 0.9])
+               WITHIN GROUP (ORDER BY s.spent) AS percentiles
+    FROM spend s
+    JOIN users u ON u.id = s.user_id
+    GROUP BY 1
+    ORDER BY 1
+    """
+)
+PERCENTILES = ("p10", "p25", "p50", "p75", "p90")
+
+
+def _this_month() -> date:
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
+def active_users(db: Session, params: schemas.ActiveUsersParams) -> dict:
+    """Users with transactions, and new signups, per month."""
+    last = _this_month()
+    first = add_months(last, 1 - params.months)
+    rows = db.execute(ACTIVE_USERS, {"first": first, "last": last}).all()
+    total = db.execute(text("SELECT count(*) FROM users")).scalar()
+    return {
+        "report": "active-users",
+        "total_users": total,
+        "months": [dict(row._mapping) for row in rows],
+    }
+
+
+def category_totals(db: Session, params: schemas.CategoryTotalsParams) -> dict:
+    """Totals across all users by category name (case-insensitive)."""
+    last = (params.end_month or _this_month()).replace(day=1)
+    first = (params.start_month or add_months(last, -11)).replace(day=1)
+    rows = db.execute(
+        CATEGORY_TOTALS, {"first": first, "last": last, "type": params.type}
+    ).all()
+    return {
+        "report": "category-totals",
+        "start_month": first,
+        "end_month": last,
+        "type": params.type,
+        "categories": [dict(row._mapping) for row in rows],
+    }
+
+
+def spend_distribution(db: Session, params: schemas.SpendDistributionParams) -> dict:
+    """Percentiles of per-user monthly spending, by signup cohort."""
+    month = (params.month or add_months(_this_month(), -1)).replace(day=1)
+    unit = "month" if params.cohort == "signup_month" else "year"
+    rows = db.execute(SPEND_DISTRIBUTION, {"month": month, "unit": unit}).all()
+    return {
+        "report": "spend-distribution",
+        "month": month,
+        "cohort": params.cohort,
+        "cohorts": [
+            {
+                "cohort": row.cohort,
+                "users": row.users,
+                "mean_cents": row.mean_cents,
+                **{
+                    name: round(value)
+                    for name, value in zip(PERCENTILES, row.percentiles)
+                },
+            }
+            for row in rows
+        ],
+    }
+
+
+# Report name -> (params model, report function)
+REPORTS: dict[str, tuple[type[BaseModel], Callable[[Session, BaseModel], dict]]] = {
+    "active-users": (schemas.ActiveUsersParams, active_users),
+    "category-totals": (schemas.CategoryTotalsParams, category_totals),
+    "spend-distribution": (schemas.SpendDistributionParams, spend_distribution),
+}
+
+
+class ReportTimeout(Exception):
+    """A report ran into its statement timeout."""
+
+
+def run_report(db: Session, name: str, params: BaseModel, timeout_ms: int) -> dict:
+    """Run a report under a statement timeout.
+
+    Raises:
+        ReportTimeout: If a query was cancelled by the timeout
+    """
+    db.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+    try:
+        return REPORTS[name][1](db, params)
+    except OperationalError as exc:
+        if isinstance(exc.orig, errors.QueryCanceled):
+            raise ReportTimeout(f"Report exceeded the {timeout_ms} ms timeout")
+        raise
+    finally:
+        db.rollback()  # ends the read-only transaction and the SET LOCAL
+
+
+def run_report_job(job: jobs.JobContext) -> dict:
+    """Job handler: ``job.params`` holds the report name and its parameters."""
+    params = job.params
+    model, _ = REPORTS[params["report"]]
+    with read_session() as db:
+        try:
+            return run_report(
+                db,
+                params["report"],
+                model.model_validate(params["params"]),
+                settings.admin_analytics_job_timeout_ms,
+            )
+        except ReportTimeout as exc:
+            raise jobs.JobError(str(exc))
+
+
+jobs.register("admin_analytics", run_report_job)
@@ -0,0 +1,128 @@
+"""Admin-only analytics across all users (see ``app.admin_analytics``)."""
+
+from typing import Annotated, Literal
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from . import admin_analytics, jobs, models, schemas
+from .config import settings
+from .db import get_db
+from .deps import require_admin
+from .replicas import get_read_db
+
+router = APIRouter(prefix="/api/admin/analytics", tags=["admin"])
+
+Mode = Literal["sync", "async"]
+
+
+def report_or_job(
+    name: str,
+    params: BaseModel,
+    mode: Mode,
+    read_db: Session,
+    db: Session,
+    admin: models.User,
+):
+    """Run a report inline, or queue it as a job when ``mode`` is async.
+
+    Raises:
+        HTTPException: If the inline report hits its statement timeout
+            (503 Service Unavailable; the job mode has a longer one)
+    """
+    if mode == "async":
+        job = jobs.submit(
+            db,
+            admin.id,
+            "admin_analytics",
+            {"report": name, "params": params.model_dump(mode="json")},
+        )
+        db.commit()
+        db.refresh(job)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(schemas.JobOut.model_validate(job)),
+        )
+    try:
+        return admin_analytics.run_report(
+            read_db, name, params, settings.admin_analytics_timeout_ms
+        )
+    except admin_analytics.ReportTimeout as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{exc}; retry with mode=async",
+        )
+
+
+@router.get("/active-users")
+def get_active_users(
+    params: Annotated[schemas.ActiveUsersParams, Depends()],
+    read_db: Annotated[Session, Depends(get_read_db)],
+    db: Annotated[Session, Depends(get_db)],
+    admin: Annotated[models.User, Depends(require_admin)],
+    mode: Mode = "sync",
+):
+    """
+    Users with at least one transaction, and new signups, per month.
+
+    - **months**: Months back, this one included
+    - **mode**: 'async' queues the report and returns a job (202) to poll
+    """
+    return report_or_job("active-users", params, mode, read_db, db, admin)
+
+
+@router.get("/category-totals")
+def get_category_totals(
+    params: Annotated[schemas.CategoryTotalsParams, Depends()],
+    read_db: Annotated[Session, Depends(get_read_db)],
+    db: Annotated[Session, Depends(get_db)],
+    admin: Annotated[models.User, Depends(require_admin)],
+    mode: Mode = "sync",
+):
+    """
+    Totals across all users by category name (case-insensitive).
+
+    - **start_month** / **end_month**: Month range (default: the last 12)
+    - **type**: 'expense' (default) or 'income'
+    - **mode**: 'async' queues the report and returns a job (202) to poll
+    """
+    return report_or_job("category-totals", params, mode, read_db, db, admin)
+
+
+@router.get("/spend-distribution")
+def get_spend_distribution(
+    params: Annotated[schemas.SpendDistributionParams, Depends()],
+    read_db: Annotated[Session, Depends(get_read_db)],
+    db: Annotated[Session, Depends(get_db)],
+    admin: Annotated[models.User, Depends(require_admin)],
+    mode: Mode = "sync",
+):
+    """
+    Percentiles (p10-p90) of per-user monthly spending by signup cohort.
+
+    - **month**: Month to measure (default: the last complete one)
+    - **cohort**: 'signup_month' (default) or 'signup_year'
+    - **mode**: 'async' queues the report and returns a job (202) to poll
+    """
+    return report_or_job("spend-distribution", params, mode, read_db, db, admin)
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobOut)
+def get_report_job(
+    job_id: UUID,
+    db: Annotated[Session, Depends(get_db)],
+    admin: Annotated[models.User, Depends(require_admin)],
+):
+    """Poll a report queued with mode=async; ``result`` is set once it succeeds."""
+    job = (
+        db.query(models.Job)
+        .filter(models.Job.id == job_id, models.Job.kind == "admin_analytics")
+        .first()
+    )
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
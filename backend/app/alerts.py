@@ -0,0 +1,168 @@
+"""Threshold alerts evaluated on transaction writes.
+
+After a transaction write updates the rollup (``app.rollups``), the writer
+passes the changed month totals to ``evaluate`` in the same database
+transaction. Month-to-date spend comes from the rollup row the write just
+touched, so evaluating a write costs a few indexed lookups however long the
+user's history is.
+
+Two kinds of alert are queued as ``NotificationEvent`` rows with
+``status='queued'``, one per enabled channel:
+
+* ``CATEGORY_THRESHOLD``: this month's expenses in a category reached a
+  ``CategoryThreshold``.
+* ``LOW_BALANCE``: income minus expenses fell below
+  ``NotificationPreference.low_balance_threshold_cents``.
+
+Each event carries a ``dedupe_key`` of kind, threshold, month and channel,
+and is inserted with ON CONFLICT DO NOTHING, so a threshold fires at most
+once per month even when later writes keep it crossed or concurrent writes
+race past it together.
+"""
+
+import uuid
+from datetime import date, datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import models, rollups
+from .metrics import metrics
+from .rollups import MonthTotal
+
+CATEGORY_THRESHOLD = "CATEGORY_THRESHOLD"
+LOW_BALANCE = "LOW_BALANCE"
+
+
+def dedupe_key(kind: str, ref_id: uuid.UUID, month: date, channel: str) -> str:
+    """Key that lets an alert be queued once per month and channel."""
+    return f"{kind}:{ref_id}:{month:%Y-%m}:{channel}"
+
+
+def channels_for(preference: Optional[models.NotificationPreference]) -> list[str]:
+    """Channels a user receives alerts on (in-app always, email by default)."""
+    channels = ["inapp"]
+    if preference is None or preference.email_enabled:
+        channels.append("email")
+    if preference is not None and preference.sms_enabled:
+        channels.append("sms")
+    return channels
+
+
+def _queue(
+    db: Session,
+    *,
+    user_id: uuid.UUID,
+    kind: str,
+    ref_id: uuid.UUID,
+    month: date,
+    channels: list[str],
+    payload: dict,
+    category_id: Optional[uuid.UUID] = None,
+) -> int:
+    table = models.NotificationEvent.__table__
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "category_id": category_id,
+            "kind": kind,
+            "channel": channel,
+            "payload": payload,
+            "dedupe_key": dedupe_key(kind, ref_id, month, channel),
+            "status": "queued",
+        }
+        for channel in channels
+    ]
+    stmt = (
+        insert(table)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["dedupe_key"])
+        .returning(table.c.id)
+    )
+    return len(db.execute(stmt).all())
+
+
+def evaluate(
+    db: Session,
+    user_id: uuid.UUID,
+    changed: Iterable[MonthTotal],
+    now: Optional[datetime] = None,
+) -> int:
+    """Queue alerts for thresholds crossed by a transaction write.
+
+    Args:
+        db: Session holding the write; the caller commits
+        user_id: Owner of the written transaction
+        changed: Rollup totals returned by ``rollups.apply``/``replace``
+        now: Current time (for tests)
+
+    Returns:
+        Number of notification events queued
+    """
+    month = rollups.month_of(now or datetime.now(timezone.utc))
+    preference = (
+        db.query(models.NotificationPreference)
+        .filter(models.NotificationPreference.user_id == user_id)
+        .first()
+    )
+    channels = channels_for(preference)
+    fired = 0
+
+    spent = {
+        total.category_id: total.total_cents
+        for total in changed
+        if total.month == month
+        and total.type == "expense"
+        and total.category_id is not None
+    }
+    if spent:
+        thresholds = (
+            db.query(models.CategoryThreshold)
+            .filter(
+                models.CategoryThreshold.user_id == user_id,
+                models.CategoryThreshold.category_id.in_(spent),
+            )
+            .all()
+        )
+        for threshold in thresholds:
+            spent_cents = spent[threshold.category_id]
+            if spent_cents < threshold.threshold_cents:
+                continue
+            fired += _queue(
+                db,
+                user_id=user_id,
+                kind=CATEGORY_THRESHOLD,
+                ref_id=threshold.id,
+                month=month,
+                channels=channels,
+                category_id=threshold.category_id,
+                payload={
+                    "category_id": str(threshold.category_id),
+                    "threshold_cents": threshold.threshold_cents,
+                    "spent_cents": spent_cents,
+                    "month": f"{month:%Y-%m}",
+                },
+            )
+
+    if preference is not None and preference.low_balance_threshold_cents is not None:
+        balance = rollups.balance_cents(db, user_id)
+        if balance < preference.low_balance_threshold_cents:
+            fired += _queue(
+                db,
+                user_id=user_id,
+                kind=LOW_BALANCE,
+                ref_id=preference.id,
+                month=month,
+                channels=channels,
+                payload={
+                    "balance_cents": balance,
+                    "threshold_cents": preference.low_balance_threshold_cents,
+                    "month": f"{month:%Y-%m}",
+                },
+            )
+
+    if fired:
+        metrics.incr("alerts.fired", fired)
+    return fired
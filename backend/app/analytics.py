@@ -0,0 +1,276 @@
+"""Spending forecasts computed on NumPy arrays.
+
+``load_daily_totals`` fetches a user's expenses per category and UTC day
+with one grouped query (an index-only scan of the ``(user_id,
+occurred_at)`` covering index) into a categories x days array. Everything
+after that works on whole arrays, so the cost of a forecast depends on the
+number of categories and days of history, not on how many transactions
+the user has.
+
+Three projection methods estimate each category's spending for the rest
+of the month:
+
+* ``average``: the moving average of the last ``window`` days, every day.
+* ``trend``: a least-squares line through the last ``window`` days.
+* ``weekday``: the average for each day of the week over the whole
+  history, so weekend-heavy categories are projected on weekends.
+"""
+
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .config import settings
+
+METHODS = ("average", "trend", "weekday")
+
+DAILY_EXPENSES = text(
+    """
+    SELECT category_id,
+           CAST(occurred_at AT TIME ZONE 'UTC' AS date) AS day,
+           CAST(sum(amount_cents) AS bigint) AS total_cents
+    FROM transactions
+    WHERE user_id = :user_id AND type = 'expense'
+      AND occurred_at >= :start AND occurred_at < :end
+      AND category_id IS NOT NULL
+    GROUP BY 1, 2
+    """
+)
+
+
+@dataclass
+class DailyTotals:
+    """Expenses per category (rows) and UTC day (columns) from ``start``."""
+
+    category_ids: list[uuid.UUID]
+    start: date
+    amounts: np.ndarray  # int64, shape (categories, days)
+
+    @property
+    def days(self) -> int:
+        return self.amounts.shape[1]
+
+
+def _utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+
+
+def load_daily_totals(
+    db: Session,
+    user_id: uuid.UUID,
+    category_ids: list[uuid.UUID],
+    start: date,
+    end: date,
+) -> DailyTotals:
+    """Load expenses for days in [start, end) into a ``DailyTotals``.
+
+    Args:
+        db: Database session
+        user_id: Whose expenses
+        category_ids: Categories to load, in row order (others are ignored)
+        start: First day
+        end: Day after the last one
+    """
+    amounts = np.zeros((len(category_ids), (end - start).days), dtype=np.int64)
+    rows = db.execute(
+        DAILY_EXPENSES,
+        {
+            "user_id": user_id,
+            "start": _utc_midnight(start),
+            "end": _utc_midnight(end),
+        },
+    ).all()
+    index = {category_id: i for i, category_id in enumerate(category_ids)}
+    cells = [
+        (index[row.category_id], (row.day - start).days, row.total_cents)
+        for row in rows
+        if row.category_id in index
+    ]
+    if cells:
+        rows_at, days_at, totals = np.array(cells, dtype=np.int64).T
+        amounts[rows_at, days_at] = totals
+    return DailyTotals(category_ids=category_ids, start=start, amounts=amounts)
+
+
+def moving_average(amounts: np.ndarray, window: int) -> np.ndarray:
+    """Trailing ``window``-day moving average of each row.
+
+    Returns:
+        Array of shape (rows, days - window + 1); column ``j`` averages days
+        ``j`` to ``j + window - 1``
+    """
+    sums = np.cumsum(amounts, axis=1, dtype=np.float64)
+    sums = np.pad(sums, ((0, 0), (1, 0)))
+    return (sums[:, window:] - sums[:, :-window]) / window
+
+
+def linear_trend(amounts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Least-squares line through each row, with day 0 the first column.
+
+    Returns:
+        Slope and intercept per row
+    """
+    x = np.arange(amounts.shape[1], dtype=np.float64)
+    x_centered = x - x.mean()
+    means = amounts.mean(axis=1)
+    slope = (amounts - means[:, None]) @ x_centered / (x_centered @ x_centered)
+    return slope, means - slope * x.mean()
+
+
+def weekday_profile(history: DailyTotals) -> np.ndarray:
+    """Average spend per day of the week (Monday first) for each row."""
+    weekdays = (history.start.weekday() + np.arange(history.days)) % 7
+    onehot = weekdays[:, None] == np.arange(7)  # (days, 7)
+    return (history.amounts @ onehot) / np.maximum(onehot.sum(axis=0), 1)
+
+
+def project(history: DailyTotals, days: int, method: str, window: int) -> np.ndarray:
+    """Expected daily spend for the ``days`` days after the history.
+
+    Args:
+        history: Daily totals up to and including the last known day
+        days: Number of days to project
+        method: One of ``METHODS``
+        window: Days of history used by ``average`` and ``trend``
+
+    Returns:
+        Non-negative float array of shape (rows, days)
+    """
+    window = max(1, min(window, history.days))
+    recent = history.amounts[:, -window:]
+    if method == "average":
+        rate = moving_average(recent, window)[:, -1]
+        projected = np.repeat(rate[:, None], days, axis=1)
+    elif method == "trend":
+        slope, intercept = linear_trend(recent)
+        x = np.arange(window, window + days, dtype=np.float64)
+        projected = intercept[:, None] + slope[:, None] * x
+    elif method == "weekday":
+        first = (history.start + timedelta(days=history.days)).weekday()
+        weekdays = (first + np.arange(days)) % 7
+        projected = weekday_profile(history)[:, weekdays]
+    else:
+        raise ValueError(f"Unknown forecast method: {method}")
+    return np.clip(projected, 0, None)
+
+
+@dataclass
+class MonthForecast:
+    """Month-end projection per row of a ``DailyTotals``."""
+
+    spent: np.ndarray  # month to date, int64
+    projected: np.ndarray  # spent plus the projection to month end, float
+    overspend_day: np.ndarray  # day of the month the limit is passed, or 0
+
+
+def forecast_month(
+    history: DailyTotals,
+    limits: np.ndarray,
+    today: date,
+    method: str,
+    window: int,
+) -> MonthForecast:
+    """Project each row to the end of ``today``'s month against its limit.
+
+    Args:
+        history: Daily totals through ``today``, starting no later than the
+            first of the month
+        limits: Monthly limit per row (NaN for none)
+        today: Last day of actual spending
+        method: One of ``METHODS``
+        window: Days of history used by ``average`` and ``trend``
+    """
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=31)).replace(day=1)
+    first = (month_start - history.start).days
+    last = (today - history.start).days + 1
+    actual = np.cumsum(history.amounts[:, first:last], axis=1)
+
+    history = DailyTotals(
+        history.category_ids, history.start, history.amounts[:, :last]
+    )
+    future = project(history, (month_end - today).days - 1, method, window)
+    spent = actual[:, -1]
+    cumulative = np.concatenate(
+        [actual, spent[:, None] + np.cumsum(future, axis=1)], axis=1
+    )
+
+    over = cumulative > limits[:, None]  # NaN limits compare False
+    overspend_day = np.where(over.any(axis=1), over.argmax(axis=1) + 1, 0)
+    return MonthForecast(
+        spent=spent, projected=cumulative[:, -1], overspend_day=overspend_day
+    )
+
+
+def forecast_envelopes(
+    db: Session,
+    user: models.User,
+    today: Optional[date] = None,
+    method: str = "average",
+    window: Optional[int] = None,
+) -> schemas.ForecastResponse:
+    """Forecast month-end spending for each of the user's expense categories.
+
+    Args:
+        db: Database session
+        user: Whose categories
+        today: Last day of actual spending (defaults to today, UTC)
+        method: One of ``METHODS``
+        window: Days of history used by ``average`` and ``trend``
+            (defaults to ``settings.forecast_window_days``)
+    """
+    today = today or datetime.now(timezone.utc).date()
+    window = window or settings.forecast_window_days
+    categories = (
+        db.query(models.Category)
+        .filter(models.Category.user_id == user.id, models.Category.type == "expense")
+        .order_by(models.Category.name)
+        .all()
+    )
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    start = min(month_start, today - timedelta(days=settings.forecast_history_days - 1))
+    history = load_daily_totals(
+        db, user.id, [c.id for c in categories], start, today + timedelta(days=1)
+    )
+    limits = np.array(
+        [
+            np.nan if c.monthly_limit_cents is None else c.monthly_limit_cents
+            for c in categories
+        ],
+        dtype=np.float64,
+    )
+    forecast = forecast_month(history, limits, today, method, window)
+
+    remaining = (month_end - today).days
+    envelopes = []
+    for i, category in enumerate(categories):
+        spent = int(forecast.spent[i])
+        projected = int(round(forecast.projected[i]))
+        day = int(forecast.overspend_day[i])
+        envelopes.append(
+            schemas.EnvelopeForecast(
+                category_id=category.id,
+                category_name=category.name,
+                monthly_limit_cents=category.monthly_limit_cents,
+                spent_cents=spent,
+                projected_cents=projected,
+                daily_rate_cents=(
+                    round((projected - spent) / remaining) if remaining else 0
+                ),
+                overspend_on=month_start.replace(day=day) if day else None,
+            )
+        )
+    return schemas.ForecastResponse(
+        as_of=today,
+        method=method,
+        month_start=month_start,
+        month_end=month_end,
+        envelopes=envelopes,
+    )
@@ -0,0 +1,620 @@
+"""Cold storage of old transactions in compressed columnar files.
+
+Years-old transactions are rarely read but weigh on every index of
+``transactions``. ``archive_old`` moves whole monthly partitions older than
+``settings.archive_after_months`` out of Postgres: each partition's rows
+are appended to one file per user and year,
+``<settings.archive_dir>/<user_id>/<year>.npz``, and the partition is then
+detached and dropped (``app.partitions``). Old rows that landed in the
+default partition are first moved into partitions of their own, so they
+are archived with the rest.
+
+A file is a NumPy ``.npz`` (a deflate-compressed zip) holding one array
+per column, sorted by ``occurred_at``: UUIDs as 16-byte rows (all zeros for
+NULL), timestamps as microseconds since the epoch, and text columns as
+JSON values packed into one UTF-8 byte array plus offsets.
+
+A partition's rows are first written to staged copies of the files,
+``<year>.npz.<partition>``, which replace the live files only once the
+partition has been dropped, so no row is ever both in a file and in
+Postgres. A run that stops in between is finished by the next one:
+staged files of a partition that is gone are published, those of one that
+is still attached are discarded. Appending also skips rows whose id is
+already in the file.
+
+Dropping a partition deletes nothing row by row, so the monthly rollup
+(``app.rollups``) keeps the archived months and no sync tombstones are
+written. Archived transactions are read-only; ``select`` reads them back
+for the transaction list, aggregates, running balance and annual reports
+when the requested range reaches into the archive.
+
+Usage:
+    python -m app.archive [--before 2022-01]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .config import settings
+from .db import engine
+from .metrics import metrics
+from .partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    detach_partition,
+    ensure_partitions,
+    list_partitions,
+    parse_month,
+    partition_name,
+)
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NIL = bytes(16)
+UUID_COLUMNS = ("id", "category_id", "recurring_rule_id")
+TEXT_COLUMNS = ("description", "receipt_url", "metadata")
+# Held while archiving, so concurrent runs never write the same files
+LOCK_KEY = 7_490_211
+PARTITION_NAME = re.compile(r"^transactions_y(\d{4})m(\d{2})$")
+
+PARTITION_ROWS = """
+    SELECT user_id, id, category_id, recurring_rule_id, type, amount_cents,
+           occurred_at, created_at, description, receipt_url, metadata
+    FROM {partition}
+    ORDER BY user_id, occurred_at, id
+"""
+DEFAULT_MONTHS = text(
+    f"""
+    SELECT DISTINCT date_trunc('month', occurred_at AT TIME ZONE 'UTC')::date
+    FROM {DEFAULT_PARTITION}
+    WHERE occurred_at < :before
+    """
+)
+
+
+def _micros(value: datetime) -> int:
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _datetime(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+def _uuid(raw: bytes) -> Optional[uuid.UUID]:
+    return None if raw == NIL else uuid.UUID(bytes=raw)
+
+
+def _uuid_bytes(value: Optional[uuid.UUID]) -> bytes:
+    return value.bytes if value else NIL
+
+
+def _pack_text(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """JSON-encode values into (UTF-8 bytes, offsets); NULL stays distinct."""
+    encoded = [json.dumps(value, ensure_ascii=False).encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def user_dir(user_id: uuid.UUID) -> Path:
+    return Path(settings.archive_dir) / str(user_id)
+
+
+def archived_years(user_id: uuid.UUID) -> list[int]:
+    """Years with an archive file for the user, oldest first."""
+    directory = user_dir(user_id)
+    if not directory.is_dir():
+        return []
+    return sorted(int(path.stem) for path in directory.glob("*.npz"))
+
+
+class ArchivedRows:
+    """A selection of one user's archived transactions.
+
+    Holds the columns of the files it was loaded from and the positions of
+    the selected rows. Text columns are only decoded for rows that are
+    filtered on or returned.
+    """
+
+    def __init__(self, columns: dict[str, np.ndarray], index: np.ndarray):
+        self.columns = columns
+        self.index = index
+
+    @classmethod
+    def empty(cls) -> "ArchivedRows":
+        return cls(_to_columns([]), np.zeros(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, rows: slice) -> list[schemas.TransactionOut]:
+        return [self._transaction(i) for i in self.index[rows]]
+
+    def column(self, name: str) -> np.ndarray:
+        """Values of a numeric or UUID column for the selected rows."""
+        return self.columns[name][self.index]
+
+    def values(self, name: str) -> list:
+        """A column for the selected rows, as the Python values a query returns."""
+        if name in TEXT_COLUMNS:
+            return [self._text(name, i) for i in self.index]
+        if name == "type":
+            return [
+                "income" if income else "expense" for income in self.column("income")
+            ]
+        if name in UUID_COLUMNS:
+            return [_uuid(raw.tobytes()) for raw in self.column(name)]
+        if name in ("occurred_at", "created_at"):
+            return [_datetime(micros) for micros in self.column(name)]
+        return self.column(name).tolist()
+
+    def where(self, mask) -> "ArchivedRows":
+        """The selected rows for which ``mask`` is true."""
+        return ArchivedRows(self.columns, self.index[np.asarray(mask, dtype=bool)])
+
+    def order_by(self, column: str, descending: bool = False) -> "ArchivedRows":
+        """Reorder by ``amount_cents``, ``category_id`` or ``occurred_at``.
+
+        NULL categories sort last ascending and first descending, as in
+        Postgres.
+        """
+        if column == "category_id":
+            values = self.column("category_id")
+            keys = [values[:, i] for i in range(15, -1, -1)]
+            keys.append(~values.any(axis=1))  # NULLs last
+            order = np.lexsort(keys)
+        else:
+            order = np.argsort(self.column(column), kind="stable")
+        if descending:
+            order = order[::-1]
+        return ArchivedRows(self.columns, self.index[order])
+
+    def _text(self, name: str, i: int):
+        offsets = self.columns[f"{name}_offsets"]
+        return json.loads(self.columns[name][offsets[i] : offsets[i + 1]].tobytes())
+
+    def _transaction(self, i: int) -> schemas.TransactionOut:
+        columns = self.columns
+        return schemas.TransactionOut(
+            id=_uuid(columns["id"][i].tobytes()),
+            user_id=columns["user_id"],
+            category_id=_uuid(columns["category_id"][i].tobytes()),
+            type="income" if columns["income"][i] else "expense",
+            amount_cents=int(columns["amount_cents"][i]),
+            occurred_at=_datetime(columns["occurred_at"][i]),
+            description=self._text("description", i),
+            receipt_url=self._text("receipt_url", i),
+            metadata_=self._text("metadata", i),
+            created_at=_datetime(columns["created_at"][i]),
+            recurring_rule_id=_uuid(columns["recurring_rule_id"][i].tobytes()),
+            archived=True,
+        )
+
+
+def _to_columns(rows: list) -> dict[str, np.ndarray]:
+    """Columns for PARTITION_ROWS rows (of one user), in their order."""
+    columns = {
+        name: np.frombuffer(
+            b"".join(_uuid_bytes(getattr(row, name)) for row in rows), dtype=np.uint8
+        ).reshape(-1, 16)
+        for name in UUID_COLUMNS
+    }
+    columns["income"] = np.array([row.type == "income" for row in rows], dtype=bool)
+    columns["amount_cents"] = np.array(
+        [row.amount_cents for row in rows], dtype=np.int64
+    )
+    for name in ("occurred_at", "created_at"):
+        columns[name] = np.array(
+            [_micros(getattr(row, name)) for row in rows], dtype=np.int64
+        )
+    for name in TEXT_COLUMNS:
+        columns[name], columns[f"{name}_offsets"] = _pack_text(
+            [getattr(row, name) for row in rows]
+        )
+    return columns
+
+
+def _read(path: Path) -> dict[str, np.ndarray]:
+    with np.load(path) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def _concat(parts: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    """Concatenate column sets, rebasing the text offsets."""
+    columns = {}
+    for name in parts[0]:
+        if name.endswith("_offsets"):
+            continue
+        columns[name] = np.concatenate([part[name] for part in parts])
+    for name in TEXT_COLUMNS:
+        base, offsets = 0, [np.zeros(1, dtype=np.int64)]
+        for part in parts:
+            offsets.append(part[f"{name}_offsets"][1:] + base)
+            base += len(part[name])
+        columns[f"{name}_offsets"] = np.concatenate(offsets)
+    return columns
+
+
+def _take(columns: dict[str, np.ndarray], order: np.ndarray) -> dict[str, np.ndarray]:
+    """Rows ``order`` of a column set, text columns repacked."""
+    taken = {
+        name: values[order]
+        for name, values in columns.items()
+        if name not in TEXT_COLUMNS and not name.endswith("_offsets")
+    }
+    for name in TEXT_COLUMNS:
+        data, offsets = columns[name], columns[f"{name}_offsets"]
+        pieces = [data[offsets[i] : offsets[i + 1]] for i in order]
+        lengths = [len(piece) for piece in pieces]
+        taken[f"{name}_offsets"] = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=taken[f"{name}_offsets"][1:])
+        taken[name] = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.uint8)
+    return taken
+
+
+def append(
+    user_id: uuid.UUID,
+    year: int,
+    columns: dict[str, np.ndarray],
+    partition: Optional[str] = None,
+) -> int:
+    """Add rows to a user's file for ``year``, skipping ids already in it.
+
+    The file is rewritten to a temporary name and renamed into place.
+
+    Args:
+        user_id: Owner of the rows
+        year: Year the rows occurred in
+        columns: Rows to add (``_to_columns``)
+        partition: Write a staged copy for this partition instead, which
+            ``publish`` moves into place
+
+    Returns:
+        Number of rows added
+    """
+    path = user_dir(user_id) / f"{year}.npz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    target = path if partition is None else path.with_name(f"{path.name}.{partition}")
+    added = len(columns["id"])
+    if path.exists():
+        existing = _read(path)
+        known = {row.tobytes() for row in existing["id"]}
+        new = np.array([row.tobytes() not in known for row in columns["id"]])
+        added = int(new.sum())
+        if not added:
+            return 0
+        columns = _concat([existing, _take(columns, np.flatnonzero(new))])
+        columns = _take(columns, np.argsort(columns["occurred_at"], kind="stable"))
+    _write(target, columns)
+    return added
+
+
+def _staged(partition: str) -> list[Path]:
+    return list(Path(settings.archive_dir).glob(f"*/*.npz.{partition}"))
+
+
+def publish(partition: str) -> int:
+    """Replace the live files with the ones staged for ``partition``.
+
+    Returns:
+        Number of files published
+    """
+    staged = _staged(partition)
+    for path in staged:
+        os.replace(path, path.with_name(path.name.removesuffix(f".{partition}")))
+    return len(staged)
+
+
+def discard(partition: str) -> None:
+    """Remove the files staged for ``partition``."""
+    for path in _staged(partition):
+        path.unlink(missing_ok=True)
+
+
+def settle(bind: Engine) -> None:
+    """Finish what a stopped run staged.
+
+    Files staged for a partition that was dropped are published; those of a
+    partition that is still attached (its transaction rolled back) are
+    discarded.
+    """
+    partitions = set()
+    for path in Path(settings.archive_dir).glob("*/*.npz.*"):
+        suffix = path.name.partition(".npz.")[2]
+        if PARTITION_NAME.match(suffix):
+            partitions.add(suffix)
+    for name in sorted(partitions):
+        with bind.connect() as conn:
+            exists = conn.execute(
+                text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+            ).scalar()
+        if exists:
+            discard(name)
+        else:
+            logger.info("Publishing files staged for dropped partition %s", name)
+            publish(name)
+
+
+def _write(path: Path, columns: dict[str, np.ndarray]) -> None:
+    partial = path.with_name(path.name + ".part")
+    with open(partial, "wb") as f:
+        np.savez_compressed(f, **columns)
+    os.replace(partial, path)
+
+
+def recategorize(
+    user_id: uuid.UUID, category_id: uuid.UUID, new_category_id: Optional[uuid.UUID]
+) -> int:
+    """Move a user's archived transactions from one category to another.
+
+    Each file that has any is rewritten (see ``append``), staged ones
+    included so a concurrent archive run does not publish the old category.
+    Running it again changes nothing, so it can be retried.
+
+    Returns:
+        Number of rows changed
+    """
+    old = np.frombuffer(category_id.bytes, dtype=np.uint8)
+    directory = user_dir(user_id)
+    staged = [
+        path
+        for path in directory.glob("*.npz.*")
+        if PARTITION_NAME.match(path.name.partition(".npz.")[2])
+    ]
+    changed = 0
+    live = [directory / f"{year}.npz" for year in archived_years(user_id)]
+    for path in live + staged:
+        columns = _read(path)
+        matches = (columns["category_id"] == old).all(axis=1)
+        if not matches.any():
+            continue
+        categories = columns["category_id"].copy()
+        categories[matches] = np.frombuffer(_uuid_bytes(new_category_id), np.uint8)
+        columns["category_id"] = categories
+        _write(path, columns)
+        if path not in staged:
+            changed += int(matches.sum())
+    return changed
+
+
+def load(user_id: uuid.UUID, years: Iterable[int]) -> Optional[dict]:
+    """Columns of the user's files for ``years`` (None if there are none)."""
+    parts = [
+        _read(user_dir(user_id) / f"{year}.npz")
+        for year in sorted(set(years) & set(archived_years(user_id)))
+    ]
+    if not parts:
+        return None
+    columns = _concat(parts) if len(parts) > 1 else parts[0]
+    columns["user_id"] = user_id
+    return columns
+
+
+def count(user_id: uuid.UUID, category_id: uuid.UUID) -> int:
+    """Number of the user's archived transactions in a category."""
+    wanted = np.frombuffer(category_id.bytes, dtype=np.uint8)
+    total = 0
+    for year in archived_years(user_id):
+        with np.load(user_dir(user_id) / f"{year}.npz") as npz:
+            total += int((npz["category_id"] == wanted).all(axis=1).sum())
+    return total
+
+
+def newest(user_id: uuid.UUID) -> Optional[datetime]:
+    """``occurred_at`` of the user's most recent archived transaction."""
+    years = archived_years(user_id)
+    if not years:
+        return None
+    with np.load(user_dir(user_id) / f"{years[-1]}.npz") as npz:
+        occurred = npz["occurred_at"]
+    return _datetime(occurred[-1]) if len(occurred) else None
+
+
+def reaches(user_id: uuid.UUID, start: Optional[datetime]) -> Optional[datetime]:
+    """Whether a range starting at ``start`` reaches into the user's archive.
+
+    Returns:
+        The newest archived ``occurred_at`` if it does, else None
+    """
+    latest = newest(user_id)
+    if latest is None or (start is not None and _utc(start) > latest):
+        return None
+    return latest
+
+
+def select(
+    db: Session,
+    user_id: uuid.UUID,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    end_inclusive: bool = True,
+    type: Optional[str] = None,
+    category_ids: Optional[list[uuid.UUID]] = None,
+    min_amount: Optional[int] = None,
+    max_amount: Optional[int] = None,
+) -> ArchivedRows:
+    """The user's archived transactions that pass the filters.
+
+    Only the files of years the range touches are read. Categories deleted
+    since a row was archived read as NULL, like ``ON DELETE SET NULL``.
+
+    Args:
+        db: Session, for the user's current categories
+        user_id: Owner of the archive
+        start: Earliest ``occurred_at``
+        end: Latest ``occurred_at``
+        end_inclusive: Whether ``end`` itself is included
+        type: 'income' or 'expense'
+        category_ids: Keep only these categories
+        min_amount: Smallest ``amount_cents``
+        max_amount: Largest ``amount_cents``
+
+    Returns:
+        Matching rows in ``occurred_at`` order
+    """
+    years = [
+        year
+        for year in archived_years(user_id)
+        if (start is None or year >= _utc(start).year)
+        and (end is None or year <= _utc(end).year)
+    ]
+    columns = load(user_id, years)
+    if columns is None:
+        return ArchivedRows.empty()
+
+    known = {
+        category_id.bytes
+        for (category_id,) in db.query(models.Category.id).filter(
+            models.Category.user_id == user_id
+        )
+    }
+    categories = columns["category_id"]
+    stale = np.array([row.tobytes() not in known for row in categories], dtype=bool)
+    if stale.any():
+        categories = categories.copy()
+        categories[stale] = 0
+        columns["category_id"] = categories
+
+    occurred = columns["occurred_at"]
+    mask = np.ones(len(occurred), dtype=bool)
+    if start is not None:
+        mask &= occurred >= _micros(_utc(start))
+    if end is not None:
+        bound = _micros(_utc(end))
+        mask &= (occurred <= bound) if end_inclusive else (occurred < bound)
+    if type:
+        mask &= columns["income"] == (type == "income")
+    if category_ids:
+        wanted = np.frombuffer(
+            b"".join(c.bytes for c in category_ids), dtype=np.uint8
+        ).reshape(-1, 16)
+        mask &= (categories[:, None, :] == wanted[None, :, :]).all(axis=2).any(axis=1)
+    if min_amount is not None:
+        mask &= columns["amount_cents"] >= min_amount
+    if max_amount is not None:
+        mask &= columns["amount_cents"] <= max_amount
+    return ArchivedRows(columns, np.flatnonzero(mask))
+
+
+def _utc(value: datetime) -> datetime:
+    # Files are per UTC year, so an offset must be applied, not kept
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def archive_partition(bind: Engine, name: str) -> int:
+    """Append a monthly partition's rows to the archive files, then drop it.
+
+    Returns:
+        Number of rows archived
+    """
+    year = int(PARTITION_NAME.match(name).group(1))
+    archived = 0
+    with bind.begin() as conn:
+        timeout = int(settings.partition_lock_timeout_ms)
+        conn.execute(text(f"SET LOCAL lock_timeout = {timeout}"))
+        # Writes to the month wait until it is gone, so none are lost
+        conn.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+        result = conn.execute(
+            text(PARTITION_ROWS.format(partition=name)),
+            execution_options={"yield_per": 1000},
+        )
+        user_id, rows = None, []
+        for row in result:
+            if row.user_id != user_id and rows:
+                archived += append(user_id, year, _to_columns(rows), partition=name)
+                rows = []
+            user_id = row.user_id
+            rows.append(row)
+        if rows:
+            archived += append(user_id, year, _to_columns(rows), partition=name)
+        detach_partition(conn, name, drop=True)
+    publish(name)  # only now that the rows are gone from Postgres
+    metrics.incr("archive.rows", archived)
+    logger.info("Archived %d rows from %s", archived, name)
+    return archived
+
+
+def archive_old(bind: Engine = engine, before: Optional[date] = None) -> dict[str, int]:
+    """Archive every month before ``before``.
+
+    Args:
+        bind: Engine to use
+        before: First month to keep (defaults to settings.archive_after_months
+            before this one)
+
+    Returns:
+        Mapping of partition name to rows archived (empty if another run
+        holds the lock)
+    """
+    if before is None:
+        this_month = datetime.now(timezone.utc).date().replace(day=1)
+        before = add_months(this_month, -settings.archive_after_months)
+    before = before.replace(day=1)
+
+    results = {}
+    with bind.connect() as lock:
+        locked = lock.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": LOCK_KEY}
+        ).scalar()
+        lock.commit()
+        if not locked:
+            logger.info("Another archive run is in progress")
+            return results
+        try:
+            settle(bind)
+            with bind.connect() as conn:
+                months = conn.execute(DEFAULT_MONTHS, {"before": before}).scalars()
+                months = months.all()
+            for month in months:  # give stray old rows partitions of their own
+                ensure_partitions(bind, month, month)
+            with bind.connect() as conn:
+                names = [
+                    name
+                    for name, _ in list_partitions(conn)
+                    if PARTITION_NAME.match(name) and name < partition_name(before)
+                ]
+            with metrics.timer("archive.run"):
+                for name in names:
+                    results[name] = archive_partition(bind, name)
+        finally:
+            settle(bind)  # after a failed partition
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+            lock.commit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--before",
+        type=parse_month,
+        help="First month to keep (default: ARCHIVE_AFTER_MONTHS ago)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    results = archive_old(before=args.before)
+    for name, count in results.items():
+        print(f"{name:<28} {count:>10} rows archived")
+    print(f"archived {len(results)} partitions")
+
+
+if __name__ == "__main__":
+    main()
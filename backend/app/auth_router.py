@@ -1,7 +1,11 @@
+import uuid
+from datetime import datetime, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from . import schemas
 from .config import settings
@@ -9,28 +13,94 @@ from .db import get_db
 from .deps import get_current_user
 from .models import Session as SessionModel
 from .models import User
+from .rate_limit import enforce_rate_limit
 from .security import (
     create_access_token,
-    hash_password,
+    hash_password_async,
     new_refresh_token,
-    verify_password,
+    password_needs_rehash,
+    split_refresh_token,
+    verify_password_async,
+    verify_refresh_verifier,
 )
 
 router = APIRouter(prefix="/api", tags=["auth"])
 
 
+def _find_user_by_email(db: Session, email: str):
+    """Look up a user by email (case-insensitive, via ix_users_email_lower)."""
+    return db.query(User).filter(func.lower(User.email) == email.lower()).first()
+
+
+def _new_session(db: Session, user_id) -> tuple[str, SessionModel]:
+    """Add a refresh token session for a user (not committed).
+
+    Returns:
+        Tuple of (raw_refresh_token, session)
+    """
+    raw, selector, hashed, exp = new_refresh_token()
+    session = SessionModel(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        refresh_token_selector=selector,
+        refresh_token_hash=hashed,
+        expires_at=exp,
+    )
+    db.add(session)
+    return raw, session
+
+
+def _issue_tokens(db: Session, user: User) -> schemas.TokenResponse:
+    """Create an access token and, if enabled, a refresh token session.
+
+    Commits any pending changes on the session (e.g. a rehashed password).
+    """
+    access_token, expires_in = create_access_token(str(user.id))
+
+    refresh_val = None
+    if settings.use_refresh_tokens:
+        refresh_val, _ = _new_session(db, user.id)
+    db.commit()
+
+    return schemas.TokenResponse(
+        access_token=access_token,
+        refresh_token=refresh_val,
+        expires_in=expires_in,
+    )
+
+
+def _create_user(db: Session, body: schemas.RegisterRequest, pwd_hash: str) -> User:
+    """Insert a new student account with an already-hashed password."""
+    user = User(
+        email=body.email.lower(),  # Store email in lowercase
+        password_hash=pwd_hash,
+        first_name=body.first_name,
+        last_name=body.last_name,
+        role="student",  # Default role
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
 @router.post(
     "/register",
     response_model=schemas.TokenResponse,
     status_code=status.HTTP_201_CREATED,
 )
-def register(
+async def register(
+    request: Request,
     body: schemas.RegisterRequest,
     db: Annotated[Session, Depends(get_db)],
 ):
     """Register a new user account.
 
+    Database work runs in the threadpool and bcrypt on its own bounded pool,
+    so neither blocks the event loop.
+
     Args:
+        request: The incoming request (used for rate limiting)
         body: Registration request with email, password, and optional name fields
         db: Database session
 
@@ -39,9 +109,12 @@ def register(
 
     Raises:
         HTTPException: If email is already registered (409 Conflict)
+            or the client is rate limited (429 Too Many Requests)
     """
+    enforce_rate_limit(request, "register")
+
     # Check if email already exists (case-insensitive)
-    existing_user = db.query(User).filter(User.email.ilike(body.email)).first()
+    existing_user = await run_in_threadpool(_find_user_by_email, db, body.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -49,49 +122,25 @@ def register(
         )
 
     # Hash password and create user
-    pwd_hash = hash_password(body.password)
-    user = User(
-        email=body.email.lower(),  # Store email in lowercase
-        password_hash=pwd_hash,
-        first_name=body.first_name,
-        last_name=body.last_name,
-        role="student",  # Default role
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    pwd_hash = await hash_password_async(body.password)
+    user = await run_in_threadpool(_create_user, db, body, pwd_hash)
 
-    # Create access token
-    access_token, expires_in = create_access_token(str(user.id))
-
-    # Optionally create refresh token
-    refresh_val = None
-    if settings.use_refresh_tokens:
-        raw, hashed, exp = new_refresh_token()
-        session = SessionModel(
-            user_id=user.id,
-            refresh_token_hash=hashed,
-            expires_at=exp,
-        )
-        db.add(session)
-        db.commit()
-        refresh_val = raw
-
-    return schemas.TokenResponse(
-        access_token=access_token,
-        refresh_token=refresh_val,
-        expires_in=expires_in,
-    )
+    return await run_in_threadpool(_issue_tokens, db, user)
 
 
 @router.post("/login", response_model=schemas.TokenResponse)
-def login(
+async def login(
+    request: Request,
     body: schemas.LoginRequest,
     db: Annotated[Session, Depends(get_db)],
 ):
     """Authenticate a user and return access token.
 
+    If the stored hash was made with a different bcrypt cost than the
+    current ``BCRYPT_ROUNDS`` setting, the password is rehashed on the way.
+
     Args:
+        request: The incoming request (used for rate limiting)
         body: Login request with email and password
         db: Database session
 
@@ -100,33 +149,96 @@ def login(
 
     Raises:
         HTTPException: If credentials are invalid (401 Unauthorized)
+            or the client is rate limited (429 Too Many Requests)
     """
+    enforce_rate_limit(request, "login", email=body.email)
+
     # Find user by email (case-insensitive)
-    user = db.query(User).filter(User.email.ilike(body.email)).first()
+    user = await run_in_threadpool(_find_user_by_email, db, body.email)
 
     # Verify user exists and password is correct
-    if not user or not verify_password(body.password, user.password_hash):
+    if not user or not await verify_password_async(body.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
         )
 
-    # Create access token
-    access_token, expires_in = create_access_token(str(user.id))
+    # Opportunistically upgrade (or downgrade) the bcrypt cost
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = await hash_password_async(body.password)
 
-    # Optionally create refresh token
-    refresh_val = None
-    if settings.use_refresh_tokens:
-        raw, hashed, exp = new_refresh_token()
-        session = SessionModel(
-            user_id=user.id,
-            refresh_token_hash=hashed,
-            expires_at=exp,
+    return await run_in_threadpool(_issue_tokens, db, user)
+
+
+@router.post("/refresh", response_model=schemas.TokenResponse)
+def refresh(
+    body: schemas.RefreshRequest,
+    db: Annotated[Session, Depends(get_db)],
+):
+    """Exchange a refresh token for a new access token and refresh token.
+
+    The presented session is rotated: it is revoked and replaced by a new
+    one. Presenting an already-rotated token again means it was stolen or
+    replayed, so every active session of that user is revoked.
+
+    Args:
+        body: Refresh request with the raw refresh token
+        db: Database session
+
+    Returns:
+        TokenResponse with a new access token and a new refresh token
+
+    Raises:
+        HTTPException: If refresh tokens are disabled (404 Not Found)
+            or the token is invalid, expired, revoked or reused (401 Unauthorized)
+    """
+    if not settings.use_refresh_tokens:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Refresh tokens are not enabled",
         )
-        db.add(session)
-        db.commit()
-        refresh_val = raw
 
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+    )
+    parts = split_refresh_token(body.refresh_token)
+    if parts is None:
+        raise invalid
+    selector, verifier = parts
+
+    # Single indexed lookup; lock the row so concurrent refreshes serialize
+    session = (
+        db.query(SessionModel)
+        .filter(SessionModel.refresh_token_selector == selector)
+        .with_for_update()
+        .first()
+    )
+    if not session or not verify_refresh_verifier(verifier, session.refresh_token_hash):
+        raise invalid
+
+    now = datetime.now(timezone.utc)
+    if session.revoked_at is not None:
+        if session.replaced_by_id is not None:
+            # Reuse of a rotated token: revoke the whole family
+            db.query(SessionModel).filter(
+                SessionModel.user_id == session.user_id,
+                SessionModel.revoked_at.is_(None),
+            ).update({SessionModel.revoked_at: now}, synchronize_session=False)
+            db.commit()
+        raise invalid
+
+    if session.expires_at <= now:
+        raise invalid
+
+    # Rotate: revoke the presented session and link it to its replacement
+    refresh_val, new_session = _new_session(db, session.user_id)
+    db.flush()  # insert the replacement before referencing it
+    session.revoked_at = now
+    session.replaced_by_id = new_session.id
+    db.commit()
+
+    access_token, expires_in = create_access_token(str(session.user_id))
     return schemas.TokenResponse(
         access_token=access_token,
         refresh_token=refresh_val,
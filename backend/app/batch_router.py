@@ -0,0 +1,232 @@
+"""Run several API calls in one round trip.
+
+``POST /api/batch`` takes a list of sub-requests (method, path, JSON body)
+and runs them one after another through the app's own routes, so each gets
+the same validation, permissions and error responses as when called
+directly. The batch authenticates once and opens one database session:
+sub-requests find both on ``request.state.batch``, and ``get_db``,
+``get_read_db`` and ``get_current_user`` hand them out instead of opening
+a session and loading the user again.
+
+Sub-requests are not atomic as a group. Each write commits when its
+endpoint does, and a failed sub-request is rolled back on its own without
+stopping the rest. Reads in a batch always go to the primary, so they see
+writes made earlier in the same batch.
+
+Batches are limited to ``settings.batch_max_requests`` sub-requests and a
+total cost of ``settings.batch_max_cost`` (see ``request_cost``).
+"""
+
+import json
+import logging
+import posixpath
+from dataclasses import dataclass
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.exceptions import ExceptionMiddleware
+
+from . import models, schemas
+from .config import settings
+from .db import get_db
+from .deps import get_current_user
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["batch"])
+
+# Endpoints that cannot run inside a batch (nesting, streaming)
+EXCLUDED_PATHS = ("/api/batch", "/api/events")
+
+# Cost of sub-requests heavier than a plain read (1) or write (2)
+PATH_COSTS = {
+    "/api/transactions/aggregates": 5,
+    "/api/transactions/balance": 5,
+    "/api/forecast": 5,
+    "/api/sync": 5,
+}
+
+# Set by the batch itself rather than taken from the sub-request
+RESERVED_HEADERS = {"authorization", "content-length", "content-type", "cookie", "host"}
+
+
+@dataclass
+class BatchContext:
+    """What sub-requests share: the batch's session and user."""
+
+    db: Session
+    user: models.User
+
+
+def route_path(path: str) -> str:
+    """A sub-request's path as dispatched: no query, ``//``, ``.`` or ``..``.
+
+    Limits are checked against this path, so spelling a path differently
+    cannot get around them.
+    """
+    path = posixpath.normpath("/" + path.partition("?")[0].lstrip("/"))
+    return "/" + path.lstrip("/")
+
+
+def request_cost(item: schemas.BatchRequestItem) -> int:
+    """Relative cost of a sub-request, counted against ``batch_max_cost``."""
+    path = route_path(item.path)
+    if path in PATH_COSTS:
+        return PATH_COSTS[path]
+    return 1 if item.method == "GET" else 2
+
+
+def check_limits(items: list[schemas.BatchRequestItem]) -> None:
+    """Reject a batch that is too large, too costly or calls excluded paths.
+
+    Raises:
+        HTTPException: If the batch is not allowed (400 Bad Request)
+    """
+    if len(items) > settings.batch_max_requests:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may contain at most {settings.batch_max_requests} "
+            "requests",
+        )
+    cost = sum(request_cost(item) for item in items)
+    if cost > settings.batch_max_cost:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch cost {cost} exceeds the limit of {settings.batch_max_cost}",
+        )
+    for item in items:
+        path = route_path(item.path)
+        if not path.startswith("/api/") or path.startswith(EXCLUDED_PATHS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{item.path} cannot be called in a batch",
+            )
+
+
+def _decode(content_type: str, body: bytes):
+    if not body:
+        return None
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+
+async def dispatch(
+    app, request: Request, context: BatchContext, item: schemas.BatchRequestItem
+) -> schemas.BatchResponseItem:
+    """Run one sub-request through ``app`` and capture its response.
+
+    Args:
+        app: The router wrapped in the app's exception handlers
+        request: The batch request (for the credentials, client and server)
+        context: Shared session and user
+        item: The sub-request
+
+    Returns:
+        The sub-request's status, headers and decoded body
+    """
+    path, query = route_path(item.path), item.path.partition("?")[2]
+    body = b"" if item.body is None else json.dumps(item.body).encode()
+    headers = [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in item.headers.items()
+        if name.lower() not in RESERVED_HEADERS
+    ]
+    headers.append((b"authorization", request.headers["authorization"].encode()))
+    if body:
+        headers.append((b"content-type", b"application/json"))
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": item.method,
+        "scheme": request.url.scheme,
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),  # rate limits still apply
+        "root_path": request.scope.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        "app": request.app,
+        "state": {"batch": context},
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    start, chunks = {}, []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(message)
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed", item.method, item.path)
+        start = {"status": 500, "headers": [(b"content-type", b"application/json")]}
+        chunks = [b'{"detail":"Internal Server Error"}']
+
+    response_headers = {
+        name.decode("latin-1"): value.decode("latin-1")
+        for name, value in start.get("headers", [])
+        if name != b"content-length"
+    }
+    return schemas.BatchResponseItem(
+        status=start["status"],
+        headers=response_headers,
+        body=_decode(response_headers.get("content-type", ""), b"".join(chunks)),
+    )
+
+
+@router.post("/batch", response_model=schemas.BatchResponse)
+async def run_batch(
+    body: schemas.BatchRequest,
+    request: Request,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """Run several API calls in one round trip.
+
+    Sub-requests run in order against the regular endpoints and each result
+    is returned in the same position, errors included (a failed sub-request
+    does not stop the others or undo earlier ones). Send an
+    ``Idempotency-Key`` in a sub-request's ``headers`` to make a write safe
+    to retry.
+
+    Args:
+        body: The sub-requests
+        request: The incoming request
+        db: Database session shared by all sub-requests
+        current_user: The authenticated user
+
+    Returns:
+        One response per sub-request
+
+    Raises:
+        HTTPException: If the batch exceeds the request or cost limits, or
+            calls an endpoint that cannot be batched (400 Bad Request)
+    """
+    check_limits(body.requests)
+    context = BatchContext(db=db, user=current_user)
+    app = ExceptionMiddleware(
+        request.app.router, handlers=request.app.exception_handlers
+    )
+
+    responses = []
+    with metrics.timer("batch.duration"):
+        for item in body.requests:
+            response = await dispatch(app, request, context, item)
+            if response.status >= 400:
+                # Drop whatever the failed sub-request left behind
+                await run_in_threadpool(db.rollback)
+            responses.append(response)
+    metrics.incr("batch.requests", len(responses))
+    return schemas.BatchResponse(responses=responses)
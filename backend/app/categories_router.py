@@ -4,82 +4,189 @@ Categories (Envelopes) Router
 Handles CRUD operations for budget categories/envelopes with monthly spending limits.
 """
 
+from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from . import models, schemas
+from . import alerts, archive, models, recategorize, schemas
 from .deps import get_current_user, get_db
+from .events import RESYNC, broker, category_event, envelope_events
+from .replicas import get_read_db
 
 router = APIRouter()
 
 
-@router.post("", response_model=schemas.CategoryOut, status_code=201)
-async def create_category(
-    category: schemas.CategoryCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
-    """
-    Create a new category/envelope for the current user.
-
-    - **name**: Category name (required)
-    - **monthly_limit_cents**: Optional monthly spending limit in cents
-    - **type**: Category type - 'income' or 'expense' (required)
-    - **is_default**: Whether this is a default category (defaults to False)
+def validate_category_body(
+    db: Session,
+    user: models.User,
+    body: schemas.CategoryCreate,
+    category_id: Optional[UUID] = None,
+) -> None:
+    """Check a create/update body against the business rules.
+
+    Args:
+        db: Database session
+        user: Owner of the category
+        body: Request body
+        category_id: The category being updated (excluded from the
+            duplicate name check), or None for a new category
+
+    Raises:
+        HTTPException: If the type is invalid, the name is taken or the
+            limit is negative (400 Bad Request)
     """
     # Validate type
-    if category.type not in ["income", "expense"]:
+    if body.type not in ["income", "expense"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Category type must be 'income' or 'expense'",
         )
 
     # Check for duplicate category name for this user
-    existing = (
+    duplicate = db.query(models.Category).filter(
+        models.Category.user_id == user.id,
+        func.lower(models.Category.name) == func.lower(body.name),
+    )
+    if category_id is not None:
+        duplicate = duplicate.filter(models.Category.id != category_id)
+    if duplicate.first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Category '{body.name}' already exists",
+        )
+
+    # Validate monthly_limit_cents if provided
+    if body.monthly_limit_cents is not None and body.monthly_limit_cents < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Monthly limit cannot be negative",
+        )
+
+
+def find_category(
+    db: Session, user: models.User, category_id: UUID
+) -> Optional[models.Category]:
+    """Look up one of the user's categories."""
+    return (
         db.query(models.Category)
         .filter(
-            models.Category.user_id == current_user.id,
-            func.lower(models.Category.name) == func.lower(category.name),
+            models.Category.id == category_id,
+            models.Category.user_id == user.id,
         )
         .first()
     )
 
-    if existing:
+
+def create_category_record(
+    db: Session,
+    user: models.User,
+    body: schemas.CategoryCreate,
+    category_id: Optional[UUID] = None,
+) -> models.Category:
+    """Validate and add a new category (the caller commits).
+
+    Args:
+        db: Database session
+        user: Owner of the new category
+        body: Request body
+        category_id: Client-chosen ID (offline sync); generated if None
+    """
+    validate_category_body(db, user, body)
+    db_category = models.Category(
+        user_id=user.id,
+        name=body.name,
+        monthly_limit_cents=body.monthly_limit_cents,
+        type=body.type,
+        is_default=body.is_default,
+    )
+    if category_id is not None:
+        db_category.id = category_id
+    db.add(db_category)
+    db.flush()
+    return db_category
+
+
+def update_category_record(
+    db: Session,
+    user: models.User,
+    db_category: models.Category,
+    body: schemas.CategoryCreate,
+) -> None:
+    """Validate and apply an update to a category (the caller commits)."""
+    validate_category_body(db, user, body, category_id=db_category.id)
+
+    # Update category fields
+    db_category.name = body.name
+    db_category.monthly_limit_cents = body.monthly_limit_cents
+    db_category.type = body.type
+    # Note: is_default is not updated to prevent users from changing default status
+    db.flush()
+
+
+def delete_category_record(db: Session, db_category: models.Category) -> None:
+    """Delete a category if the rules allow it (the caller commits).
+
+    Raises:
+        HTTPException: If the category is a default one or still used by
+            transactions (400 Bad Request)
+    """
+    # Prevent deletion of default categories
+    if db_category.is_default:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Category '{category.name}' already exists",
+            detail="Cannot delete default categories. You can edit them instead.",
         )
 
-    # Validate monthly_limit_cents if provided
-    if category.monthly_limit_cents is not None and category.monthly_limit_cents < 0:
+    # Check if category is used in any transactions. Archived ones count
+    # too: deleting the category would drop their months from the rollup
+    transaction_count = (
+        db.query(models.Transaction)
+        .filter(models.Transaction.category_id == db_category.id)
+        .count()
+    )
+    transaction_count += archive.count(db_category.user_id, db_category.id)
+
+    if transaction_count > 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Monthly limit cannot be negative",
+            detail=f"Cannot delete category. It is used in {transaction_count} transaction(s). "
+            "Merge it into another category (POST /api/categories/{id}/merge_into/"
+            "{target}) or reassign or delete those transactions first.",
         )
 
-    # Create new category
-    db_category = models.Category(
-        user_id=current_user.id,
-        name=category.name,
-        monthly_limit_cents=category.monthly_limit_cents,
-        type=category.type,
-        is_default=category.is_default,
-    )
+    db.delete(db_category)
+    db.flush()
 
-    db.add(db_category)
+
+@router.post("", response_model=schemas.CategoryOut, status_code=201)
+def create_category(
+    category: schemas.CategoryCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Create a new category/envelope for the current user.
+
+    - **name**: Category name (required)
+    - **monthly_limit_cents**: Optional monthly spending limit in cents
+    - **type**: Category type - 'income' or 'expense' (required)
+    - **is_default**: Whether this is a default category (defaults to False)
+    """
+    db_category = create_category_record(db, current_user, category)
     db.commit()
     db.refresh(db_category)
+    broker.publish(current_user.id, category_event("created", db_category))
 
     return db_category
 
 
 @router.get("", response_model=list[schemas.CategoryOut])
-async def list_categories(
+def list_categories(
     type: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """
@@ -107,22 +214,15 @@ async def list_categories(
 
 
 @router.get("/{category_id}", response_model=schemas.CategoryOut)
-async def get_category(
+def get_category(
     category_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """
     Get a specific category/envelope by ID.
     """
-    category = (
-        db.query(models.Category)
-        .filter(
-            models.Category.id == category_id,
-            models.Category.user_id == current_user.id,
-        )
-        .first()
-    )
+    category = find_category(db, current_user, category_id)
 
     if not category:
         raise HTTPException(
@@ -134,7 +234,7 @@ async def get_category(
 
 
 @router.put("/{category_id}", response_model=schemas.CategoryOut)
-async def update_category(
+def update_category(
     category_id: UUID,
     category_update: schemas.CategoryCreate,
     db: Session = Depends(get_db),
@@ -147,14 +247,7 @@ async def update_category(
     - Custom categories can be fully edited
     """
     # Get existing category
-    db_category = (
-        db.query(models.Category)
-        .filter(
-            models.Category.id == category_id,
-            models.Category.user_id == current_user.id,
-        )
-        .first()
-    )
+    db_category = find_category(db, current_user, category_id)
 
     if not db_category:
         raise HTTPException(
@@ -162,55 +255,16 @@ async def update_category(
             detail="Category not found",
         )
 
-    # Validate type
-    if category_update.type not in ["income", "expense"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Category type must be 'income' or 'expense'",
-        )
-
-    # Check for duplicate name (excluding current category)
-    if category_update.name != db_category.name:
-        existing = (
-            db.query(models.Category)
-            .filter(
-                models.Category.user_id == current_user.id,
-                models.Category.id != category_id,
-                func.lower(models.Category.name) == func.lower(category_update.name),
-            )
-            .first()
-        )
-
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Category '{category_update.name}' already exists",
-            )
-
-    # Validate monthly_limit_cents if provided
-    if (
-        category_update.monthly_limit_cents is not None
-        and category_update.monthly_limit_cents < 0
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Monthly limit cannot be negative",
-        )
-
-    # Update category fields
-    db_category.name = category_update.name
-    db_category.monthly_limit_cents = category_update.monthly_limit_cents
-    db_category.type = category_update.type
-    # Note: is_default is not updated to prevent users from changing default status
-
+    update_category_record(db, current_user, db_category, category_update)
     db.commit()
     db.refresh(db_category)
+    broker.publish(current_user.id, category_event("updated", db_category))
 
     return db_category
 
 
 @router.delete("/{category_id}", status_code=204)
-async def delete_category(
+def delete_category(
     category_id: UUID,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
@@ -222,44 +276,84 @@ async def delete_category(
     - Categories with existing transactions cannot be deleted
     """
     # Get category
-    db_category = (
+    db_category = find_category(db, current_user, category_id)
+
+    if not db_category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found",
+        )
+
+    deleted = category_event("deleted", db_category)
+    delete_category_record(db, db_category)
+    db.commit()
+    broker.publish(current_user.id, deleted)
+
+    return None
+
+
+@router.post(
+    "/{category_id}/merge_into/{target_id}", response_model=schemas.CategoryMergeOut
+)
+def merge_category(
+    category_id: UUID,
+    target_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Merge a category into another and delete it.
+
+    Its transactions (archived ones included), recurring rules, monthly
+    totals and, if the target has none, alert thresholds move to the target
+    in one database transaction, however many there are.
+
+    - Default categories cannot be merged away
+    - Both categories must have the same type
+    """
+    # Lock both (in a fixed order) so concurrent merges queue up
+    locked = (
         db.query(models.Category)
         .filter(
-            models.Category.id == category_id,
             models.Category.user_id == current_user.id,
+            models.Category.id.in_([category_id, target_id]),
         )
-        .first()
+        .order_by(models.Category.id)
+        .with_for_update()
+        .all()
     )
-
-    if not db_category:
+    by_id = {category.id: category for category in locked}
+    source, target = by_id.get(category_id), by_id.get(target_id)
+    if not source or not target:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found",
         )
-
-    # Prevent deletion of default categories
-    if db_category.is_default:
+    if source.id == target.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot delete default categories. You can edit them instead.",
+            detail="Cannot merge a category into itself",
         )
-
-    # Check if category is used in any transactions
-    transaction_count = (
-        db.query(models.Transaction)
-        .filter(models.Transaction.category_id == category_id)
-        .count()
-    )
-
-    if transaction_count > 0:
+    if source.is_default:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot delete category. It is used in {transaction_count} transaction(s). "
-            "Please reassign or delete those transactions first.",
+            detail="Cannot merge default categories. Merge others into them instead.",
+        )
+    if source.type != target.type:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot merge an {source.type} category into an "
+            f"{target.type} category",
         )
 
-    # Delete category
-    db.delete(db_category)
+    deleted = category_event("deleted", source)
+    moved, changed = recategorize.merge(db, source, target)
+    alerts.evaluate(db, current_user.id, changed)
+    events = [deleted, RESYNC] + envelope_events(db, changed)
     db.commit()
+    recategorize.merge_archived(current_user.id, category_id, target.id)
+    db.refresh(target)
+    for event in events:
+        broker.publish(current_user.id, event)
 
-    return None
+    return {"category": target, "transactions": moved}
@@ -0,0 +1,239 @@
+"""Delivery channels for queued notification events.
+
+A channel turns one ``Message`` (a claimed ``NotificationEvent`` plus the
+recipient's contact details) into an email, an SMS or an in-app entry. The
+outbox worker (``app.outbox``) picks the channel named by the event's
+``channel`` column. A channel signals a transient failure by raising any
+exception (the event is retried with backoff) and a permanent one by
+raising ``PermanentDeliveryError``.
+
+``default_channels()`` builds the channels from the settings. Without an
+SMTP host or SMS webhook those channels log the message instead, which is
+what local development uses. ``MemoryChannel`` records messages in memory
+for tests.
+"""
+
+import asyncio
+import logging
+import smtplib
+import uuid
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from typing import Optional
+
+import httpx
+
+from .alerts import CATEGORY_THRESHOLD, LOW_BALANCE
+from .config import settings
+from .digests import DIGEST
+from .security import reset_token_for
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_RESET = "PASSWORD_RESET"
+
+
+class PermanentDeliveryError(Exception):
+    """Delivery can never succeed (e.g. no address); do not retry."""
+
+
+@dataclass
+class Message:
+    """A claimed notification event ready for delivery."""
+
+    event_id: uuid.UUID
+    user_id: uuid.UUID
+    kind: str
+    channel: str
+    payload: dict
+    attempts: int = 1
+    email: Optional[str] = None
+    sms_number: Optional[str] = None
+    quiet_hours: Optional[dict] = None
+
+
+def _money(cents) -> str:
+    return f"${(cents or 0) / 100:,.2f}"
+
+
+def render(message: Message) -> tuple[str, str]:
+    """Subject and plain-text body for a message."""
+    payload = message.payload or {}
+    if message.kind == CATEGORY_THRESHOLD:
+        return (
+            "Spending alert",
+            f"You have spent {_money(payload.get('spent_cents'))} in a category "
+            f"this month ({payload.get('month')}), reaching your "
+            f"{_money(payload.get('threshold_cents'))} alert.",
+        )
+    if message.kind == LOW_BALANCE:
+        return (
+            "Low balance",
+            f"Your balance is {_money(payload.get('balance_cents'))}, below your "
+            f"{_money(payload.get('threshold_cents'))} alert.",
+        )
+    if message.kind == PASSWORD_RESET:
+        try:
+            token = reset_token_for(uuid.UUID(payload["reset_token_id"]))
+        except (KeyError, ValueError):
+            raise PermanentDeliveryError("password reset without a token id")
+        return (
+            "Reset your password",
+            "Use this link to reset your password: "
+            f"{settings.frontend_url}/reset-password?token={token}\n\n"
+            "If you did not ask for a password reset, you can ignore this email.",
+        )
+    if message.kind == DIGEST:
+        lines = [
+            f"{c.get('name')}: {_money(c.get('total_cents'))} "
+            f"({'+' if (c.get('delta_cents') or 0) >= 0 else '-'}"
+            f"{_money(abs(c.get('delta_cents') or 0))} vs. the week before)"
+            for c in payload.get("categories", [])
+        ]
+        return (
+            f"Your spending for the week of {payload.get('week')}",
+            f"You spent {_money(payload.get('total_cents'))} "
+            f"(previous week: {_money(payload.get('previous_total_cents'))}).\n\n"
+            + "\n".join(lines),
+        )
+    return message.kind.replace("_", " ").capitalize(), str(payload)
+
+
+class Channel:
+    """Base class for delivery channels."""
+
+    name = "channel"
+
+    async def send(self, message: Message) -> None:
+        """Deliver one message, raising on failure."""
+        raise NotImplementedError
+
+
+class InAppChannel(Channel):
+    """In-app notifications: the event row itself is the user's inbox entry,
+    so delivery only has to mark it sent."""
+
+    name = "inapp"
+
+    async def send(self, message: Message) -> None:
+        return None
+
+
+class LogChannel(Channel):
+    """Logs messages instead of sending them (local development)."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def send(self, message: Message) -> None:
+        subject, body = render(message)
+        to = message.email if self.name == "email" else message.sms_number
+        logger.warning(
+            "[DEV ONLY] %s to %s (no provider configured): %s\n%s",
+            self.name,
+            to,
+            subject,
+            body,
+        )
+
+
+@dataclass
+class MemoryChannel(Channel):
+    """Records messages in ``sent``; fails the first ``fail_times`` sends."""
+
+    name: str = "memory"
+    fail_times: int = 0
+    sent: list[Message] = field(default_factory=list)
+
+    async def send(self, message: Message) -> None:
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError(f"{self.name} unavailable")
+        self.sent.append(message)
+
+
+class SMTPChannel(Channel):
+    """Plain-text email over SMTP (the blocking client runs in a thread)."""
+
+    name = "email"
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        username: str = "",
+        password: str = "",
+        sender: str = "",
+        starttls: bool = True,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.starttls = starttls
+        self.timeout = timeout
+
+    async def send(self, message: Message) -> None:
+        if not message.email:
+            raise PermanentDeliveryError("user has no email address")
+        subject, body = render(message)
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message.email
+        email["Subject"] = subject
+        email.set_content(body)
+        await asyncio.to_thread(self._send, email)
+
+    def _send(self, email: EmailMessage) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(email)
+
+
+class SMSWebhookChannel(Channel):
+    """SMS through an HTTP gateway: POSTs ``{"to", "body"}`` as JSON."""
+
+    name = "sms"
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def send(self, message: Message) -> None:
+        if not message.sms_number:
+            raise PermanentDeliveryError("user has no SMS number")
+        subject, body = render(message)
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.post(
+                self.url, json={"to": message.sms_number, "body": f"{subject}: {body}"}
+            )
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            raise PermanentDeliveryError(f"gateway rejected SMS: {response.text}")
+        response.raise_for_status()
+
+
+def default_channels() -> dict[str, Channel]:
+    """Channels configured from the settings, keyed by channel name."""
+    email = (
+        SMTPChannel(
+            settings.smtp_host,
+            settings.smtp_port,
+            settings.smtp_username,
+            settings.smtp_password,
+            settings.smtp_from,
+            settings.smtp_starttls,
+        )
+        if settings.smtp_host
+        else LogChannel("email")
+    )
+    sms = (
+        SMSWebhookChannel(settings.sms_webhook_url)
+        if settings.sms_webhook_url
+        else LogChannel("sms")
+    )
+    return {"email": email, "sms": sms, "inapp": InAppChannel()}
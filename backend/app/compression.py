@@ -0,0 +1,242 @@
+"""Response compression middleware.
+
+Negotiates brotli (when the optional ``brotli`` package is installed) or gzip
+from the request's ``Accept-Encoding`` header and compresses response bodies
+above a size threshold. Media that is already compressed, such as receipt
+images and PDFs served by ``files_router``, is passed through untouched, and
+individual endpoints can opt out with the ``no_compression`` decorator.
+"""
+
+import zlib
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # brotli is optional; gzip is always available
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Content types that are already compressed (or must not be buffered)
+INCOMPRESSIBLE_TYPE_PREFIXES = ("image/", "audio/", "video/", "font/woff")
+INCOMPRESSIBLE_TYPES = {
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-brotli",
+    "application/octet-stream",
+    "text/event-stream",
+}
+# SVG is text and compresses well even though it lives under image/
+COMPRESSIBLE_IMAGE_TYPES = {"image/svg+xml"}
+
+_EXEMPT_ATTR = "_skip_compression"
+
+
+def no_compression(endpoint: Callable) -> Callable:
+    """Mark an endpoint so its responses are never compressed."""
+    setattr(endpoint, _EXEMPT_ATTR, True)
+    return endpoint
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """Return True if a response with this content type is worth compressing."""
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in COMPRESSIBLE_IMAGE_TYPES:
+        return True
+    if media_type in INCOMPRESSIBLE_TYPES:
+        return False
+    return not media_type.startswith(INCOMPRESSIBLE_TYPE_PREFIXES)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Raw header value, e.g. ``"gzip, br;q=0.8"``
+
+    Returns:
+        ``"br"``, ``"gzip"`` or None if the client accepts neither
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token.strip()] = q
+
+    wildcard = weights.get("*", 0.0)
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.finish()
+
+
+class CompressionMiddleware:
+    """ASGI middleware that gzip/brotli-encodes eligible responses.
+
+    Args:
+        app: The wrapped ASGI application
+        minimum_size: Bodies smaller than this many bytes are sent as-is
+        gzip_level: zlib compression level (1-9)
+        brotli_quality: brotli quality (0-11), used only if brotli is installed
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+    def new_compressor(self, encoding: str):
+        if encoding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+
+class _CompressionResponder:
+    """Per-request send wrapper that decides whether to compress."""
+
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        scope: Scope,
+        send: Send,
+        encoding: str,
+    ) -> None:
+        self.middleware = middleware
+        self.scope = scope
+        self.downstream = send
+        self.encoding = encoding
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressor = None
+
+    def _should_skip(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return True
+        if not is_compressible(headers.get("content-type")):
+            return True
+        # The router stores the matched route on the (shared) scope
+        endpoint = getattr(self.scope.get("route"), "endpoint", None)
+        if getattr(endpoint, _EXEMPT_ATTR, False):
+            return True
+        content_length = headers.get("content-length")
+        if content_length is not None and content_length.isdigit():
+            return int(content_length) < self.middleware.minimum_size
+        return False
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the headers back until we know whether to compress
+            self.initial_message = message
+            self.passthrough = self._should_skip(Headers(raw=message["headers"]))
+            return
+
+        if message_type != "http.response.body":
+            await self.downstream(message)
+            return
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.downstream(self.initial_message)
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            if len(body) < self.middleware.minimum_size and not more_body:
+                # Small single-chunk response: not worth the CPU
+                await self.downstream(self.initial_message)
+                await self.downstream(message)
+                self.passthrough = True
+                return
+
+            self.compressor = self.middleware.new_compressor(self.encoding)
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+
+            data = self.compressor.compress(body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                data += self.compressor.flush()
+                headers["Content-Length"] = str(len(data))
+
+            await self.downstream(self.initial_message)
+            await self.downstream(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+            return
+
+        # Remaining chunks of a streaming response
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.flush()
+        await self.downstream(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
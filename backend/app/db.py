@@ -1,5 +1,6 @@
 import os
 
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -18,7 +19,13 @@ SessionLocal = sessionmaker(
 Base = declarative_base()
 
 
-def get_db():
+def get_db(request: Request):
+    # Sub-requests of POST /api/batch share the batch's session
+    batch = getattr(request.state, "batch", None)
+    if batch is not None:
+        yield batch.db
+        return
+
     db = SessionLocal()
     try:
         yield db
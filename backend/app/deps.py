@@ -1,7 +1,7 @@
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
@@ -43,12 +43,16 @@ def get_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]) -> UUID:
 
 
 def get_current_user(
+    request: Request,
     db: Annotated[Session, Depends(get_db)],
     user_id: Annotated[UUID, Depends(get_current_user_id)],
 ) -> User:
     """Get the current authenticated user from the database.
 
+    Sub-requests of ``POST /api/batch`` reuse the user the batch loaded.
+
     Args:
+        request: The incoming request
         db: Database session
         user_id: User's UUID from JWT token
 
@@ -58,6 +62,10 @@ def get_current_user(
     Raises:
         HTTPException: If the user is not found
     """
+    batch = getattr(request.state, "batch", None)
+    if batch is not None:
+        return batch.user
+
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise HTTPException(
@@ -65,3 +73,18 @@ def get_current_user(
             detail="User not found",
         )
     return user
+
+
+def require_admin(
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> User:
+    """Get the current user, who must be an admin.
+
+    Raises:
+        HTTPException: If the user is not an admin (403 Forbidden)
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+    return current_user
@@ -0,0 +1,193 @@
+"""Weekly spending digests for every user.
+
+For the last complete ISO week (Monday to Monday, UTC) each user with
+expenses in that week or the one before gets a ``DIGEST`` notification
+event whose payload holds per-category totals and week-over-week deltas.
+The outbox worker (``app.outbox``) delivers them.
+
+Users are processed in chunks of consecutive user IDs. Each chunk is a
+single ``INSERT ... SELECT`` that aggregates the chunk's transactions for
+both weeks (served by the ``(user_id, occurred_at)`` covering index and
+pruned to the relevant monthly partitions) and writes the queued events,
+so the job issues a few statements per chunk rather than one per user.
+
+Progress is checkpointed in ``digest_runs``: the chunk's events and the
+advanced ``last_user_id`` are committed together, so after a crash the
+next run resumes at the first unprocessed user. The checkpoint row is
+locked for each chunk (``SKIP LOCKED``), which lets concurrent schedulers
+take turns instead of duplicating work, and ``dedupe_key`` makes a replayed
+chunk harmless anyway.
+
+Usage:
+    python -m app.digests [--week 2024-06-03] [--chunk-size 500]
+"""
+
+import argparse
+import logging
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .db import engine
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DIGEST = "DIGEST"
+
+# Lower bound for the first chunk (every uuid4 sorts after it)
+NIL_UUID = uuid.UUID(int=0)
+
+START_RUN = text(
+    "INSERT INTO digest_runs (week) VALUES (:week) ON CONFLICT (week) DO NOTHING"
+)
+LOCK_RUN = text(
+    "SELECT last_user_id, finished_at FROM digest_runs WHERE week = :week "
+    "FOR UPDATE SKIP LOCKED"
+)
+NEXT_CHUNK = text(
+    "SELECT id FROM ("
+    "SELECT id FROM users WHERE id > :after ORDER BY id LIMIT :chunk_size"
+    ") chunk ORDER BY id DESC LIMIT 1"
+)
+INSERT_DIGESTS = text(
+    """
+    WITH spend AS (
+        SELECT t.user_id, t.category_id,
+               coalesce(sum(t.amount_cents)
+                        FILTER (WHERE t.occurred_at >= :start), 0) AS total,
+               coalesce(sum(t.amount_cents)
+                        FILTER (WHERE t.occurred_at < :start), 0) AS previous
+        FROM transactions t
+        WHERE t.user_id > :after AND t.user_id <= :upto
+          AND t.type = 'expense'
+          AND t.occurred_at >= :previous_start AND t.occurred_at < :end
+        GROUP BY t.user_id, t.category_id
+    ),
+    digests AS (
+        SELECT s.user_id,
+               jsonb_build_object(
+                   'week', CAST(:week AS text),
+                   'total_cents', sum(s.total),
+                   'previous_total_cents', sum(s.previous),
+                   'delta_cents', sum(s.total - s.previous),
+                   'categories', jsonb_agg(
+                       jsonb_build_object(
+                           'category_id', s.category_id,
+                           'name', coalesce(c.name, 'Uncategorized'),
+                           'total_cents', s.total,
+                           'previous_cents', s.previous,
+                           'delta_cents', s.total - s.previous
+                       )
+                       ORDER BY s.total DESC, c.name
+                   )
+               ) AS payload
+        FROM spend s
+        LEFT JOIN categories c ON c.id = s.category_id
+        GROUP BY s.user_id
+    )
+    INSERT INTO notification_events
+        (id, user_id, kind, channel, payload, dedupe_key, status)
+    SELECT gen_random_uuid(), d.user_id, 'DIGEST', ch.channel, d.payload,
+           'DIGEST:' || d.user_id || ':' || CAST(:week AS text) || ':' || ch.channel,
+           'queued'
+    FROM digests d
+    LEFT JOIN notification_preferences p ON p.user_id = d.user_id
+    CROSS JOIN (VALUES ('inapp'), ('email')) AS ch (channel)
+    WHERE ch.channel = 'inapp' OR coalesce(p.email_enabled, true)
+    ON CONFLICT (dedupe_key) DO NOTHING
+    """
+)
+ADVANCE_RUN = text(
+    "UPDATE digest_runs SET last_user_id = :upto, events = events + :events "
+    "WHERE week = :week"
+)
+FINISH_RUN = text("UPDATE digest_runs SET finished_at = now() WHERE week = :week")
+
+
+def last_complete_week(now: datetime) -> date:
+    """Monday (UTC) starting the most recent full week before ``now``."""
+    today = now.astimezone(timezone.utc).date()
+    return today - timedelta(days=today.weekday() + 7)
+
+
+def generate_digests(
+    week: Optional[date] = None,
+    chunk_size: Optional[int] = None,
+    bind: Engine = engine,
+) -> int:
+    """Queue digest events for ``week``, resuming from the last checkpoint.
+
+    Args:
+        week: Monday starting the week (defaults to the last complete week)
+        chunk_size: Users per chunk (defaults to settings.digest_chunk_size)
+        bind: Engine to use
+
+    Returns:
+        Number of events queued by this call (0 if the week was already
+        done or another worker holds the run)
+    """
+    week = week or last_complete_week(datetime.now(timezone.utc))
+    chunk_size = chunk_size or settings.digest_chunk_size
+    start = datetime.combine(week, datetime.min.time(), tzinfo=timezone.utc)
+    params = {
+        "week": week.isoformat(),
+        "start": start,
+        "previous_start": start - timedelta(days=7),
+        "end": start + timedelta(days=7),
+    }
+
+    with bind.begin() as conn:
+        conn.execute(START_RUN, {"week": week})
+
+    queued = 0
+    while True:
+        with metrics.timer("digests.chunk"), bind.begin() as conn:
+            run = conn.execute(LOCK_RUN, {"week": week}).first()
+            if run is None:
+                logger.info("Digest run for %s is busy in another worker", week)
+                break
+            if run.finished_at is not None:
+                break
+
+            after = run.last_user_id or NIL_UUID
+            upto = conn.execute(
+                NEXT_CHUNK, {"after": after, "chunk_size": chunk_size}
+            ).scalar()
+            if upto is None:
+                conn.execute(FINISH_RUN, {"week": week})
+                logger.info("Digest run for %s finished", week)
+                break
+
+            events = conn.execute(
+                INSERT_DIGESTS, {**params, "after": after, "upto": upto}
+            ).rowcount
+            conn.execute(ADVANCE_RUN, {"week": week, "upto": upto, "events": events})
+
+        queued += events
+        metrics.incr("digests.chunks")
+        metrics.incr("digests.queued", events)
+    return queued
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--week", type=date.fromisoformat, help="Monday, YYYY-MM-DD")
+    parser.add_argument("--chunk-size", type=int, default=settings.digest_chunk_size)
+    args = parser.parse_args()
+    if args.week and args.week.weekday() != 0:
+        parser.error("--week must be a Monday")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = time.perf_counter()
+    queued = generate_digests(args.week, args.chunk_size)
+    print(f"{queued} digest events queued in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
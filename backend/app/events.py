@@ -0,0 +1,281 @@
+"""Live update events pushed to the dashboard over Server-Sent Events.
+
+Writers publish small delta messages for a user (``transaction.created``,
+``envelope.usage`` and so on) after they commit; ``GET /api/events``
+(``app.events_router``) streams them to every connection that user has
+open.
+
+Two brokers are available, chosen with ``EVENTS_BACKEND``:
+
+* ``memory`` (default): in-process fan-out, enough for a single worker.
+* ``postgres``: ``publish`` sends ``pg_notify`` and every worker LISTENs on
+  a dedicated connection, so an event published by any uvicorn worker (or
+  replica of the API) reaches connections held by all of them.
+
+Each connection has a bounded queue. A client that cannot keep up loses
+its backlog and gets a single ``resync`` event telling it to refetch,
+rather than letting the queue grow without limit.
+
+Publishers run on the threadpool (sync routes) as well as on the event
+loop, so ``publish`` only ever hands the event to the loop thread.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models, rollups
+from .config import settings
+from .db import engine
+from .metrics import metrics
+from .rollups import MonthTotal
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "app_events"
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    """One open event stream: a bounded queue of events for one user."""
+
+    def __init__(self, user_id: uuid.UUID, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, event: dict) -> None:
+        """Queue an event; on overflow, replace the backlog with a resync."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            metrics.incr("events.dropped", self.queue.qsize())
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """In-process pub/sub keyed by user ID.
+
+    Args:
+        queue_size: Maximum events buffered per connection
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions: dict[uuid.UUID, set[Subscription]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        metrics.register_gauge(
+            "events.connections",
+            lambda: sum(len(subs) for subs in self._subscriptions.values()),
+        )
+
+    async def start(self) -> None:
+        """Bind to the running event loop (call on app startup)."""
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self) -> None:
+        self._loop = None
+
+    def subscribe(self, user_id: uuid.UUID) -> Subscription:
+        """Open a subscription (call from the event loop)."""
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: uuid.UUID, event: dict) -> None:
+        """Send ``event`` to the user's open streams (safe from any thread)."""
+        metrics.incr("events.published")
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._deliver, user_id, event)
+
+    def _deliver(self, user_id: uuid.UUID, event: dict) -> None:
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            subscription.put(event)
+
+
+class PostgresBroker(LocalBroker):
+    """Fan-out across workers through Postgres LISTEN/NOTIFY.
+
+    Args:
+        queue_size: Maximum events buffered per connection
+        bind: Engine used to publish and to open the listening connection
+        reconnect_seconds: Delay before re-LISTENing after a lost connection
+    """
+
+    def __init__(self, queue_size: int, bind: Engine, reconnect_seconds: float = 5):
+        super().__init__(queue_size)
+        self.bind = bind
+        self.reconnect_seconds = reconnect_seconds
+        self._listener = None
+        self._reconnect: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await super().start()
+        try:
+            await asyncio.to_thread(self._listen)
+        except Exception:
+            logger.exception("Could not LISTEN for events; retrying")
+            self._schedule_reconnect()
+
+    async def stop(self) -> None:
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        self._close_listener()
+        await super().stop()
+
+    def publish(self, user_id: uuid.UUID, event: dict) -> None:
+        """NOTIFY every worker; blocks on the database, so call it from sync
+        routes or a thread, never on the event loop."""
+        metrics.incr("events.published")
+        payload = json.dumps({"user_id": str(user_id), "event": event}, default=str)
+        with self.bind.connect() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": NOTIFY_CHANNEL, "payload": payload},
+            )
+            conn.commit()
+
+    def _listen(self) -> None:
+        raw = self.bind.raw_connection()
+        connection = raw.driver_connection
+        raw.detach()  # a long-lived LISTEN connection stays out of the pool
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        self._listener = connection
+        self._loop.call_soon_threadsafe(
+            self._loop.add_reader, connection.fileno(), self._on_readable
+        )
+
+    def _on_readable(self) -> None:
+        connection = self._listener
+        try:
+            connection.poll()
+        except Exception:
+            logger.exception("Lost the events LISTEN connection")
+            self._close_listener()
+            self._schedule_reconnect()
+            return
+        while connection.notifies:
+            notify = connection.notifies.pop(0)
+            try:
+                message = json.loads(notify.payload)
+                self._deliver(uuid.UUID(message["user_id"]), message["event"])
+            except (ValueError, KeyError):
+                logger.warning("Ignoring malformed event %r", notify.payload)
+
+    def _close_listener(self) -> None:
+        if self._listener is None:
+            return
+        if self._loop is not None:
+            try:
+                self._loop.remove_reader(self._listener.fileno())
+            except Exception:  # the socket may already be gone
+                pass
+        try:
+            self._listener.close()
+        except Exception:
+            pass
+        self._listener = None
+
+    def _schedule_reconnect(self) -> None:
+        async def reconnect():
+            await asyncio.sleep(self.reconnect_seconds)
+            await self.start()
+
+        if self._loop is not None:
+            self._reconnect = self._loop.create_task(reconnect())
+
+
+def make_broker() -> LocalBroker:
+    """Broker selected by ``settings.events_backend``."""
+    if settings.events_backend == "postgres":
+        return PostgresBroker(settings.events_queue_size, engine)
+    return LocalBroker(settings.events_queue_size)
+
+
+broker = make_broker()
+
+
+def transaction_event(kind: str, transaction: models.Transaction) -> dict:
+    """Delta message for a created, updated or deleted transaction."""
+    return {
+        "type": f"transaction.{kind}",
+        "id": str(transaction.id),
+        "transaction_type": transaction.type,
+        "amount_cents": transaction.amount_cents,
+        "category_id": (
+            str(transaction.category_id) if transaction.category_id else None
+        ),
+        "occurred_at": transaction.occurred_at.isoformat(),
+    }
+
+
+def category_event(kind: str, category: models.Category) -> dict:
+    """Delta message for a created, updated or deleted category."""
+    return {
+        "type": f"category.{kind}",
+        "id": str(category.id),
+        "name": category.name,
+        "category_type": category.type,
+        "monthly_limit_cents": category.monthly_limit_cents,
+    }
+
+
+def envelope_events(
+    db: Session, changed: Iterable[MonthTotal], now: Optional[datetime] = None
+) -> list[dict]:
+    """``envelope.usage`` messages for this month's changed expense totals.
+
+    The spent amount comes straight from the rollup rows the write updated,
+    so this costs one lookup of the categories' names and limits.
+    """
+    month = rollups.month_of(now or datetime.now(timezone.utc))
+    spent = {
+        total.category_id: total.total_cents
+        for total in changed
+        if total.month == month
+        and total.type == "expense"
+        and total.category_id is not None
+    }
+    if not spent:
+        return []
+    categories = (
+        db.query(models.Category).filter(models.Category.id.in_(list(spent))).all()
+    )
+    events = []
+    for category in categories:
+        limit = category.monthly_limit_cents
+        events.append(
+            {
+                "type": "envelope.usage",
+                "category_id": str(category.id),
+                "name": category.name,
+                "month": f"{month:%Y-%m}",
+                "spent_cents": spent[category.id],
+                "limit_cents": limit,
+                "percent_used": (
+                    round(100 * spent[category.id] / limit, 1) if limit else None
+                ),
+            }
+        )
+    return events
@@ -0,0 +1,85 @@
+import asyncio
+import json
+from typing import Annotated, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+
+from .config import settings
+from .deps import get_current_user_id
+from .events import broker
+
+router = APIRouter(prefix="/api", tags=["events"])
+
+optional_oauth2 = OAuth2PasswordBearer(tokenUrl="api/login", auto_error=False)
+
+
+def get_stream_user_id(
+    header_token: Annotated[Optional[str], Depends(optional_oauth2)],
+    access_token: Annotated[Optional[str], Query()] = None,
+) -> UUID:
+    """Authenticate an event stream.
+
+    Browsers' ``EventSource`` cannot send an Authorization header, so the
+    access token may also be passed as the ``access_token`` query parameter.
+
+    Raises:
+        HTTPException: If no valid token is given (401 Unauthorized)
+    """
+    token = header_token or access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return get_current_user_id(token)
+
+
+def format_event(event: dict) -> str:
+    """Encode one event in the text/event-stream format."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@router.get("/events")
+async def stream_events(
+    user_id: Annotated[UUID, Depends(get_stream_user_id)],
+):
+    """Stream live updates for the current user as Server-Sent Events.
+
+    Events are small deltas such as ``transaction.created`` or
+    ``envelope.usage`` (a category's month-to-date spend against its limit).
+    A ``resync`` event means updates were dropped because the client fell
+    behind, and it should refetch. A comment line is sent every
+    ``EVENTS_HEARTBEAT_SECONDS`` to keep proxies from closing the stream.
+
+    Args:
+        user_id: User from the bearer token or ``access_token`` parameter
+
+    Returns:
+        A ``text/event-stream`` response that stays open
+    """
+    subscription = broker.subscribe(user_id)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:  # cancelled by Starlette when the client disconnects
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), settings.events_heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from fastapi.responses import FileResponse
 
 from . import models
+from .compression import no_compression
 from .deps import get_current_user
 
 router = APIRouter(prefix="/api/files", tags=["files"])
@@ -70,6 +71,7 @@ async def upload_receipt(
 
 
 @router.get("/receipts/{filename}")
+@no_compression
 async def get_receipt(
     filename: str,
     current_user: models.User = Depends(get_current_user),
@@ -0,0 +1,35 @@
+"""Month-end spending forecasts per envelope (see ``app.analytics``)."""
+
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from . import analytics, models, schemas
+from .deps import get_current_user
+from .transactions_router import get_caught_up_read_db
+
+router = APIRouter(prefix="/api/forecast", tags=["forecast"])
+
+
+@router.get("", response_model=schemas.ForecastResponse)
+def get_forecast(
+    db: Annotated[Session, Depends(get_caught_up_read_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    method: str = Query("average", pattern=f"^({'|'.join(analytics.METHODS)})$"),
+    window: Optional[int] = Query(None, ge=7, le=90),
+):
+    """
+    Forecast this month's spending in each expense category.
+
+    - **method**: 'average' (moving average of the last `window` days),
+      'trend' (linear fit over the same days) or 'weekday' (typical spend
+      for each day of the week)
+    - **window**: Days of history for 'average' and 'trend' (default 28)
+
+    Each envelope reports what was spent so far this month (UTC), the
+    projected month-end total, and `overspend_on`: the day spending passes
+    the monthly limit at this pace (null if it stays within the limit or
+    the category has none).
+    """
+    return analytics.forecast_envelopes(db, current_user, method=method, window=window)
@@ -0,0 +1,133 @@
+"""Idempotency keys for retried writes.
+
+A client that may retry a write (flaky mobile networks) sends an
+``Idempotency-Key`` header with a unique value such as a UUID. The first
+request with a key claims it by inserting a row into ``idempotency_keys``
+in the same database transaction as the write, and stores its response
+there before committing. A retry finds the committed row and gets the
+stored response back, marked ``Idempotent-Replayed: true``, before its body
+is validated and without writing anything.
+
+Requests racing with the same key are serialized by the table's primary
+key: the second insert waits for the first transaction and replays its
+response once it commits. Error responses roll back, which frees the key
+so the retry runs normally.
+
+Keys are per user and expire after ``settings.idempotency_key_ttl_hours``
+(purged by ``app.purge``). Reusing a key for a different request is an
+error (422).
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Any, Optional
+
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .db import get_db
+from .deps import get_current_user
+from .metrics import metrics
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotentReplay(Exception):
+    """Raised to answer a retry with the stored response (see ``app.main``)."""
+
+    def __init__(self, status_code: int, content: Any):
+        self.status_code = status_code
+        self.content = content
+
+
+class Idempotency:
+    """Handle on the key claimed for this request (if the client sent one)."""
+
+    def __init__(self, record: Optional[models.IdempotencyKey] = None):
+        self.record = record
+
+    def save(self, status_code: int, content: Any = None) -> None:
+        """Store the response; call before the request's transaction commits."""
+        if self.record is not None:
+            self.record.status_code = status_code
+            self.record.response = jsonable_encoder(content)
+
+
+async def request_fingerprint(request: Request) -> str:
+    """Hash of the method, path and raw body, to detect reused keys."""
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+def _replay(record: models.IdempotencyKey, fingerprint: str):
+    if record.request_hash != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    metrics.incr("idempotency.replayed")
+    raise IdempotentReplay(record.status_code, record.response)
+
+
+def claim_idempotency_key(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    fingerprint: Annotated[str, Depends(request_fingerprint)],
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+) -> Idempotency:
+    """Claim the request's ``Idempotency-Key``, or replay its stored response.
+
+    Args:
+        db: The request's database session (the route commits the claim)
+        current_user: The authenticated user (keys are per user)
+        fingerprint: Hash of the request, from ``request_fingerprint``
+        idempotency_key: The ``Idempotency-Key`` header, if sent
+
+    Returns:
+        A handle whose ``save`` records the route's response
+
+    Raises:
+        IdempotentReplay: If the key was already used for this request
+        HTTPException: If the key is invalid (400) or was used for a
+            different request (422)
+    """
+    if idempotency_key is None:
+        return Idempotency()
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters",
+        )
+
+    user_id = current_user.id
+    now = datetime.now(timezone.utc)
+    record = db.get(models.IdempotencyKey, (user_id, idempotency_key))
+    if record is not None:
+        if record.expires_at > now:
+            _replay(record, fingerprint)
+        db.delete(record)  # expired but not purged yet
+
+    record = models.IdempotencyKey(
+        user_id=user_id,
+        key=idempotency_key,
+        request_hash=fingerprint,
+        expires_at=now + timedelta(hours=settings.idempotency_key_ttl_hours),
+    )
+    db.add(record)
+    try:
+        db.flush()  # waits here while a concurrent request holds the key
+    except IntegrityError:
+        db.rollback()
+        record = db.get(models.IdempotencyKey, (user_id, idempotency_key))
+        if record is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is in progress",
+            )
+        _replay(record, fingerprint)
+    return Idempotency(record)
@@ -0,0 +1,355 @@
+"""Index advisor for the transaction list and aggregate query shapes.
+
+Enumerates the filter/sort combinations ``GET /api/transactions`` and
+``GET /api/transactions/aggregates`` can produce, for a regular user and
+for an admin (no user filter), builds each query with the endpoints' own
+query builders and runs ``EXPLAIN (FORMAT JSON)`` against a synthetic
+dataset. Plans that sequentially scan a large transactions partition or
+sort a large input are flagged.
+
+Each candidate index in CANDIDATES is then created inside a transaction
+that is rolled back, and the shapes are re-planned to show which flags it
+removes and how much estimated cost it saves. Plans are compared on
+estimated cost, so run the advisor on a database with realistic data or
+let it load the synthetic set.
+
+The synthetic users (``advisor-N@advisor.invalid``) and their rows are
+deleted afterwards. Missing monthly partitions for the last year are
+created (and kept), and ``transactions`` is vacuumed so index-only scans
+can be planned: run this against a development database.
+
+Usage:
+    python -m app.index_advisor [--users 20] [--rows-per-user 5000]
+        [--min-rows 1000] [--verbose]
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import engine
+from .partitions import add_months, ensure_partitions
+from .transactions_router import (
+    LIST_SORT_COLUMNS,
+    build_aggregate_query,
+    build_list_query,
+    category_totals,
+    period_totals,
+)
+
+EMAIL_DOMAIN = "advisor.invalid"
+CATEGORIES_PER_USER = 8
+PAGE_SIZE = 50
+
+# Indexes the advisor evaluates (name -> CREATE INDEX statement)
+CANDIDATES = {
+    "ix_transactions_user_amount": (
+        "CREATE INDEX ix_transactions_user_amount "
+        "ON transactions (user_id, amount_cents)"
+    ),
+    "ix_transactions_occurred_at": (
+        "CREATE INDEX ix_transactions_occurred_at ON transactions (occurred_at)"
+    ),
+    "ix_transactions_amount": (
+        "CREATE INDEX ix_transactions_amount ON transactions (amount_cents)"
+    ),
+    "ix_transactions_category": (
+        "CREATE INDEX ix_transactions_category ON transactions (category_id)"
+    ),
+    "ix_transactions_user_occurred_covering": (
+        "CREATE INDEX ix_transactions_user_occurred_covering "
+        "ON transactions (user_id, occurred_at) "
+        "INCLUDE (type, category_id, amount_cents, id)"
+    ),
+}
+
+
+@dataclass
+class PlanReport:
+    """Summary of one EXPLAIN plan."""
+
+    cost: float
+    access: list[str] = field(default_factory=list)
+    flags: list[str] = field(default_factory=list)
+
+
+def load_synthetic_data(conn: Connection, users: int, rows_per_user: int) -> None:
+    """Insert synthetic users, categories and a year of transactions."""
+    conn.execute(
+        text(
+            """
+            INSERT INTO users (id, email, password_hash, role)
+            SELECT md5('advisor-user-' || g)::uuid,
+                   'advisor-' || g || '@' || :domain, 'x', 'student'
+            FROM generate_series(1, :users) AS g
+            """
+        ),
+        {"users": users, "domain": EMAIL_DOMAIN},
+    )
+    conn.execute(
+        text(
+            """
+            INSERT INTO categories (id, user_id, name, type, is_default)
+            SELECT md5(u.id::text || k)::uuid, u.id, 'Category ' || k,
+                   'expense', false
+            FROM users u, generate_series(0, :n - 1) AS k
+            WHERE u.email LIKE '%@' || :domain
+            """
+        ),
+        {"n": CATEGORIES_PER_USER, "domain": EMAIL_DOMAIN},
+    )
+    conn.execute(
+        text(
+            """
+            INSERT INTO transactions
+                (user_id, category_id, type, amount_cents, occurred_at, description)
+            SELECT u.id,
+                   md5(u.id::text || (g % :n))::uuid,
+                   CASE WHEN g % 10 = 0 THEN 'income' ELSE 'expense' END,
+                   100 + (random() * 20000)::int,
+                   now() - random() * interval '365 days',
+                   'Advisor row ' || g
+            FROM users u, generate_series(1, :rows) AS g
+            WHERE u.email LIKE '%@' || :domain
+            """
+        ),
+        {"rows": rows_per_user, "n": CATEGORIES_PER_USER, "domain": EMAIL_DOMAIN},
+    )
+
+
+def delete_synthetic_data(conn: Connection) -> None:
+    """Remove the synthetic users (their rows go with them via cascades)."""
+    conn.execute(
+        text("DELETE FROM users WHERE email LIKE :pattern"),
+        {"pattern": f"%@{EMAIL_DOMAIN}"},
+    )
+
+
+def query_shapes(user_id: uuid.UUID):
+    """Yield (label, build) for every query shape to check.
+
+    ``build`` takes a Session and returns the SQLAlchemy query the endpoint
+    would run for that shape.
+    """
+    now = datetime.now(timezone.utc)
+    category_id = _md5_uuid(f"{user_id}3")
+    filters = {
+        "no filter": {},
+        "type": {"type": "expense"},
+        "category": {"category_id": category_id},
+        "dates": {"start_date": now - timedelta(days=30), "end_date": now},
+        "amounts": {"min_amount": 1000, "max_amount": 5000},
+    }
+    scopes = {
+        "user": models.User(id=user_id, role="student"),
+        "admin": models.User(id=uuid.uuid4(), role="admin"),
+    }
+
+    for (scope, user), (name, kwargs), sort_by, order in itertools.product(
+        scopes.items(), filters.items(), LIST_SORT_COLUMNS, ("desc", "asc")
+    ):
+        label = f"list  {scope:<5} {name:<9} sort {sort_by} {order}"
+        yield label, lambda db, u=user, k=kwargs, s=sort_by, o=order: (
+            build_list_query(db, u, sort_by=s, sort_order=o, **k).limit(PAGE_SIZE)
+        )
+
+    aggregate_filters = {
+        name: kwargs
+        for name, kwargs in filters.items()
+        if name in ("no filter", "type", "dates")
+    }
+    for (scope, user), (name, kwargs), group_by in itertools.product(
+        scopes.items(), aggregate_filters.items(), ("category", "period")
+    ):
+        label = f"aggr  {scope:<5} {name:<9} by {group_by}"
+        if group_by == "category":
+            yield label, lambda db, u=user, k=kwargs: category_totals(
+                build_aggregate_query(db, u, **k)
+            )
+        else:
+            yield label, lambda db, u=user, k=kwargs: period_totals(
+                build_aggregate_query(db, u, **k), "monthly"
+            )
+
+
+def _md5_uuid(value: str) -> uuid.UUID:
+    """Python twin of the SQL ``md5(value)::uuid`` used for synthetic ids."""
+    return uuid.UUID(hashlib.md5(value.encode()).hexdigest())
+
+
+def explain(conn: Connection, query) -> dict:
+    """Return the JSON plan of a SQLAlchemy query."""
+    compiled = query.statement.compile(dialect=conn.dialect)
+    result = conn.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    plan = result if isinstance(result, list) else json.loads(result)
+    return plan[0]["Plan"]
+
+
+def analyze_plan(plan: dict, table_rows: dict[str, float], min_rows: int) -> PlanReport:
+    """Walk a plan tree, recording scans and flagging costly nodes.
+
+    Args:
+        plan: Root node of a JSON plan
+        table_rows: Estimated row count per relation (pg_class.reltuples)
+        min_rows: Ignore sequential scans and sorts smaller than this
+
+    Returns:
+        PlanReport for the plan
+    """
+    report = PlanReport(cost=plan["Total Cost"])
+    seq_scanned = []
+
+    def walk(node):
+        node_type = node["Node Type"]
+        relation = node.get("Relation Name", "")
+        if node_type == "Seq Scan" and relation.startswith("transactions"):
+            if table_rows.get(relation, 0) >= min_rows:
+                seq_scanned.append(relation)
+        elif "Index" in node_type and relation.startswith("transactions"):
+            report.access.append(f"{node_type} using {node['Index Name']}")
+        elif node_type == "Sort" and node["Plan Rows"] >= min_rows:
+            keys = ", ".join(node.get("Sort Key", []))
+            report.flags.append(f"Sort ({keys}) of ~{node['Plan Rows']} rows")
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    if seq_scanned:
+        rows = sum(table_rows[name] for name in seq_scanned)
+        report.flags.insert(
+            0, f"Seq Scan on {len(seq_scanned)} partition(s), ~{rows:.0f} rows"
+        )
+    return report
+
+
+def plan_all(
+    conn: Connection, shapes, table_rows: dict[str, float], min_rows: int
+) -> dict[str, PlanReport]:
+    """EXPLAIN every shape on ``conn``."""
+    db = Session(bind=conn)
+    return {
+        label: analyze_plan(explain(conn, build(db)), table_rows, min_rows)
+        for label, build in shapes
+    }
+
+
+def _table_rows(conn: Connection) -> dict[str, float]:
+    rows = conn.execute(
+        text(
+            "SELECT relname, reltuples FROM pg_class "
+            "WHERE relname LIKE 'transactions%' AND relkind = 'r'"
+        )
+    )
+    return {name: tuples for name, tuples in rows}
+
+
+def _print_report(label: str, report: PlanReport, verbose: bool) -> None:
+    marker = "!!" if report.flags else "  "
+    print(f"{marker} {label:<50} cost {report.cost:>10.0f}")
+    for flag in report.flags:
+        print(f"     - {flag}")
+    if verbose:
+        for access in sorted(set(report.access)):
+            print(f"       {access}")
+
+
+def evaluate_candidates(
+    conn: Connection,
+    shapes,
+    baseline: dict[str, PlanReport],
+    table_rows: dict[str, float],
+    min_rows: int,
+    only: Optional[list[str]] = None,
+) -> None:
+    """Create each candidate index in a rolled-back transaction and compare."""
+    for name, ddl in CANDIDATES.items():
+        if only and name not in only:
+            continue
+        exists = conn.execute(
+            text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+        ).scalar()
+        if exists:
+            print(f"\n{name}: already exists")
+            continue
+
+        transaction = conn.begin_nested()
+        conn.execute(text(ddl))
+        conn.execute(text("ANALYZE transactions"))
+        reports = plan_all(conn, shapes, table_rows, min_rows)
+        transaction.rollback()
+
+        fixed = [
+            label
+            for label, report in reports.items()
+            if len(report.flags) < len(baseline[label].flags)
+        ]
+        cheaper = [
+            (label, 1 - report.cost / baseline[label].cost)
+            for label, report in reports.items()
+            if baseline[label].cost and report.cost < 0.7 * baseline[label].cost
+        ]
+        print(
+            f"\n{name}: clears flags on {len(fixed)} shapes, "
+            f">30% cheaper on {len(cheaper)}"
+        )
+        for label in fixed:
+            print(f"     fixed   {label}")
+        for label, saving in cheaper:
+            if label not in fixed:
+                print(f"     cheaper {label} (-{saving:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rows-per-user", type=int, default=5000)
+    parser.add_argument("--min-rows", type=int, default=1000)
+    parser.add_argument("--candidate", action="append", help="only evaluate these")
+    parser.add_argument("--verbose", action="store_true", help="show index usage")
+    args = parser.parse_args()
+
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    ensure_partitions(engine, add_months(this_month, -12), this_month)
+
+    with engine.begin() as conn:
+        load_synthetic_data(conn, args.users, args.rows_per_user)
+    try:
+        # VACUUM sets the visibility map so index-only scans can be planned
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE transactions"))
+
+        user_id = _md5_uuid("advisor-user-1")
+        shapes = list(query_shapes(user_id))
+        with engine.connect() as conn:
+            table_rows = _table_rows(conn)
+            baseline = plan_all(conn, shapes, table_rows, args.min_rows)
+            print(f"== {len(shapes)} query shapes, current indexes\n")
+            for label, report in baseline.items():
+                _print_report(label, report, args.verbose)
+            flagged = sum(1 for r in baseline.values() if r.flags)
+            print(f"\n{flagged} of {len(shapes)} shapes flagged")
+
+            print("\n== candidate indexes")
+            evaluate_candidates(
+                conn, shapes, baseline, table_rows, args.min_rows, args.candidate
+            )
+            conn.rollback()
+    finally:
+        with engine.begin() as conn:
+            delete_synthetic_data(conn)
+
+
+if __name__ == "__main__":
+    main()
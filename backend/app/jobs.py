@@ -0,0 +1,375 @@
+"""Background jobs for work too slow for a request.
+
+An endpoint queues a row in ``jobs`` with ``submit`` and answers ``202
+Accepted`` with the job; the client polls the job until it has a result.
+Each kind of job has a handler registered with ``register``, which takes
+a ``JobContext`` (the job's JSON params, among others) and returns its
+JSON result.
+
+``run_pending`` works through the queue, claiming one job at a time with::
+
+    UPDATE jobs SET status = 'running', lease_until = now() + <lease>, ...
+    WHERE id = (SELECT id FROM jobs WHERE <queued or lease expired>
+                LIMIT 1 FOR UPDATE SKIP LOCKED)
+
+so concurrent workers never run the same job, and a job whose worker died
+is picked up again once its lease runs out (up to
+``settings.job_max_attempts`` times). Claimed jobs run in a ``WorkerPool``
+of ``settings.job_workers`` processes, which caps how many run at once and
+keeps CPU-heavy handlers off the API's threads; ``run_pending`` only claims
+as many jobs as the pool has free processes. It runs on the app scheduler
+every ``settings.job_poll_seconds`` or from the command line. Finished jobs
+are purged after ``settings.job_retention_days`` (``app.purge``).
+
+Long handlers call ``JobContext.progress`` now and then: it records the
+percentage done for pollers, extends the lease, and raises ``JobCancelled``
+once ``cancel`` has been called on the job, so the handler can clean up
+and stop.
+
+Usage:
+    python -m app.jobs [--workers N]
+"""
+
+import argparse
+import importlib
+import logging
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .db import engine
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLAIM = text(
+    """
+    UPDATE jobs j
+    SET status = 'running', attempts = j.attempts + 1, started_at = now(),
+        lease_until = now() + make_interval(secs => :lease)
+    FROM (
+        SELECT id FROM jobs
+        WHERE status = 'queued' OR (status = 'running' AND lease_until < now())
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) due
+    WHERE j.id = due.id
+    RETURNING j.id, j.user_id, j.kind, j.params, j.attempts
+    """
+)
+FINISH = text(
+    "UPDATE jobs SET status = :status, result = :result, error = :error, "
+    "progress = CASE WHEN :status = 'succeeded' THEN 100 ELSE progress END, "
+    "finished_at = now(), lease_until = NULL "
+    "WHERE id = :id AND status = 'running'"
+).bindparams(bindparam("result", type_=JSONB))
+PROGRESS = text(
+    "UPDATE jobs SET progress = :progress, "
+    "lease_until = now() + make_interval(secs => :lease) "
+    "WHERE id = :id AND status = 'running' "
+    "RETURNING id"
+)
+CANCEL = text(
+    "UPDATE jobs SET status = 'cancelled', finished_at = now(), lease_until = NULL "
+    "WHERE id = :id AND status IN ('queued', 'running') "
+    "RETURNING id"
+)
+
+# Modules whose import registers handlers; worker processes import them
+HANDLER_MODULES = ("app.admin_analytics", "app.reports")
+
+
+class JobError(Exception):
+    """A job failed for a reason worth showing to whoever queued it."""
+
+
+class JobCancelled(Exception):
+    """The job was cancelled while running (see ``JobContext.progress``)."""
+
+
+@dataclass
+class JobContext:
+    """A claimed job, as passed to its handler."""
+
+    id: uuid.UUID
+    user_id: uuid.UUID
+    params: dict
+    bind: Engine
+
+    def progress(self, fraction: float) -> None:
+        """Record how far along the job is and extend its lease.
+
+        Args:
+            fraction: Share of the work done, from 0 to 1
+
+        Raises:
+            JobCancelled: If the job was cancelled (or is no longer ours)
+        """
+        with self.bind.begin() as conn:
+            row = conn.execute(
+                PROGRESS,
+                {
+                    "id": self.id,
+                    "progress": max(0, min(100, int(fraction * 100))),
+                    "lease": settings.job_lease_seconds,
+                },
+            ).first()
+        if row is None:
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+
+Handler = Callable[[JobContext], Any]
+HANDLERS: dict[str, Handler] = {}
+
+
+def register(kind: str, handler: Handler) -> None:
+    """Run jobs of ``kind`` with ``handler(job) -> JSON result``."""
+    HANDLERS[kind] = handler
+
+
+def load_handlers() -> None:
+    """Import every module in HANDLER_MODULES, registering its handlers."""
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def submit(db: Session, user_id: uuid.UUID, kind: str, params: dict) -> models.Job:
+    """Queue a job (the caller commits).
+
+    Args:
+        db: Database session
+        user_id: Who the job runs for
+        kind: A registered job kind
+        params: JSON parameters for the handler
+
+    Returns:
+        The queued job
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"No handler for job kind {kind!r}")
+    job = models.Job(
+        user_id=user_id, kind=kind, params=jsonable_encoder(params), status="queued"
+    )
+    db.add(job)
+    db.flush()
+    metrics.incr(f"jobs.{kind}.queued")
+    return job
+
+
+def cancel(db: Session, job_id: uuid.UUID) -> bool:
+    """Cancel a queued or running job (the caller commits).
+
+    A queued job never starts. A running one is marked cancelled right away
+    and its handler stops at its next ``JobContext.progress`` call; whatever
+    it returns after that is discarded.
+
+    Returns:
+        False if the job had already finished
+    """
+    return db.execute(CANCEL, {"id": job_id}).first() is not None
+
+
+def _finish(bind: Engine, job_id, status: str, result=None, error=None) -> None:
+    with bind.begin() as conn:
+        conn.execute(
+            FINISH, {"id": job_id, "status": status, "result": result, "error": error}
+        )
+
+
+def run_job(
+    bind: Engine, job_id: uuid.UUID, user_id: uuid.UUID, kind: str, params: dict
+) -> str:
+    """Run a claimed job's handler and record its result or error.
+
+    Returns:
+        How the job ended: 'succeeded', 'failed' or 'cancelled'
+    """
+    try:
+        result = HANDLERS[kind](JobContext(job_id, user_id, params, bind))
+    except JobCancelled:
+        return "cancelled"
+    except JobError as exc:
+        _finish(bind, job_id, "failed", error=str(exc))
+        return "failed"
+    except Exception:
+        logger.exception("Job %s (%s) failed", job_id, kind)
+        _finish(bind, job_id, "failed", error="Job failed")
+        return "failed"
+    _finish(bind, job_id, "succeeded", result=jsonable_encoder(result))
+    return "succeeded"
+
+
+def _run_in_worker(job_id, user_id, kind: str, params: dict) -> str:
+    """``run_job`` in a pool process, on that process's own engine."""
+    return run_job(engine, job_id, user_id, kind, params)
+
+
+def _record(kind: str, start: float, status: str) -> None:
+    metrics.observe(f"jobs.{kind}.duration", time.perf_counter() - start)
+    metrics.incr(f"jobs.{kind}.{status}")
+
+
+class WorkerPool:
+    """Runs claimed jobs in up to ``size`` worker processes.
+
+    Processes are started with ``spawn`` rather than ``fork`` (the API
+    process has threads and open connections that a fork would copy) when
+    the first job arrives, and import HANDLER_MODULES once. A job whose
+    process dies is left running until its lease expires and is then
+    retried.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._running: set[Future] = set()
+
+    def free_slots(self) -> int:
+        """Number of jobs that can be submitted without waiting."""
+        self._running = {future for future in self._running if not future.done()}
+        return self.size - len(self._running)
+
+    def submit(self, job) -> None:
+        """Run a claimed job (a CLAIM row) in a worker process."""
+        args = (_run_in_worker, job.id, job.user_id, job.kind, job.params)
+        try:
+            future = self._start().submit(*args)
+        except BrokenProcessPool:  # a worker died; start over
+            self._executor = None
+            future = self._start().submit(*args)
+        future.add_done_callback(partial(self._done, job.kind, time.perf_counter()))
+        self._running.add(future)
+
+    def wait(self) -> None:
+        """Block until at least one running job finishes."""
+        if self._running:
+            wait(self._running, return_when=FIRST_COMPLETED)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes once their current jobs finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _start(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=load_handlers,
+            )
+        return self._executor
+
+    @staticmethod
+    def _done(kind: str, start: float, future: Future) -> None:
+        try:
+            status = future.result()
+        except Exception:
+            logger.exception("Worker process for a %s job failed", kind)
+            status = "failed"
+        _record(kind, start, status)
+
+
+workers = WorkerPool(settings.job_workers)
+
+
+def run_pending(
+    max_jobs: Optional[int] = None,
+    bind: Engine = engine,
+    pool: Optional[WorkerPool] = None,
+) -> int:
+    """Claim queued jobs and run them.
+
+    Without a pool, jobs run one at a time on this thread until the queue is
+    empty. With one, jobs are handed to it (without waiting for them) until
+    it has no free processes.
+
+    Args:
+        max_jobs: Stop after this many jobs
+        bind: Engine holding the ``jobs`` table
+        pool: Worker processes to run the jobs in
+
+    Returns:
+        Number of jobs claimed
+    """
+    claimed = 0
+    while max_jobs is None or claimed < max_jobs:
+        if pool is not None and pool.free_slots() <= 0:
+            break
+        with bind.begin() as conn:
+            job = conn.execute(CLAIM, {"lease": settings.job_lease_seconds}).first()
+        if job is None:
+            break
+        claimed += 1
+        if job.kind not in HANDLERS:
+            _finish(bind, job.id, "failed", error=f"Unknown job kind {job.kind!r}")
+        elif job.attempts > settings.job_max_attempts:
+            _finish(
+                bind,
+                job.id,
+                "failed",
+                error=f"Gave up after {settings.job_max_attempts} attempts",
+            )
+        elif pool is not None:
+            pool.submit(job)
+        else:
+            start = time.perf_counter()
+            status = run_job(bind, job.id, job.user_id, job.kind, job.params)
+            _record(job.kind, start, status)
+    return claimed
+
+
+def poll() -> int:
+    """Scheduler task: hand queued jobs to ``workers`` (or run them inline)."""
+    return run_pending(pool=workers if workers.size > 0 else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Run jobs in this many processes (default: one at a time)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_handlers()
+    if args.workers <= 0:
+        print(f"Ran {run_pending()} job(s)")
+        return
+
+    pool = WorkerPool(args.workers)
+    total = 0
+    try:
+        while True:
+            claimed = run_pending(pool=pool)
+            total += claimed
+            if not claimed and pool.free_slots() == pool.size:
+                break
+            pool.wait()
+    finally:
+        pool.shutdown()
+    print(f"Ran {total} job(s)")
+
+
+if __name__ == "__main__":
+    # Handlers register with app.jobs, not with this __main__ copy of it
+    from app.jobs import main
+
+    main()
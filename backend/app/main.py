@@ -1,15 +1,61 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
+from .admin_router import router as admin_router
+from .archive import archive_old
 from .auth_router import router as auth_router
+from .batch_router import router as batch_router
 from .categories_router import router as categories_router
+from .compression import CompressionMiddleware
 from .config import settings
+from .digests import generate_digests
+from .events import broker
+from .events_router import router as events_router
 from .files_router import ensure_upload_dir, router as files_router
+from .forecast_router import router as forecast_router
+from .idempotency import IdempotentReplay
+from .jobs import poll as poll_jobs, workers as job_workers
+from .metrics import metrics
+from .outbox import worker as outbox_worker
+from .partitions import ensure_future_partitions
 from .password_reset_router import router as password_reset_router
+from .purge import purge_expired
+from .recurrence import materialize_due
+from .recurring_router import router as recurring_router
+from .reports_router import router as reports_router
+from .replicas import ReadYourWritesMiddleware, replicas
+from .scheduler import scheduler
+from .security import PasswordHashingBusy
+from .sync_router import router as sync_router
 from .transactions_router import router as transactions_router
 
 app = FastAPI(title=settings.app_name)
 
+# Periodic maintenance, started with the app
+if settings.purge_interval_seconds > 0:
+    scheduler.add("purge", settings.purge_interval_seconds, purge_expired)
+if settings.partition_maintenance_interval_seconds > 0:
+    scheduler.add(
+        "partitions",
+        settings.partition_maintenance_interval_seconds,
+        ensure_future_partitions,
+    )
+if settings.archive_interval_seconds > 0:
+    scheduler.add("archive", settings.archive_interval_seconds, archive_old)
+if settings.digest_interval_seconds > 0:
+    scheduler.add("digests", settings.digest_interval_seconds, generate_digests)
+if settings.recurring_interval_seconds > 0:
+    scheduler.add("recurring", settings.recurring_interval_seconds, materialize_due)
+if settings.job_poll_seconds > 0:
+    scheduler.add("jobs", settings.job_poll_seconds, poll_jobs)
+if settings.outbox_poll_seconds > 0:
+    scheduler.add("outbox", settings.outbox_poll_seconds, outbox_worker.run_once)
+if replicas.engines:
+    scheduler.add(
+        "replica_health", settings.replica_health_check_seconds, replicas.check_health
+    )
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -17,6 +63,20 @@ async def startup_event():
     # Create upload directory if it doesn't exist
     ensure_upload_dir()
 
+    # Start periodic maintenance tasks
+    scheduler.start()
+
+    # Start delivering live update events
+    await broker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks on app shutdown."""
+    await scheduler.stop()
+    await broker.stop()
+    job_workers.shutdown()
+
 
 # Configure CORS
 origins = [o.strip() for o in settings.cors_origins.split(",") if o.strip()]
@@ -28,6 +88,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses; receipts and other binary media are skipped
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+)
+
+# Route a user's reads to the primary right after they write
+if replicas.engines:
+    app.add_middleware(
+        ReadYourWritesMiddleware, sticky_seconds=settings.replica_sticky_seconds
+    )
+
+
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    """Shed load when the bcrypt pool's queue is full."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy. Please try again shortly."},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(IdempotentReplay)
+async def idempotent_replay_handler(request: Request, exc: IdempotentReplay):
+    """Answer a retried write with the response stored for its key."""
+    headers = {"Idempotent-Replayed": "true"}
+    if exc.content is None:
+        return Response(status_code=exc.status_code, headers=headers)
+    return JSONResponse(
+        status_code=exc.status_code, content=exc.content, headers=headers
+    )
+
 
 @app.get("/health")
 def health():
@@ -35,12 +130,25 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def get_metrics():
+    """In-process counters, gauges and timers for this worker."""
+    return metrics.snapshot()
+
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(password_reset_router)
 app.include_router(categories_router, prefix="/api/categories", tags=["categories"])
 app.include_router(transactions_router)
 app.include_router(files_router)
+app.include_router(events_router)
+app.include_router(recurring_router)
+app.include_router(forecast_router)
+app.include_router(reports_router)
+app.include_router(sync_router)
+app.include_router(batch_router)
+app.include_router(admin_router)
 
 
 # Future routers to be added:
@@ -0,0 +1,77 @@
+"""Lightweight in-process metrics.
+
+A small registry of counters, gauges and timers shared by the app's
+background machinery (password hashing pool, maintenance jobs, workers).
+``snapshot()`` is served as JSON from ``GET /metrics``.
+
+Values are per process; with several uvicorn workers each one reports its own.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+
+class Metrics:
+    """Thread-safe registry of named counters, gauges and timers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self._gauges: dict[str, float] = {}
+        self._gauge_fns: dict[str, Callable[[], float]] = {}
+        self._timers: dict[str, dict[str, float]] = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """Add ``value`` to a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Record the latest value of a gauge."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_gauge(self, name: str, fn: Callable[[], float]) -> None:
+        """Register a gauge whose value is read from ``fn`` at snapshot time."""
+        with self._lock:
+            self._gauge_fns[name] = fn
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration sample for a timer."""
+        with self._lock:
+            timer = self._timers.setdefault(
+                name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            timer["count"] += 1
+            timer["total_seconds"] += seconds
+            timer["max_seconds"] = max(timer["max_seconds"], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time the wrapped block and record it under ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable copy of every metric."""
+        with self._lock:
+            gauges = dict(self._gauges)
+            gauge_fns = dict(self._gauge_fns)
+            counters = dict(self._counters)
+            timers = {}
+            for name, t in self._timers.items():
+                timers[name] = dict(t)
+                timers[name]["avg_seconds"] = (
+                    t["total_seconds"] / t["count"] if t["count"] else 0.0
+                )
+        for name, fn in gauge_fns.items():
+            gauges[name] = fn()
+        return {"counters": counters, "gauges": gauges, "timers": timers}
+
+
+metrics = Metrics()
@@ -1,18 +1,26 @@
 import uuid
 
 from sqlalchemy import (
+    DDL,
+    BigInteger,
     Boolean,
     CheckConstraint,
     Column,
+    Computed,
+    Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
+    SmallInteger,
     String,
     Text,
+    UniqueConstraint,
+    event,
 )
-from sqlalchemy.dialects.postgresql import JSONB, UUID
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func, text
 
 from .db import Base
 
@@ -23,7 +31,7 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email = Column(String, unique=True, nullable=False, index=True)  # CITEXT in DB
+    email = Column(String, unique=True, nullable=False)
     password_hash = Column(Text, nullable=False)
     first_name = Column(String(100))
     last_name = Column(String(100))
@@ -59,6 +67,11 @@ class User(Base):
         "NotificationEvent", back_populates="user", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        # Case-insensitive uniqueness; look users up with lower(email) = ...
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+    )
+
 
 class Session(Base):
     """Refresh token sessions for JWT authentication."""
@@ -72,16 +85,33 @@ class Session(Base):
         nullable=False,
         index=True,
     )
-    refresh_token_hash = Column(Text, nullable=False, index=True)
+    # Refresh tokens are "<selector>.<verifier>": the selector is looked up
+    # through a unique index, the verifier is checked against an HMAC
+    refresh_token_selector = Column(Text, unique=True, index=True)
+    refresh_token_hash = Column(Text, nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     created_at = Column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
     revoked_at = Column(DateTime(timezone=True))
+    # Set when the session is rotated; presenting a rotated token is reuse
+    replaced_by_id = Column(
+        UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="SET NULL")
+    )
 
     # Relationships
     user = relationship("User", back_populates="sessions")
 
+    __table_args__ = (
+        # Backs the ON DELETE SET NULL of replaced_by_id; without it every
+        # deleted session (e.g. by the purge job) scans the whole table
+        Index(
+            "ix_sessions_replaced_by_id",
+            "replaced_by_id",
+            postgresql_where=text("replaced_by_id IS NOT NULL"),
+        ),
+    )
+
 
 class PasswordResetToken(Base):
     """One-time tokens for password reset flow."""
@@ -125,6 +155,9 @@ class Category(Base):
     created_at = Column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
+    # ID of the database transaction that last wrote the row, set by a
+    # trigger (see SYNC_TRIGGERS below and app.sync)
+    change_xid = Column(BigInteger)
 
     # Relationships
     user = relationship("User", back_populates="categories")
@@ -135,6 +168,7 @@ class Category(Base):
     __table_args__ = (
         # Unique constraint: user cannot have duplicate category names
         CheckConstraint("name IS NOT NULL", name="categories_name_not_null"),
+        Index("ix_categories_user_change", "user_id", "change_xid"),
     )
 
 
@@ -155,13 +189,32 @@ class Transaction(Base):
     )
     type = Column(String, nullable=False)  # 'income' or 'expense'
     amount_cents = Column(Integer, nullable=False)  # Amount in cents
-    occurred_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    # Partition key (monthly ranges, see app.partitions), so part of the PK
+    occurred_at = Column(
+        DateTime(timezone=True), primary_key=True, nullable=False, index=True
+    )
     description = Column(Text)
     receipt_url = Column(Text)
     metadata_ = Column("metadata", JSONB)  # Flexible storage for additional data
+    # Full-text search document, maintained by Postgres (GIN indexed)
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "to_tsvector('english', coalesce(description, ''))", persisted=True
+            ),
+        )
+    )
     created_at = Column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
+    # ID of the database transaction that last wrote the row, set by a
+    # trigger (see SYNC_TRIGGERS below and app.sync)
+    change_xid = Column(BigInteger)
+    # Set on occurrences materialized from a recurring rule
+    recurring_rule_id = Column(
+        UUID(as_uuid=True), ForeignKey("recurring_rules.id", ondelete="SET NULL")
+    )
 
     # Relationships
     user = relationship("User", back_populates="transactions")
@@ -171,6 +224,67 @@ class Transaction(Base):
         CheckConstraint(
             "type IN ('income', 'expense')", name="transactions_type_check"
         ),
+        # Lets per-user aggregates run as index-only scans
+        Index(
+            "ix_transactions_user_occurred_covering",
+            "user_id",
+            "occurred_at",
+            postgresql_include=["type", "category_id", "amount_cents", "id"],
+        ),
+        Index("ix_transactions_user_amount", "user_id", "amount_cents"),
+        Index("ix_transactions_user_change", "user_id", "change_xid"),
+        # One transaction per rule occurrence (see app.recurrence)
+        Index(
+            "ix_transactions_recurring_occurrence",
+            "recurring_rule_id",
+            "occurred_at",
+            unique=True,
+            postgresql_where=text("recurring_rule_id IS NOT NULL"),
+        ),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
+
+
+# Tables created with metadata.create_all() (e.g. by the seed script) get a
+# default partition so inserts work; migrations create the monthly ones
+event.listen(
+    Transaction.__table__,
+    "after_create",
+    DDL("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT"),
+)
+
+# Delta sync bookkeeping, kept by triggers so that every write path (ORM,
+# bulk SQL, cascades) stamps changes and records deletions
+SYNC_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION sync_stamp_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END $$;
+
+CREATE OR REPLACE FUNCTION sync_record_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sync_tombstones (user_id, entity, entity_id, change_xid)
+    VALUES (OLD.user_id, TG_ARGV[0], OLD.id, pg_current_xact_id()::text::bigint);
+    RETURN NULL;
+END $$;
+"""
+SYNC_TRIGGERS = """
+CREATE TRIGGER {table}_sync_stamp BEFORE INSERT OR UPDATE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION sync_stamp_change();
+CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION sync_record_delete('{entity}');
+"""
+for _table, _entity in (
+    (Category.__table__, "category"),
+    (Transaction.__table__, "transaction"),
+):
+    event.listen(
+        _table,
+        "after_create",
+        DDL(SYNC_FUNCTIONS + SYNC_TRIGGERS.format(table=_table.name, entity=_entity)),
     )
 
 
@@ -189,7 +303,10 @@ class NotificationPreference(Base):
     email_enabled = Column(Boolean, nullable=False, default=True)
     sms_enabled = Column(Boolean, nullable=False, default=False)
     low_balance_threshold_cents = Column(Integer)
-    quiet_hours = Column(JSONB)  # e.g., {"start": "22:00", "end": "07:00"}
+    # e.g., {"start": "22:00", "end": "07:00", "timezone": "Europe/Paris"}
+    # (timezone is optional and defaults to UTC)
+    quiet_hours = Column(JSONB)
+    sms_number = Column(String(32))
     created_at = Column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
@@ -239,8 +356,16 @@ class NotificationEvent(Base):
     kind = Column(Text, nullable=False)  # e.g., LOW_BALANCE, DIGEST
     channel = Column(Text, nullable=False)  # email, sms, inapp
     payload = Column(JSONB)
+    # Events with the same key are only queued once (see app.alerts)
+    dedupe_key = Column(Text, unique=True)
     sent_at = Column(DateTime(timezone=True), index=True)
     status = Column(Text)  # queued, sent, failed
+    # Delivery bookkeeping for the outbox worker (see app.outbox)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    last_error = Column(Text)
     created_at = Column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
@@ -248,3 +373,209 @@ class NotificationEvent(Base):
     # Relationships
     user = relationship("User", back_populates="notification_events")
     category = relationship("Category", back_populates="notification_events")
+
+    __table_args__ = (
+        # The outbox worker's claim query: queued events that are due
+        Index(
+            "ix_notification_events_due",
+            "next_attempt_at",
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+
+class CategoryMonthlyTotal(Base):
+    """Running per-category monthly totals, kept in step with transactions.
+
+    Maintained by ``app.rollups`` in the same database transaction as every
+    transaction write, so month-to-date figures never re-sum history.
+    ``category_id`` is NULL for uncategorized transactions.
+    """
+
+    __tablename__ = "category_monthly_totals"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    category_id = Column(
+        UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE")
+    )
+    month = Column(Date, nullable=False)  # First day of the month (UTC)
+    type = Column(String, nullable=False)  # 'income' or 'expense'
+    total_cents = Column(BigInteger, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id",
+            "category_id",
+            "month",
+            "type",
+            name="uq_category_monthly_totals_key",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+
+
+class DigestRun(Base):
+    """Progress of one week's digest generation (see app.digests)."""
+
+    __tablename__ = "digest_runs"
+
+    week = Column(Date, primary_key=True)  # Monday starting the week (UTC)
+    last_user_id = Column(UUID(as_uuid=True))  # Users up to here are done
+    events = Column(Integer, nullable=False, server_default="0")
+    started_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    finished_at = Column(DateTime(timezone=True))
+
+
+class SyncTombstone(Base):
+    """Record of a deleted transaction or category, for delta sync.
+
+    Written by the ``sync_record_delete`` trigger and purged after
+    ``settings.sync_tombstone_days``. There is no foreign key to ``users``:
+    deleting a user cascades to their rows, whose tombstones are written in
+    the same statement.
+    """
+
+    __tablename__ = "sync_tombstones"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    entity = Column(Text, nullable=False)  # 'transaction' or 'category'
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    change_xid = Column(BigInteger, nullable=False)
+    deleted_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_change", "user_id", "change_xid"),
+        Index("ix_sync_tombstones_deleted_at", "deleted_at"),
+    )
+
+
+class IdempotencyKey(Base):
+    """Stored response of a write made with an ``Idempotency-Key`` header.
+
+    The row is inserted when the request starts and filled in before its
+    transaction commits, so other transactions only ever see it complete
+    (see ``app.idempotency``). Purged once ``expires_at`` has passed.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # sha256 of method, path, body
+    status_code = Column(SmallInteger)
+    response = Column(JSONB)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class RecurringRule(Base):
+    """A transaction that repeats on an RRULE-like schedule.
+
+    ``materialized_through``, ``generated_count`` and ``next_occurrence_on``
+    are the high-water mark of occurrences already created as transactions
+    (see ``app.recurrence``).
+    """
+
+    __tablename__ = "recurring_rules"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    # Transaction template
+    category_id = Column(
+        UUID(as_uuid=True), ForeignKey("categories.id", ondelete="SET NULL")
+    )
+    type = Column(String, nullable=False)  # 'income' or 'expense'
+    amount_cents = Column(Integer, nullable=False)
+    description = Column(Text)
+    metadata_ = Column("metadata", JSONB)
+    # Schedule
+    freq = Column(String, nullable=False)  # DAILY, WEEKLY, MONTHLY or YEARLY
+    interval = Column(Integer, nullable=False, default=1)
+    count = Column(Integer)
+    until = Column(Date)
+    starts_on = Column(Date, nullable=False)
+    # High-water mark
+    materialized_through = Column(Date)
+    generated_count = Column(Integer, nullable=False, default=0)
+    next_occurrence_on = Column(Date)  # NULL once the schedule is exhausted
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    user = relationship("User")
+
+    __table_args__ = (
+        CheckConstraint(
+            "type IN ('income', 'expense')", name="recurring_rules_type_check"
+        ),
+        CheckConstraint(
+            "freq IN ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')",
+            name="recurring_rules_freq_check",
+        ),
+        # Rules with occurrences due, for the materialization job
+        Index(
+            "ix_recurring_rules_due",
+            "next_occurrence_on",
+            postgresql_where=text("active AND next_occurrence_on IS NOT NULL"),
+        ),
+    )
+
+
+class Job(Base):
+    """Work queued to run off the request path (see ``app.jobs``)."""
+
+    __tablename__ = "jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    kind = Column(String, nullable=False)  # selects the handler
+    params = Column(JSONB, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_until = Column(DateTime(timezone=True))  # while running
+    progress = Column(Integer, nullable=False, default=0, server_default="0")  # %
+    result = Column(JSONB)
+    error = Column(Text)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')",
+            name="jobs_status_check",
+        ),
+        # Jobs waiting for (or held by) a worker, oldest first
+        Index(
+            "ix_jobs_pending",
+            "created_at",
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
@@ -0,0 +1,342 @@
+"""Outbox worker delivering queued notification events.
+
+Anything that wants to notify a user inserts a ``NotificationEvent`` with
+``status='queued'`` in its own database transaction (alerts, password
+resets); this worker delivers them. Each batch is claimed with::
+
+    UPDATE notification_events SET next_attempt_at = now() + <lease>, ...
+    WHERE id IN (SELECT id ... WHERE status = 'queued'
+                 AND next_attempt_at <= now() LIMIT n FOR UPDATE SKIP LOCKED)
+
+so several workers (one per uvicorn process, or ``python -m app.outbox``)
+never claim the same event, and an event claimed by a worker that dies is
+picked up again once its lease runs out. The claimed messages are delivered
+concurrently on the event loop (at most ``concurrency`` at a time) through
+the channels in ``app.channels``, then the outcomes are written back in one
+short transaction:
+
+* delivered: ``status='sent'``, ``sent_at`` set
+* transient failure: retried after an exponential backoff, until
+  ``max_attempts`` is reached and the event is marked ``failed``
+* inside the user's quiet hours: email and SMS are deferred to the end of
+  the quiet period without using up an attempt (in-app delivery and
+  password resets are never deferred)
+
+Throughput shows up under ``outbox.*`` in ``GET /metrics``.
+
+Usage:
+    python -m app.outbox [--once]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, time as dtime, timedelta, timezone
+from typing import Callable, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from .channels import (
+    PASSWORD_RESET,
+    Channel,
+    Message,
+    PermanentDeliveryError,
+    default_channels,
+)
+from .config import settings
+from .db import engine
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Channels that quiet hours apply to, and kinds that ignore quiet hours
+QUIET_CHANNELS = {"email", "sms"}
+URGENT_KINDS = {PASSWORD_RESET}
+# Kinds whose payload leads to a secret; it is cleared once delivered or failed
+REDACT_KINDS = {PASSWORD_RESET}
+
+CLAIM = text(
+    """
+    WITH claimed AS (
+        UPDATE notification_events e
+        SET next_attempt_at = now() + make_interval(secs => :lease),
+            attempts = e.attempts + 1
+        FROM (
+            SELECT id FROM notification_events
+            WHERE status = 'queued' AND next_attempt_at <= now()
+            ORDER BY next_attempt_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        ) due
+        WHERE e.id = due.id
+        RETURNING e.id, e.user_id, e.kind, e.channel, e.payload, e.attempts
+    )
+    SELECT c.id, c.user_id, c.kind, c.channel, c.payload, c.attempts,
+           u.email, p.sms_number, p.quiet_hours
+    FROM claimed c
+    JOIN users u ON u.id = c.user_id
+    LEFT JOIN notification_preferences p ON p.user_id = c.user_id
+    """
+)
+MARK_SENT = text(
+    "UPDATE notification_events SET status = 'sent', sent_at = now(), "
+    "last_error = NULL, "
+    "payload = CASE WHEN kind = ANY(:redact) THEN NULL ELSE payload END "
+    "WHERE id = :id"
+)
+RESCHEDULE = text(
+    "UPDATE notification_events SET next_attempt_at = :at, "
+    "attempts = attempts - :refund, last_error = :error WHERE id = :id"
+)
+MARK_FAILED = text(
+    "UPDATE notification_events SET status = 'failed', last_error = :error, "
+    "payload = CASE WHEN kind = ANY(:redact) THEN NULL ELSE payload END "
+    "WHERE id = :id"
+)
+
+
+@dataclass
+class Outcome:
+    """What happened to one message: sent, retry, deferred or failed."""
+
+    message: Message
+    status: str
+    retry_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+def quiet_until(quiet_hours: Optional[dict], now: datetime) -> Optional[datetime]:
+    """End of the quiet period ``now`` falls in, or None outside quiet hours.
+
+    ``quiet_hours`` looks like ``{"start": "22:00", "end": "07:00"}`` with an
+    optional ``"timezone"`` (default UTC); the window may wrap past midnight.
+    Malformed settings are ignored rather than holding messages back.
+    """
+    if not quiet_hours:
+        return None
+    try:
+        start = dtime.fromisoformat(quiet_hours["start"])
+        end = dtime.fromisoformat(quiet_hours["end"])
+        tz = ZoneInfo(quiet_hours.get("timezone") or "UTC")
+    except (KeyError, TypeError, ValueError, ZoneInfoNotFoundError):
+        return None
+    if start == end:
+        return None
+
+    local = now.astimezone(tz)
+    current = local.time().replace(tzinfo=None)
+    if start < end:
+        inside = start <= current < end
+        end_day = local.date()
+    else:
+        inside = current >= start or current < end
+        end_day = local.date() + timedelta(days=1 if current >= start else 0)
+    if not inside:
+        return None
+    return datetime.combine(end_day, end, tzinfo=tz).astimezone(timezone.utc)
+
+
+def backoff_seconds(attempts: int, base: float, cap: float) -> float:
+    """Delay before retry number ``attempts`` (1-based): base * 2^(n-1), capped."""
+    return min(cap, base * 2 ** max(attempts - 1, 0))
+
+
+class OutboxWorker:
+    """Claims queued notification events and delivers them.
+
+    Args:
+        channels: Channel per ``NotificationEvent.channel`` value
+        bind: Engine holding the ``notification_events`` table
+        batch_size: Events claimed per batch
+        concurrency: Deliveries in flight at once
+        max_attempts: Attempts before an event is marked failed
+        backoff_base: Seconds before the first retry (doubles per attempt)
+        backoff_max: Upper bound on the retry delay
+        lease_seconds: How long a claim lasts if the worker never reports back
+        clock: Time source for quiet hours and backoff (for tests)
+    """
+
+    def __init__(
+        self,
+        channels: dict[str, Channel],
+        bind: Engine = engine,
+        batch_size: int = settings.outbox_batch_size,
+        concurrency: int = settings.outbox_concurrency,
+        max_attempts: int = settings.outbox_max_attempts,
+        backoff_base: float = settings.outbox_backoff_seconds,
+        backoff_max: float = settings.outbox_backoff_max_seconds,
+        lease_seconds: int = settings.outbox_lease_seconds,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ):
+        self.channels = channels
+        self.bind = bind
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+
+    def claim(self) -> list[Message]:
+        """Claim up to ``batch_size`` due events (committed immediately)."""
+        with self.bind.begin() as conn:
+            rows = conn.execute(
+                CLAIM, {"lease": self.lease_seconds, "batch_size": self.batch_size}
+            ).all()
+        return [
+            Message(
+                event_id=row.id,
+                user_id=row.user_id,
+                kind=row.kind,
+                channel=row.channel,
+                payload=row.payload or {},
+                attempts=row.attempts,
+                email=row.email,
+                sms_number=row.sms_number,
+                quiet_hours=row.quiet_hours,
+            )
+            for row in rows
+        ]
+
+    async def deliver(self, message: Message) -> Outcome:
+        """Send one message and decide what happens to its event next."""
+        now = self.clock()
+        if message.channel in QUIET_CHANNELS and message.kind not in URGENT_KINDS:
+            until = quiet_until(message.quiet_hours, now)
+            if until is not None:
+                return Outcome(message, "deferred", retry_at=until)
+
+        channel = self.channels.get(message.channel)
+        if channel is None:
+            return Outcome(message, "failed", error=f"no channel {message.channel!r}")
+        try:
+            with metrics.timer(f"outbox.deliver.{message.channel}"):
+                await channel.send(message)
+        except PermanentDeliveryError as exc:
+            return Outcome(message, "failed", error=str(exc))
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if message.attempts >= self.max_attempts:
+                return Outcome(message, "failed", error=error)
+            delay = backoff_seconds(
+                message.attempts, self.backoff_base, self.backoff_max
+            )
+            return Outcome(
+                message, "retry", retry_at=now + timedelta(seconds=delay), error=error
+            )
+        return Outcome(message, "sent")
+
+    def record(self, outcomes: list[Outcome]) -> None:
+        """Write delivery outcomes back to the events."""
+        sent, reschedule, failed = [], [], []
+        for outcome in outcomes:
+            event_id = outcome.message.event_id
+            metrics.incr(f"outbox.{outcome.status}")
+            if outcome.status == "sent":
+                metrics.incr(f"outbox.sent.{outcome.message.channel}")
+                sent.append({"id": event_id, "redact": list(REDACT_KINDS)})
+            elif outcome.status == "failed":
+                logger.warning("Notification %s failed: %s", event_id, outcome.error)
+                failed.append(
+                    {
+                        "id": event_id,
+                        "error": outcome.error,
+                        "redact": list(REDACT_KINDS),
+                    }
+                )
+            else:
+                reschedule.append(
+                    {
+                        "id": event_id,
+                        "at": outcome.retry_at,
+                        # A deferral is not a delivery attempt
+                        "refund": 1 if outcome.status == "deferred" else 0,
+                        "error": outcome.error,
+                    }
+                )
+        with self.bind.begin() as conn:
+            for statement, params in (
+                (MARK_SENT, sent),
+                (RESCHEDULE, reschedule),
+                (MARK_FAILED, failed),
+            ):
+                if params:
+                    conn.execute(statement, params)
+
+    async def run_batch(self) -> int:
+        """Claim, deliver and record one batch.
+
+        Returns:
+            Number of events claimed
+        """
+        messages = await run_in_threadpool(self.claim)
+        if not messages:
+            return 0
+        metrics.incr("outbox.claimed", len(messages))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(message: Message) -> Outcome:
+            async with semaphore:
+                return await self.deliver(message)
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(bounded(m) for m in messages))
+        elapsed = time.perf_counter() - start
+        metrics.observe("outbox.batch", elapsed)
+        if elapsed > 0:
+            metrics.set_gauge("outbox.last_batch_per_second", len(messages) / elapsed)
+        await run_in_threadpool(self.record, list(outcomes))
+        return len(messages)
+
+    async def run_once(self) -> int:
+        """Deliver batches until no due events are left.
+
+        Returns:
+            Number of events processed
+        """
+        total = 0
+        while True:
+            claimed = await self.run_batch()
+            total += claimed
+            if claimed < self.batch_size:
+                return total
+
+
+worker = OutboxWorker(default_channels())
+
+
+async def run_forever(poll_seconds: float) -> None:
+    """Poll for due events until cancelled."""
+    while True:
+        try:
+            processed = await worker.run_once()
+            if processed:
+                logger.info("Processed %d notification events", processed)
+        except Exception:
+            logger.exception("Outbox batch failed")
+        await asyncio.sleep(poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--once", action="store_true", help="deliver what is due and exit"
+    )
+    parser.add_argument("--poll", type=float, default=settings.outbox_poll_seconds)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.once:
+        print(f"{asyncio.run(worker.run_once())} events processed")
+    else:
+        asyncio.run(run_forever(args.poll or 5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Monthly range partitions of the transactions table.
+
+``transactions`` is partitioned by month on ``occurred_at`` (one
+``transactions_yYYYYmMM`` table per month) with a ``transactions_default``
+partition for rows outside every range. This module keeps partitions
+created ahead of time and detaches old ones:
+
+* ``ensure_future_partitions`` runs on the app's scheduler and makes sure
+  the current month and the next ``settings.partition_months_ahead`` exist.
+  If rows for a new month already landed in the default partition they are
+  moved into it.
+* ``archive_partitions`` detaches months older than a cutoff and moves them
+  to the ``archive`` schema (or drops them). Detached rows are no longer
+  visible to the API.
+
+Partition bounds are UTC month starts, matching ``date_trunc('month', ...)``
+in a UTC session.
+
+Usage:
+    python -m app.partitions list
+    python -m app.partitions ensure [--from 2022-01] [--months-ahead 3]
+    python -m app.partitions archive --before 2022-01 [--drop]
+"""
+
+import argparse
+import logging
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from .config import settings
+from .db import engine
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PARENT = "transactions"
+DEFAULT_PARTITION = "transactions_default"
+ARCHIVE_SCHEMA = "archive"
+
+
+def add_months(month: date, n: int) -> date:
+    """Return the first day of the month ``n`` months after ``month``."""
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding ``month`` (e.g. transactions_y2024m12)."""
+    return f"{PARENT}_y{month.year}m{month.month:02d}"
+
+
+def parse_month(value: str) -> date:
+    """Parse ``YYYY-MM`` into the first day of that month."""
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def _bound(month: date) -> str:
+    return f"{month.isoformat()} 00:00+00"
+
+
+def list_partitions(conn: Connection) -> list[tuple[str, str]]:
+    """Return (name, bound expression) for each attached partition, by name."""
+    rows = conn.execute(
+        text(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:parent AS regclass)
+            ORDER BY c.relname
+            """
+        ),
+        {"parent": PARENT},
+    )
+    return [(name, bound) for name, bound in rows]
+
+
+def _insertable_columns(conn: Connection) -> str:
+    rows = conn.execute(
+        text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = :parent AND is_generated = 'NEVER' "
+            "ORDER BY ordinal_position"
+        ),
+        {"parent": PARENT},
+    )
+    return ", ".join(r[0] for r in rows)
+
+
+def create_partition(conn: Connection, month: date) -> bool:
+    """Create the partition for ``month`` if it does not exist.
+
+    Creating a partition makes Postgres check that the default partition
+    holds no rows for its range, so any such rows are first moved out: the
+    default partition is detached, the rows are re-inserted through the
+    parent into the new partition, and the default is attached again.
+
+    Args:
+        conn: Connection inside a transaction
+        month: First day of the month
+
+    Returns:
+        True if the partition was created
+    """
+    name = partition_name(month)
+    exists = conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+    ).scalar()
+    if exists:
+        return False
+
+    start, end = _bound(month), _bound(add_months(month, 1))
+    in_range = "occurred_at >= :start AND occurred_at < :end"
+    params = {"start": start, "end": end}
+    stray = conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"),
+        params,
+    ).scalar()
+
+    if stray:
+        conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(
+        text(
+            f"CREATE TABLE {name} PARTITION OF {PARENT} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+    )
+    if stray:
+        columns = _insertable_columns(conn)
+        moved = conn.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} "
+                f"RETURNING {columns}) "
+                f"INSERT INTO {PARENT} ({columns}) SELECT {columns} FROM moved"
+            ),
+            params,
+        ).rowcount
+        conn.execute(
+            text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+        )
+        metrics.incr("partitions.rows_moved", moved)
+        logger.info("Moved %d rows from %s into %s", moved, DEFAULT_PARTITION, name)
+
+    metrics.incr("partitions.created")
+    logger.info("Created partition %s", name)
+    return True
+
+
+def ensure_partitions(bind: Engine, first: date, last: date) -> list[str]:
+    """Create every missing monthly partition from ``first`` to ``last``.
+
+    Each partition is created in its own short transaction under
+    ``settings.partition_lock_timeout_ms``.
+
+    Returns:
+        Names of the partitions created
+    """
+    created = []
+    month = first.replace(day=1)
+    while month <= last:
+        with bind.begin() as conn:
+            timeout = int(settings.partition_lock_timeout_ms)
+            conn.execute(text(f"SET LOCAL lock_timeout = {timeout}"))
+            if create_partition(conn, month):
+                created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_future_partitions(
+    bind: Engine = engine, months_ahead: Optional[int] = None
+) -> list[str]:
+    """Create partitions for the current month and the months ahead.
+
+    Args:
+        bind: Engine to use
+        months_ahead: Months past the current one (defaults to
+            settings.partition_months_ahead)
+
+    Returns:
+        Names of the partitions created
+    """
+    if months_ahead is None:
+        months_ahead = settings.partition_months_ahead
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    with metrics.timer("partitions.ensure"):
+        return ensure_partitions(bind, this_month, add_months(this_month, months_ahead))
+
+
+def archive_partitions(bind: Engine, before: date, drop: bool = False) -> list[str]:
+    """Detach monthly partitions that end on or before ``before``.
+
+    Detached partitions are moved to the ``archive`` schema, where they can
+    be dumped or queried directly, or dropped when ``drop`` is set.
+
+    Note:
+        ``DETACH PARTITION CONCURRENTLY`` is not allowed while a default
+        partition exists, so each detach briefly takes an exclusive lock on
+        ``transactions``; it is bounded by the partition lock timeout.
+
+    Args:
+        bind: Engine to use
+        before: First month to keep
+        drop: Drop the detached tables instead of archiving them
+
+    Returns:
+        Names of the partitions detached
+    """
+    before = before.replace(day=1)
+    with bind.connect() as conn:
+        names = [
+            name
+            for name, _ in list_partitions(conn)
+            if name != DEFAULT_PARTITION and name < partition_name(before)
+        ]
+
+    for name in names:
+        with bind.begin() as conn:
+            detach_partition(conn, name, drop=drop)
+    return names
+
+
+def detach_partition(conn: Connection, name: str, drop: bool = False) -> None:
+    """Detach one partition and move it to the ``archive`` schema (or drop it).
+
+    Args:
+        conn: Connection inside a transaction
+        name: Partition name, from ``list_partitions``
+        drop: Drop the detached table instead of archiving it
+    """
+    timeout = int(settings.partition_lock_timeout_ms)
+    conn.execute(text(f"SET LOCAL lock_timeout = {timeout}"))
+    conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+    if drop:
+        conn.execute(text(f"DROP TABLE {name}"))
+    else:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+    metrics.incr("partitions.archived")
+    logger.info("%s partition %s", "Dropped" if drop else "Archived", name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show attached partitions")
+    ensure = commands.add_parser("ensure", help="create missing partitions")
+    ensure.add_argument("--from", dest="first", type=parse_month)
+    ensure.add_argument(
+        "--months-ahead", type=int, default=settings.partition_months_ahead
+    )
+    archive = commands.add_parser("archive", help="detach old partitions")
+    archive.add_argument("--before", type=parse_month, required=True)
+    archive.add_argument("--drop", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "list":
+        with engine.connect() as conn:
+            for name, bound in list_partitions(conn):
+                print(f"{name:<28} {bound}")
+    elif args.command == "ensure":
+        this_month = datetime.now(timezone.utc).date().replace(day=1)
+        last = add_months(this_month, args.months_ahead)
+        created = ensure_partitions(engine, args.first or this_month, last)
+        print(f"created {len(created)} partitions")
+    else:
+        detached = archive_partitions(engine, args.before, drop=args.drop)
+        print(f"detached {len(detached)} partitions")
+
+
+if __name__ == "__main__":
+    main()
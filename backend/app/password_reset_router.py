@@ -2,19 +2,24 @@ import hashlib
 from datetime import datetime, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from . import schemas
+from .channels import PASSWORD_RESET
 from .db import get_db
-from .models import PasswordResetToken, User
-from .security import hash_password, new_reset_token
+from .models import NotificationEvent, PasswordResetToken, User
+from .rate_limit import enforce_rate_limit
+from .security import hash_password_async, new_reset_token
 
 router = APIRouter(prefix="/api", tags=["password-reset"])
 
 
 @router.post("/password_reset")
 def request_reset(
+    request: Request,
     body: schemas.PasswordResetRequest,
     db: Annotated[Session, Depends(get_db)],
 ):
@@ -24,50 +29,97 @@ def request_reset(
     It always returns a success response for security reasons.
 
     Args:
+        request: The incoming request (used for rate limiting)
         body: Password reset request with email
         db: Database session
 
     Returns:
         Success response (always returns 200 OK)
+
+    Raises:
+        HTTPException: If the client is rate limited (429 Too Many Requests)
     """
+    enforce_rate_limit(request, "password_reset", email=body.email)
+
     # Find user by email (case-insensitive)
-    user = db.query(User).filter(User.email.ilike(body.email)).first()
+    user = db.query(User).filter(func.lower(User.email) == body.email.lower()).first()
 
     if user:
         # Generate reset token
-        raw, hashed, exp = new_reset_token()
+        token_id, hashed, exp = new_reset_token()
 
         # Store hashed token in database
         reset_token = PasswordResetToken(
+            id=token_id,
             user_id=user.id,
             token_hash=hashed,
             expires_at=exp,
         )
         db.add(reset_token)
-        db.commit()
 
-        # In development, print the token. In production, send it via email.
-        print(f"[DEV ONLY] Password reset token for {body.email}: {raw}")
-
-        # TODO: Send email with reset link containing the raw token
-        # send_email(
-        #     to=body.email,
-        #     subject="Password Reset Request",
-        #     body=f"Click here to reset your password: {settings.frontend_url}/reset-password?token={raw}"
-        # )
+        # Queue the email in the same commit as the token; the outbox worker
+        # (app.outbox) sends it, so the request never waits on SMTP. Only the
+        # token id is queued: the channel derives the link when it sends
+        db.add(
+            NotificationEvent(
+                user_id=user.id,
+                kind=PASSWORD_RESET,
+                channel="email",
+                payload={"reset_token_id": str(token_id)},
+                status="queued",
+            )
+        )
+        db.commit()
 
     # Always return success to prevent email enumeration
     return {"ok": True}
 
 
+def _find_valid_reset_token(db: Session, token_hash: str, now: datetime):
+    """Find an unused, unexpired reset token by its hash."""
+    return (
+        db.query(PasswordResetToken)
+        .filter(
+            PasswordResetToken.token_hash == token_hash,
+            PasswordResetToken.used_at.is_(None),
+            PasswordResetToken.expires_at > now,
+        )
+        .first()
+    )
+
+
+def _set_new_password(
+    db: Session, reset_token: PasswordResetToken, new_hash: str, now: datetime
+) -> bool:
+    """Store the new password hash and consume the token.
+
+    Returns:
+        False if the token's user no longer exists
+    """
+    user = db.query(User).filter(User.id == reset_token.user_id).first()
+    if not user:
+        return False
+
+    user.password_hash = new_hash
+    user.updated_at = now
+
+    # Mark token as used
+    reset_token.used_at = now
+
+    db.commit()
+    return True
+
+
 @router.post("/password_reset/confirm")
-def confirm_reset(
+async def confirm_reset(
+    request: Request,
     body: schemas.PasswordResetConfirm,
     db: Annotated[Session, Depends(get_db)],
 ):
     """Confirm password reset with token and set new password.
 
     Args:
+        request: The incoming request (used for rate limiting)
         body: Password reset confirmation with token and new password
         db: Database session
 
@@ -76,21 +128,16 @@ def confirm_reset(
 
     Raises:
         HTTPException: If token is invalid or expired (400 Bad Request)
+            or the client is rate limited (429 Too Many Requests)
     """
+    enforce_rate_limit(request, "password_reset_confirm")
+
     # Hash the provided token to compare with stored hash
     token_hash = hashlib.sha256(body.token.encode()).hexdigest()
     now = datetime.now(timezone.utc)
 
     # Find valid, unused token that hasn't expired
-    reset_token = (
-        db.query(PasswordResetToken)
-        .filter(
-            PasswordResetToken.token_hash == token_hash,
-            PasswordResetToken.used_at.is_(None),
-            PasswordResetToken.expires_at > now,
-        )
-        .first()
-    )
+    reset_token = await run_in_threadpool(_find_valid_reset_token, db, token_hash, now)
 
     if not reset_token:
         raise HTTPException(
@@ -98,21 +145,12 @@ def confirm_reset(
             detail="Invalid or expired token",
         )
 
-    # Update user's password
-    new_hash = hash_password(body.new_password)
-    user = db.query(User).filter(User.id == reset_token.user_id).first()
-    if not user:
+    # Update user's password (bcrypt runs on its own bounded pool)
+    new_hash = await hash_password_async(body.new_password)
+    if not await run_in_threadpool(_set_new_password, db, reset_token, new_hash, now):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User not found",
         )
 
-    user.password_hash = new_hash
-    user.updated_at = now
-
-    # Mark token as used
-    reset_token.used_at = now
-
-    db.commit()
-
     return {"ok": True}
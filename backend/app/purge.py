@@ -0,0 +1,167 @@
+"""Batched purge of expired sessions, tokens and other bookkeeping rows.
+
+Rows are deleted a small batch at a time, each batch in its own short
+transaction::
+
+    DELETE FROM t WHERE ctid IN (
+        SELECT ctid FROM t WHERE <expired> LIMIT n FOR UPDATE SKIP LOCKED
+    )
+
+so no statement holds row locks (or bloats WAL) for long. ``SKIP LOCKED``
+leaves rows alone that a login or refresh is using right now, and a short
+``lock_timeout`` makes a batch give up instead of queueing behind DDL. The
+job runs periodically in the API (see ``app.scheduler``) or once from the
+command line.
+
+Usage:
+    python -m app.purge [--batch-size 1000] [--pause-ms 100] [--max-batches N]
+"""
+
+import argparse
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from . import reports
+from .config import settings
+from .db import engine
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Table -> condition selecting rows that are safe to delete
+PURGE_TARGETS = {
+    # Revoked sessions are kept until they expire: a rotated refresh token
+    # must stay recognizable so that replaying it revokes the whole family
+    "sessions": "expires_at < now()",
+    # Reset tokens are single use
+    "password_reset_tokens": "expires_at < now() OR used_at IS NOT NULL",
+    # Cursors older than this are answered with a full resync (app.sync)
+    "sync_tombstones": (
+        f"deleted_at < now() - interval '{int(settings.sync_tombstone_days)} days'"
+    ),
+    "idempotency_keys": "expires_at < now()",
+    # Finished background jobs, results included
+    "jobs": (
+        f"finished_at < now() - interval '{int(settings.job_retention_days)} days'"
+    ),
+}
+
+
+def purge_table(
+    bind: Engine,
+    table: str,
+    condition: str,
+    batch_size: int,
+    pause: float,
+    lock_timeout_ms: int,
+    max_batches: Optional[int] = None,
+) -> int:
+    """Delete rows matching ``condition`` from ``table`` in batches.
+
+    Stops when a batch comes back short, after ``max_batches`` batches, or
+    when a batch hits the lock timeout (the next run picks up the rest).
+
+    Args:
+        bind: Engine to run the batches on
+        table: Table name (from PURGE_TARGETS, never user input)
+        condition: SQL condition selecting expired rows
+        batch_size: Maximum rows deleted per transaction
+        pause: Seconds to sleep between batches
+        lock_timeout_ms: Per-batch ``lock_timeout``
+        max_batches: Optional cap on the number of batches
+
+    Returns:
+        Number of rows deleted
+    """
+    delete = text(
+        f"DELETE FROM {table} WHERE ctid IN ("
+        f"SELECT ctid FROM {table} WHERE {condition} "
+        f"LIMIT :batch_size FOR UPDATE SKIP LOCKED)"
+    )
+    deleted = 0
+    batches = 0
+    with metrics.timer(f"purge.{table}.duration"):
+        while max_batches is None or batches < max_batches:
+            if batches:
+                time.sleep(pause)
+            try:
+                with metrics.timer(f"purge.{table}.batch"), bind.begin() as conn:
+                    conn.execute(
+                        text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}")
+                    )
+                    count = conn.execute(delete, {"batch_size": batch_size}).rowcount
+            except OperationalError as exc:
+                metrics.incr(f"purge.{table}.lock_timeouts")
+                logger.warning("Purge of %s stopped early: %s", table, exc.orig)
+                break
+
+            batches += 1
+            deleted += count
+            metrics.incr(f"purge.{table}.batches")
+            metrics.incr(f"purge.{table}.deleted", count)
+            if count < batch_size:
+                break
+
+    return deleted
+
+
+def purge_expired(
+    batch_size: Optional[int] = None,
+    pause_ms: Optional[int] = None,
+    max_batches: Optional[int] = None,
+    bind: Engine = engine,
+) -> dict[str, int]:
+    """Purge every table in PURGE_TARGETS.
+
+    Args:
+        batch_size: Rows per batch (defaults to settings.purge_batch_size)
+        pause_ms: Pause between batches (defaults to settings.purge_batch_pause_ms)
+        max_batches: Optional cap on batches per table
+        bind: Engine to use
+
+    Returns:
+        Mapping of table name to rows deleted
+    """
+    batch_size = batch_size or settings.purge_batch_size
+    pause_ms = settings.purge_batch_pause_ms if pause_ms is None else pause_ms
+
+    results = {}
+    for table, condition in PURGE_TARGETS.items():
+        results[table] = purge_table(
+            bind,
+            table,
+            condition,
+            batch_size=batch_size,
+            pause=pause_ms / 1000,
+            lock_timeout_ms=settings.purge_lock_timeout_ms,
+            max_batches=max_batches,
+        )
+        logger.info("Purged %d rows from %s", results[table], table)
+    # Files of annual reports whose jobs are being purged
+    results["report files"] = reports.purge_files()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=settings.purge_batch_size)
+    parser.add_argument("--pause-ms", type=int, default=settings.purge_batch_pause_ms)
+    parser.add_argument("--max-batches", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = time.perf_counter()
+    results = purge_expired(args.batch_size, args.pause_ms, args.max_batches)
+    elapsed = time.perf_counter() - start
+    for table, count in results.items():
+        print(f"{table:<24} {count:>10} rows deleted")
+    print(f"done in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Sliding-window rate limiting for the authentication endpoints.
+
+Login, registration and password reset are expensive (bcrypt) or write to
+the database on every call, so they are limited per client IP and per email
+address. Checks run at the very top of each endpoint, before any hashing or
+database work, and raise 429 Too Many Requests with a ``Retry-After`` header.
+
+The limiter uses the sliding-window counter algorithm: it keeps a counter
+for the current and previous fixed windows and weights the previous one by
+how much of it still overlaps the sliding window. That needs O(1) memory per
+key and no per-request timestamps.
+
+Counters live in process memory by default. Set ``RATE_LIMIT_STORAGE_URL``
+to a ``redis://`` URL (requires the optional ``redis`` package) to share
+them across workers.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, status
+
+from .config import settings
+
+try:  # redis is only needed for the shared backend
+    import redis
+except ImportError:  # pragma: no cover - depends on the environment
+    redis = None
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """A limit of ``limit`` hits per ``window`` seconds."""
+
+    limit: int
+    window: int
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """Parse a limit such as ``"5/minute"`` or ``"100/hour"``."""
+        count, _, period = value.partition("/")
+        try:
+            return cls(limit=int(count), window=PERIODS[period.strip().lower()])
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid rate limit: {value!r}")
+
+
+def sliding_window_retry_after(
+    current: int, previous: int, limit: int, window: int, elapsed: float
+) -> Optional[float]:
+    """Decide whether one more hit fits in the sliding window.
+
+    Args:
+        current: Hits counted in the current fixed window
+        previous: Hits counted in the previous fixed window
+        limit: Maximum hits per sliding window
+        window: Window length in seconds
+        elapsed: Seconds elapsed since the current fixed window started
+
+    Returns:
+        None if the hit is allowed, otherwise seconds until it would be
+    """
+    weight = 1 - elapsed / window
+    if previous * weight + current + 1 <= limit:
+        return None
+    if current + 1 > limit or previous == 0:
+        return window - elapsed
+    # Wait until the previous window's weight has decayed enough
+    needed_weight = (limit - current - 1) / previous
+    return max((weight - needed_weight) * window, 0.0)
+
+
+class MemoryBackend:
+    """Per-process counters guarded by a lock (endpoints run in threads).
+
+    Counters are grouped by window length and kept in order of their last
+    hit, so within a group the oldest entry is also the first to expire (two
+    windows after the window it was last hit in). Every hit pops expired
+    entries from that end, which keeps the store to the keys that can still
+    affect a decision without ever scanning it.
+    """
+
+    def __init__(self):
+        # window -> key -> (window index, current, previous, expires at)
+        self._counters: dict[int, OrderedDict[str, tuple[int, int, int, float]]] = (
+            defaultdict(OrderedDict)
+        )
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, rule: RateLimit, now: float) -> Optional[float]:
+        index = int(now // rule.window)
+        elapsed = now - index * rule.window
+        with self._lock:
+            self._evict(now)
+            counters = self._counters[rule.window]
+            window_index, current, previous, _ = counters.pop(key, (index, 0, 0, 0))
+            if window_index != index:
+                previous = current if window_index == index - 1 else 0
+                current = 0
+            retry_after = sliding_window_retry_after(
+                current, previous, rule.limit, rule.window, elapsed
+            )
+            if retry_after is None:
+                current += 1
+            counters[key] = (index, current, previous, (index + 2) * rule.window)
+        return retry_after
+
+    def _evict(self, now: float) -> None:
+        for counters in self._counters.values():
+            while counters:
+                key = next(iter(counters))
+                if counters[key][3] > now:
+                    break
+                del counters[key]
+
+    def __len__(self) -> int:
+        return sum(len(counters) for counters in self._counters.values())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
+# Atomically read both windows and increment the current one if allowed
+_REDIS_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local weight = 1 - tonumber(ARGV[3]) / tonumber(ARGV[2])
+if previous * weight + current + 1 <= limit then
+    redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]) * 2)
+    return {1, current, previous}
+end
+return {0, current, previous}
+"""
+
+
+class RedisBackend:
+    """Counters shared by all workers through Redis."""
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError(
+                "RATE_LIMIT_STORAGE_URL points at Redis but the 'redis' "
+                "package is not installed"
+            )
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_SCRIPT)
+
+    def hit(self, key: str, rule: RateLimit, now: float) -> Optional[float]:
+        index = int(now // rule.window)
+        elapsed = now - index * rule.window
+        allowed, current, previous = self._script(
+            keys=[f"rl:{key}:{index}", f"rl:{key}:{index - 1}"],
+            args=[rule.limit, rule.window, elapsed],
+        )
+        if allowed:
+            return None
+        return sliding_window_retry_after(
+            int(current), int(previous), rule.limit, rule.window, elapsed
+        )
+
+    def reset(self) -> None:  # pragma: no cover - needs a Redis server
+        for key in self._client.scan_iter("rl:*"):
+            self._client.delete(key)
+
+
+def create_backend(url: str):
+    """Build the counter backend named by a storage URL."""
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    if url in ("", "memory://"):
+        return MemoryBackend()
+    raise ValueError(f"Unsupported rate limit storage: {url!r}")
+
+
+class RateLimiter:
+    """Applies named per-IP and per-email limits against a backend."""
+
+    def __init__(self, backend, clock: Callable[[], float] = time.time):
+        self.backend = backend
+        self.clock = clock
+
+    def check(self, key: str, rule: RateLimit) -> Optional[float]:
+        """Count one hit for ``key``; return seconds to wait if over the limit."""
+        return self.backend.hit(key, rule, self.clock())
+
+
+def _rule(value: Optional[str]) -> Optional[RateLimit]:
+    return RateLimit.parse(value) if value else None
+
+
+# Per-action limits: (per-IP, per-email)
+LIMITS = {
+    "login": (
+        _rule(settings.rate_limit_login_per_ip),
+        _rule(settings.rate_limit_login_per_email),
+    ),
+    "register": (_rule(settings.rate_limit_register_per_ip), None),
+    "password_reset": (
+        _rule(settings.rate_limit_reset_per_ip),
+        _rule(settings.rate_limit_reset_per_email),
+    ),
+    "password_reset_confirm": (_rule(settings.rate_limit_reset_per_ip), None),
+}
+
+limiter = RateLimiter(create_backend(settings.rate_limit_storage_url))
+
+
+def enforce_rate_limit(
+    request: Request, action: str, email: Optional[str] = None
+) -> None:
+    """Reject the request if the client IP or email is over its limit.
+
+    Args:
+        request: The incoming request (used for the client IP)
+        action: Key into ``LIMITS``, e.g. ``"login"``
+        email: Optional email address to limit independently of the IP
+
+    Raises:
+        HTTPException: If a limit is exceeded (429 Too Many Requests)
+    """
+    if not settings.rate_limit_enabled:
+        return
+
+    per_ip, per_email = LIMITS[action]
+    checks = []
+    if per_ip:
+        ip = request.client.host if request.client else "unknown"
+        checks.append((f"{action}:ip:{ip}", per_ip))
+    if per_email and email:
+        checks.append((f"{action}:email:{email.lower()}", per_email))
+
+    for key, rule in checks:
+        retry_after = limiter.check(key, rule)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
@@ -0,0 +1,194 @@
+"""Moving many transactions to another category at once.
+
+Both operations run as a few set-based statements in the caller's database
+transaction, however many transactions they touch:
+
+* ``merge`` folds one category into another: every transaction, recurring
+  rule and (if the target has none) alert threshold is pointed at the
+  target with one ``UPDATE`` each, the source's monthly rollup rows are
+  added to the target's, and the source is deleted. Archived transactions
+  (``app.archive``) are rewritten in their files by ``merge_archived``
+  once that has been committed, so a rollback never leaves them pointing
+  at the target.
+* ``recategorize`` moves the transactions matching a filter. One ``UPDATE``
+  joined to the matching rows returns, grouped by old category, month and
+  type, what left each rollup row, and ``rollups.move`` applies that in a
+  single upsert. Archived transactions are read-only and keep their
+  category.
+
+The transaction rows change with the usual sync trigger, so offline clients
+pick the new categories up on their next pull.
+"""
+
+import json
+import logging
+import uuid
+from typing import Optional
+
+from sqlalchemy import Date, cast, func, select, update
+from sqlalchemy.orm import Session
+
+from . import archive, models, rollups, schemas
+from .rollups import MonthTotal
+
+logger = logging.getLogger(__name__)
+
+
+def merge(
+    db: Session, source: models.Category, target: models.Category
+) -> tuple[int, list[MonthTotal]]:
+    """Fold ``source`` into ``target`` and delete it (the caller commits).
+
+    Both categories belong to the same user; the caller checks that they
+    may be merged.
+
+    Returns:
+        Number of transactions moved (archived ones included), and the
+        updated rollup totals
+    """
+    transactions = models.Transaction.__table__
+    moved = db.execute(
+        update(transactions)
+        .where(
+            transactions.c.user_id == source.user_id,
+            transactions.c.category_id == source.id,
+        )
+        .values(category_id=target.id)
+    ).rowcount
+
+    # The rollup covers archived months too, so move whole rows
+    totals = models.CategoryMonthlyTotal
+    rows = (
+        db.query(
+            totals.category_id,
+            totals.month,
+            totals.type,
+            totals.total_cents,
+            totals.count,
+        )
+        .filter(totals.user_id == source.user_id, totals.category_id == source.id)
+        .with_for_update()
+        .all()
+    )
+    changed = rollups.move(db, source.user_id, rows, target.id)
+    moved += archive.count(source.user_id, source.id)
+
+    db.query(models.RecurringRule).filter(
+        models.RecurringRule.category_id == source.id
+    ).update({"category_id": target.id}, synchronize_session=False)
+    target_has_threshold = (
+        db.query(models.CategoryThreshold.id)
+        .filter(models.CategoryThreshold.category_id == target.id)
+        .first()
+    )
+    if target_has_threshold is None:
+        db.query(models.CategoryThreshold).filter(
+            models.CategoryThreshold.category_id == source.id
+        ).update({"category_id": target.id}, synchronize_session=False)
+
+    # Emptied rollup rows and thresholds left behind cascade. Not db.delete,
+    # which would load (and scan transactions for) the category's children
+    db.query(models.Category).filter(models.Category.id == source.id).delete(
+        synchronize_session=False
+    )
+    db.expunge(source)
+    return moved, [total for total in changed if total.category_id == target.id]
+
+
+def merge_archived(
+    user_id: uuid.UUID, source_id: uuid.UUID, target_id: uuid.UUID
+) -> None:
+    """After ``merge`` committed, move the archived transactions as well.
+
+    Failures are logged rather than raised, as the merge itself stands;
+    calling this again finishes the job.
+    """
+    try:
+        archive.recategorize(user_id, source_id, target_id)
+    except OSError:
+        logger.exception(
+            "Could not move archived transactions of category %s to %s",
+            source_id,
+            target_id,
+        )
+
+
+def recategorize(
+    db: Session,
+    user: models.User,
+    where: schemas.RecategorizeFilter,
+    category_id: Optional[uuid.UUID],
+) -> tuple[int, list[MonthTotal]]:
+    """Move the user's transactions matching ``where`` to ``category_id``.
+
+    Args:
+        db: Database session; the caller commits
+        user: Owner of the transactions (admins included: only their own)
+        where: Which transactions to move
+        category_id: New category, already checked to be the user's, or
+            None to uncategorize
+
+    Returns:
+        Number of transactions moved, and the updated rollup totals
+    """
+    # Imported here: transactions_router imports this module
+    from .transactions_router import build_list_query
+
+    Transaction = models.Transaction
+    query = build_list_query(
+        db,
+        user,
+        type=where.type,
+        category_id=where.category_id,
+        start_date=where.start_date,
+        end_date=where.end_date,
+        min_amount=where.min_amount,
+        max_amount=where.max_amount,
+        q=where.q,
+        metadata=json.dumps(where.metadata) if where.metadata else None,
+        metadata_keys=where.metadata_keys,
+    ).filter(
+        Transaction.user_id == user.id,
+        Transaction.category_id.is_distinct_from(category_id),
+    )
+    if where.uncategorized:
+        query = query.filter(Transaction.category_id.is_(None))
+    matched = (
+        query.order_by(None)
+        .with_entities(
+            Transaction.id,
+            Transaction.occurred_at,
+            Transaction.category_id.label("old_category_id"),
+        )
+        .with_for_update()
+        .subquery()
+    )
+
+    transactions = Transaction.__table__
+    month = func.date_trunc("month", func.timezone("UTC", transactions.c.occurred_at))
+    moved = (
+        update(transactions)
+        .where(
+            transactions.c.id == matched.c.id,
+            transactions.c.occurred_at == matched.c.occurred_at,
+        )
+        .values(category_id=category_id)
+        .returning(
+            matched.c.old_category_id,
+            cast(month, Date).label("month"),
+            transactions.c.type,
+            transactions.c.amount_cents,
+        )
+        .cte("moved")
+    )
+    groups = db.execute(
+        select(
+            moved.c.old_category_id,
+            moved.c.month,
+            moved.c.type,
+            func.sum(moved.c.amount_cents),
+            func.count(),
+        ).group_by(moved.c.old_category_id, moved.c.month, moved.c.type)
+    ).all()
+    changed = rollups.move(db, user.id, groups, category_id)
+    return sum(group[4] for group in groups), changed
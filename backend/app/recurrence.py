@@ -0,0 +1,428 @@
+"""Recurring transactions (rent, tuition, subscriptions).
+
+A rule is a transaction template plus an RRULE-like schedule:
+``FREQ=DAILY|WEEKLY|MONTHLY|YEARLY`` with optional ``INTERVAL``, ``COUNT``
+and ``UNTIL=YYYYMMDD``, counted from ``starts_on``. Occurrence ``k`` is
+computed directly from ``starts_on`` (not from the previous occurrence), and
+monthly/yearly dates past the end of a month fall on its last day, so a
+rule starting on the 31st stays on month ends.
+
+Occurrences are materialized into real transactions only once they are
+due, because transactions may not be dated in the future. Each rule keeps
+a high-water mark: ``materialized_through`` (last date created),
+``generated_count`` and ``next_occurrence_on`` (NULL once the schedule is
+exhausted), so every occurrence is created exactly once. Due occurrences
+are created by ``materialize_due`` (scheduled, or ``python -m
+app.recurrence``) and lazily by ``catch_up`` when a user's transactions are
+queried. A unique index on ``(recurring_rule_id, occurred_at)`` backs this
+up.
+
+Future occurrences are only ever *projected*: ``projected`` computes them
+for a date range on request, at most ``settings.recurring_projection_days``
+ahead, without storing anything.
+
+Usage:
+    python -m app.recurrence [--through 2024-12-31]
+"""
+
+import argparse
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Iterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .config import settings
+from .db import SessionLocal, engine
+from .metrics import metrics
+from .replicas import recent_writers
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+RRULE_PART = re.compile(r"^(FREQ|INTERVAL|COUNT|UNTIL)=([A-Z0-9]+)$")
+
+
+@dataclass(frozen=True)
+class Schedule:
+    """The parsed form of an RRULE string."""
+
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[date] = None
+
+
+def parse_rrule(value: str) -> Schedule:
+    """Parse e.g. ``FREQ=MONTHLY;INTERVAL=1;COUNT=12``.
+
+    Raises:
+        ValueError: If a part is missing, unknown or invalid
+    """
+    parts = {}
+    for part in value.upper().removeprefix("RRULE:").split(";"):
+        match = RRULE_PART.match(part.strip())
+        if match is None:
+            raise ValueError(f"Unsupported RRULE part: {part!r}")
+        parts[match.group(1)] = match.group(2)
+
+    if parts.get("FREQ") not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    if "COUNT" in parts and "UNTIL" in parts:
+        raise ValueError("COUNT and UNTIL cannot both be set")
+    schedule = Schedule(
+        freq=parts["FREQ"],
+        interval=int(parts.get("INTERVAL", 1)),
+        count=int(parts["COUNT"]) if "COUNT" in parts else None,
+        until=(
+            datetime.strptime(parts["UNTIL"][:8], "%Y%m%d").date()
+            if "UNTIL" in parts
+            else None
+        ),
+    )
+    if schedule.interval < 1 or (schedule.count is not None and schedule.count < 1):
+        raise ValueError("INTERVAL and COUNT must be positive")
+    return schedule
+
+
+def format_rrule(rule: models.RecurringRule) -> str:
+    """RRULE string for a stored rule."""
+    parts = [f"FREQ={rule.freq}"]
+    if rule.interval != 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    if rule.until is not None:
+        parts.append(f"UNTIL={rule.until:%Y%m%d}")
+    return ";".join(parts)
+
+
+def _add_months(day: date, months: int) -> date:
+    total = day.year * 12 + day.month - 1 + months
+    year, month = divmod(total, 12)
+    month += 1
+    next_month = date(year + (month == 12), month % 12 + 1, 1)
+    return date(year, month, min(day.day, (next_month - timedelta(days=1)).day))
+
+
+def occurrence(rule: models.RecurringRule, k: int) -> Optional[date]:
+    """Date of the rule's ``k``-th occurrence (from 0), or None past its end."""
+    if rule.count is not None and k >= rule.count:
+        return None
+    step = rule.interval * k
+    if rule.freq == "DAILY":
+        day = rule.starts_on + timedelta(days=step)
+    elif rule.freq == "WEEKLY":
+        day = rule.starts_on + timedelta(weeks=step)
+    elif rule.freq == "MONTHLY":
+        day = _add_months(rule.starts_on, step)
+    else:  # YEARLY
+        day = _add_months(rule.starts_on, 12 * step)
+    if rule.until is not None and day > rule.until:
+        return None
+    return day
+
+
+def reset_schedule(rule: models.RecurringRule) -> None:
+    """Recompute the high-water mark after the schedule changed.
+
+    Occurrences up to ``materialized_through`` already exist; the new
+    schedule continues with its first occurrence after that date.
+    """
+    k = 0
+    if rule.materialized_through is not None:
+        while (day := occurrence(rule, k)) is not None and (
+            day <= rule.materialized_through
+        ):
+            k += 1
+    rule.generated_count = k
+    rule.next_occurrence_on = occurrence(rule, k)
+
+
+def occurred_at(day: date) -> datetime:
+    """Timestamp given to a materialized occurrence (midnight UTC)."""
+    return datetime.combine(day, dt_time.min, tzinfo=timezone.utc)
+
+
+def template(
+    rule: models.RecurringRule, day: Optional[date] = None
+) -> schemas.TransactionCreate:
+    """The rule's transaction as a create body (dated ``day`` if given)."""
+    return schemas.TransactionCreate(
+        category_id=rule.category_id,
+        type=rule.type,
+        amount_cents=rule.amount_cents,
+        occurred_at=occurred_at(day) if day is not None else None,
+        description=rule.description,
+        metadata_=rule.metadata_,
+    )
+
+
+def materialize(
+    db: Session, rule: models.RecurringRule, through: date
+) -> tuple[int, list[dict]]:
+    """Create the rule's transactions dated up to ``through``.
+
+    The caller must hold the rule's row lock and commits.
+
+    Returns:
+        Number of transactions created and the events to publish after the
+        commit
+    """
+    # Imported here: transactions_router imports this module
+    from .transactions_router import create_transaction_record
+
+    created, events = 0, []
+    while rule.next_occurrence_on is not None and rule.next_occurrence_on <= through:
+        day = rule.next_occurrence_on
+        _, new_events = create_transaction_record(
+            db, rule.user, template(rule, day), recurring_rule_id=rule.id
+        )
+        events.extend(new_events)
+        rule.materialized_through = day
+        rule.generated_count += 1
+        rule.next_occurrence_on = occurrence(rule, rule.generated_count)
+        created += 1
+    metrics.incr("recurring.materialized", created)
+    return created, events
+
+
+def _materialize_locked(
+    db: Session, rules: list[models.RecurringRule], through: date
+) -> tuple[int, list[tuple[uuid.UUID, dict]]]:
+    """Materialize each rule in its own savepoint.
+
+    Returns:
+        Number of transactions created and (user_id, event) pairs
+    """
+    total, events = 0, []
+    for rule in rules:
+        try:
+            with db.begin_nested():
+                created, rule_events = materialize(db, rule, through)
+        except HTTPException as exc:  # e.g. its category changed type
+            metrics.incr("recurring.failed")
+            logger.warning(
+                "Recurring rule %s not materialized: %s", rule.id, exc.detail
+            )
+            continue
+        total += created
+        events.extend((rule.user_id, event) for event in rule_events)
+    return total, events
+
+
+def _due(db: Session, through: date):
+    rule = models.RecurringRule
+    return db.query(rule).filter(
+        rule.active.is_(True),
+        rule.next_occurrence_on.isnot(None),
+        rule.next_occurrence_on <= through,
+    )
+
+
+def materialize_due(
+    through: Optional[date] = None, batch_size: int = 100, bind: Engine = engine
+) -> int:
+    """Create every due occurrence of every rule, a batch of rules at a time.
+
+    Rules are locked with ``SKIP LOCKED``, so concurrent runs (one per
+    worker) and ``catch_up`` share the work instead of repeating it.
+
+    Args:
+        through: Last date to materialize (defaults to today, UTC)
+        batch_size: Rules per transaction
+        bind: Engine to use (defaults to the app's)
+
+    Returns:
+        Number of transactions created
+    """
+    # Imported here: transactions_router imports this module
+    from .transactions_router import publish_events
+
+    through = through or datetime.now(timezone.utc).date()
+    total = 0
+    while True:
+        with SessionLocal(bind=bind) as db:
+            rules = (
+                _due(db, through)
+                .order_by(models.RecurringRule.next_occurrence_on)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            created, events = _materialize_locked(db, rules, through)
+            db.commit()
+        for user_id, event in events:
+            publish_events(user_id, [event])
+        total += created
+        if len(rules) < batch_size:
+            return total
+
+
+# Users whose rules this worker already caught up today (see ``catch_up``).
+# One entry per active user per day; cleared at UTC midnight, or early once
+# it reaches CAUGHT_UP_MAX (forgetting only costs those users a re-check)
+CAUGHT_UP_MAX = 100_000
+_caught_up: set[uuid.UUID] = set()
+_caught_up_on: Optional[date] = None
+
+
+def catch_up(user_id: uuid.UUID) -> None:
+    """Materialize a user's due occurrences before their data is read.
+
+    Called by the transaction read endpoints (through
+    ``transactions_router.get_caught_up_read_db``) so recurring transactions
+    show up even if the scheduled job has not run yet. Runs on the primary,
+    in its own session, and at most once per user per day in each worker.
+    Rules locked by a concurrent ``materialize_due`` are left to it. When
+    it creates transactions, the user's reads go to the primary for a
+    while (``replicas.recent_writers``), as after any other write.
+    """
+    global _caught_up_on
+    # Imported here: transactions_router imports this module
+    from .transactions_router import publish_events
+
+    today = datetime.now(timezone.utc).date()
+    if _caught_up_on != today or len(_caught_up) >= CAUGHT_UP_MAX:
+        _caught_up.clear()
+        _caught_up_on = today
+    if user_id in _caught_up:
+        return
+
+    with SessionLocal() as db:
+        rules = (
+            _due(db, today)
+            .filter(models.RecurringRule.user_id == user_id)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        created, events = _materialize_locked(db, rules, today)
+        db.commit()
+    if created:
+        recent_writers.mark(user_id, settings.replica_sticky_seconds)
+    publish_events(user_id, [event for _, event in events])
+    _caught_up.add(user_id)
+
+
+def forget_caught_up(user_id: uuid.UUID) -> None:
+    """Check the user's rules again on their next read (after rule edits)."""
+    _caught_up.discard(user_id)
+
+
+@dataclass
+class ProjectedOccurrence:
+    """A future occurrence of a rule; computed on request, never stored."""
+
+    rule: models.RecurringRule
+    day: date
+
+    @property
+    def id(self) -> uuid.UUID:
+        # Stable across requests, so clients can key list items on it
+        return uuid.uuid5(self.rule.id, self.day.isoformat())
+
+    def as_transaction(self) -> schemas.TransactionOut:
+        """The occurrence in the shape of a listed transaction."""
+        rule = self.rule
+        return schemas.TransactionOut(
+            id=self.id,
+            user_id=rule.user_id,
+            category_id=rule.category_id,
+            type=rule.type,
+            amount_cents=rule.amount_cents,
+            occurred_at=occurred_at(self.day),
+            description=rule.description,
+            receipt_url=None,
+            metadata_=rule.metadata_,
+            created_at=rule.created_at,
+            recurring_rule_id=rule.id,
+            projected=True,
+        )
+
+
+def _project(
+    rule: models.RecurringRule, first: date, last: date
+) -> Iterator[ProjectedOccurrence]:
+    k = rule.generated_count
+    while (day := occurrence(rule, k)) is not None and day <= last:
+        if day >= first:
+            yield ProjectedOccurrence(rule, day)
+        k += 1
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def projected(
+    db: Session,
+    user_id: uuid.UUID,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+) -> list[ProjectedOccurrence]:
+    """Future occurrences of the user's rules dated within [start, end].
+
+    Occurrences after ``settings.recurring_projection_days`` from now are
+    never projected, so an open-ended range stays bounded.
+
+    Returns:
+        Projected occurrences, ordered by date
+    """
+    today = (now or datetime.now(timezone.utc)).astimezone(timezone.utc).date()
+    last = today + timedelta(days=settings.recurring_projection_days)
+    if end is not None:
+        last = min(last, _utc(end).date())
+    first = today + timedelta(days=1)
+    if start is not None:
+        start = _utc(start)
+        start_day = start.date()
+        if start > occurred_at(start_day):
+            start_day += timedelta(days=1)  # that day's occurrence is before start
+        first = max(first, start_day)
+    if first > last:
+        return []
+
+    rules = (
+        db.query(models.RecurringRule)
+        .filter(
+            models.RecurringRule.user_id == user_id,
+            models.RecurringRule.active.is_(True),
+            models.RecurringRule.next_occurrence_on.isnot(None),
+            models.RecurringRule.next_occurrence_on <= last,
+        )
+        .all()
+    )
+    occurrences = [o for rule in rules for o in _project(rule, first, last)]
+    return sorted(occurrences, key=lambda o: (o.day, str(o.rule.id)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--through", type=date.fromisoformat, help="YYYY-MM-DD (default today)"
+    )
+    args = parser.parse_args()
+    if args.through and args.through > datetime.now(timezone.utc).date():
+        parser.error("--through cannot be in the future")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = time.perf_counter()
+    created = materialize_due(args.through)
+    print(
+        f"{created} recurring transactions created in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Recurring transaction rules (see ``app.recurrence``)."""
+
+from datetime import datetime, timedelta, timezone
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from . import models, recurrence, schemas
+from .config import settings
+from .db import get_db
+from .deps import get_current_user
+from .idempotency import Idempotency, claim_idempotency_key
+from .replicas import get_read_db
+from .transactions_router import publish_events, validate_transaction_body
+
+router = APIRouter(prefix="/api/recurring", tags=["recurring"])
+
+
+def rule_out(rule: models.RecurringRule) -> schemas.RecurringRuleOut:
+    return schemas.RecurringRuleOut(
+        id=rule.id,
+        user_id=rule.user_id,
+        rrule=recurrence.format_rrule(rule),
+        starts_on=rule.starts_on,
+        active=rule.active,
+        category_id=rule.category_id,
+        type=rule.type,
+        amount_cents=rule.amount_cents,
+        description=rule.description,
+        metadata_=rule.metadata_,
+        materialized_through=rule.materialized_through,
+        next_occurrence_on=rule.next_occurrence_on,
+        created_at=rule.created_at,
+    )
+
+
+def apply_rule_body(
+    db: Session,
+    user: models.User,
+    rule: models.RecurringRule,
+    body: schemas.RecurringRuleCreate,
+) -> None:
+    """Validate a create/update body and copy it onto ``rule``.
+
+    Raises:
+        HTTPException: If the RRULE is invalid, ``starts_on`` is more than
+            ``settings.recurring_max_backfill_days`` ago (unless unchanged) or
+            the template breaks the transaction rules (400), or the category
+            is not the user's (404)
+    """
+    try:
+        schedule = recurrence.parse_rrule(body.rrule)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    today = datetime.now(timezone.utc).date()
+    starts_on = body.starts_on or today
+    # Past occurrences are created inside this request, so bound how many
+    earliest = today - timedelta(days=settings.recurring_max_backfill_days)
+    if starts_on < earliest and starts_on != rule.starts_on:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"starts_on cannot be before {earliest.isoformat()}",
+        )
+
+    rule.starts_on = starts_on
+    rule.freq = schedule.freq
+    rule.interval = schedule.interval
+    rule.count = schedule.count
+    rule.until = schedule.until
+    rule.active = body.active
+    rule.category_id = body.category_id
+    rule.type = body.type
+    rule.amount_cents = body.amount_cents
+    rule.description = body.description
+    rule.metadata_ = body.metadata_
+    # Same checks as a transaction entered by hand (category, type)
+    validate_transaction_body(db, user, recurrence.template(rule))
+    recurrence.reset_schedule(rule)
+
+
+def find_rule(db: Session, user: models.User, rule_id: UUID) -> models.RecurringRule:
+    """The user's rule, locked for update.
+
+    Raises:
+        HTTPException: If the user has no such rule (404 Not Found)
+    """
+    rule = (
+        db.query(models.RecurringRule)
+        .filter(
+            models.RecurringRule.id == rule_id,
+            models.RecurringRule.user_id == user.id,
+        )
+        .with_for_update()
+        .first()
+    )
+    if rule is None:
+        raise HTTPException(status_code=404, detail="Recurring rule not found")
+    return rule
+
+
+def materialize_until_today(db: Session, rule: models.RecurringRule) -> list[dict]:
+    """Create the rule's occurrences that are already due (not committed).
+
+    Returns:
+        Events to publish after the commit
+    """
+    if not rule.active:
+        return []
+    _, events = recurrence.materialize(db, rule, datetime.now(timezone.utc).date())
+    return events
+
+
+@router.post("", response_model=schemas.RecurringRuleOut, status_code=201)
+def create_rule(
+    body: schemas.RecurringRuleCreate,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    idempotency: Annotated[Idempotency, Depends(claim_idempotency_key)],
+):
+    """Create a recurring transaction rule.
+
+    Occurrences from ``starts_on`` up to today are created right away (so a
+    rule may backfill past months); later ones are created as they fall
+    due.
+
+    Args:
+        body: Schedule and transaction template
+        db: Database session
+        current_user: The authenticated user
+        idempotency: Claimed ``Idempotency-Key``, if any
+
+    Returns:
+        The new rule
+
+    Raises:
+        HTTPException: If the rule or its template is invalid
+    """
+    rule = models.RecurringRule(user_id=current_user.id, generated_count=0)
+    apply_rule_body(db, current_user, rule, body)
+    db.add(rule)
+    db.flush()
+    events = materialize_until_today(db, rule)
+    db.flush()
+    db.refresh(rule)  # created_at
+    response = rule_out(rule)
+    idempotency.save(201, response)
+    db.commit()
+    publish_events(current_user.id, events)
+    recurrence.forget_caught_up(current_user.id)
+    return response
+
+
+@router.get("", response_model=list[schemas.RecurringRuleOut])
+def list_rules(
+    db: Annotated[Session, Depends(get_read_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """List the current user's recurring rules, next occurrence first."""
+    rules = (
+        db.query(models.RecurringRule)
+        .filter(models.RecurringRule.user_id == current_user.id)
+        .order_by(
+            models.RecurringRule.next_occurrence_on.asc().nulls_last(),
+            models.RecurringRule.created_at,
+        )
+        .all()
+    )
+    return [rule_out(rule) for rule in rules]
+
+
+@router.put("/{rule_id}", response_model=schemas.RecurringRuleOut)
+def update_rule(
+    rule_id: UUID,
+    body: schemas.RecurringRuleCreate,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """Replace a rule's schedule and template.
+
+    Transactions already created from the rule are left as they are; the
+    new schedule continues after the last one.
+    """
+    rule = find_rule(db, current_user, rule_id)
+    apply_rule_body(db, current_user, rule, body)
+    events = materialize_until_today(db, rule)
+    db.commit()
+    db.refresh(rule)
+    publish_events(current_user.id, events)
+    recurrence.forget_caught_up(current_user.id)
+    return rule_out(rule)
+
+
+@router.delete("/{rule_id}", status_code=204)
+def delete_rule(
+    rule_id: UUID,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """Delete a rule. Transactions it already created are kept."""
+    rule = find_rule(db, current_user, rule_id)
+    db.delete(rule)
+    db.commit()
+    return None
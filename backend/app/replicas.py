@@ -0,0 +1,232 @@
+"""Read-replica routing for read-only endpoints.
+
+Set ``DATABASE_REPLICA_URLS`` (comma separated) to send read-only endpoints
+to streaming replicas. ``get_read_db`` hands out sessions round-robin over
+the replicas that passed their last health check and falls back to the
+primary when none is available, so with no replicas configured it behaves
+exactly like ``get_db``.
+
+Read-your-writes: a replica may lag the primary, so after a user makes a
+successful write (POST/PUT/PATCH/DELETE) ``ReadYourWritesMiddleware``
+records their id (from the bearer token) in ``recent_writers``, and for
+``settings.replica_sticky_seconds`` that user's reads go to the primary.
+The window is kept in process memory, so with several workers it covers
+reads served by the worker that took the write.
+
+Health checks run on the app scheduler: a replica is taken out of rotation
+when it cannot be reached or its replay lag exceeds
+``settings.replica_max_lag_seconds``, and put back once it recovers. A
+replica that fails at checkout is also taken out immediately.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.datastructures import Headers
+
+from .config import settings
+from .db import SessionLocal
+from .deps import get_current_user_id
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+ReplicaSession = sessionmaker(autocommit=False, autoflush=False, future=True)
+
+
+class ReplicaPool:
+    """Round-robin over healthy replica engines."""
+
+    def __init__(self, engines: list[Engine], max_lag_seconds: float = 0):
+        self.engines = engines
+        self.max_lag_seconds = max_lag_seconds
+        self._healthy = list(engines)
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        metrics.register_gauge("replicas.healthy", lambda: len(self._healthy))
+
+    @classmethod
+    def from_urls(cls, urls: str, max_lag_seconds: float = 0) -> "ReplicaPool":
+        """Build a pool from a comma-separated list of database URLs."""
+        engines = [
+            create_engine(url.strip(), future=True, pool_pre_ping=True)
+            for url in urls.split(",")
+            if url.strip()
+        ]
+        return cls(engines, max_lag_seconds)
+
+    @property
+    def healthy(self) -> list[Engine]:
+        """Replicas currently in rotation."""
+        return list(self._healthy)
+
+    def choose(self) -> Optional[Engine]:
+        """Return the next healthy replica, or None if there is none."""
+        with self._lock:
+            if not self._healthy:
+                return None
+            return self._healthy[next(self._counter) % len(self._healthy)]
+
+    def mark_failed(self, engine: Engine) -> None:
+        """Take a replica out of rotation until its next successful check."""
+        with self._lock:
+            if engine in self._healthy:
+                self._healthy.remove(engine)
+                logger.warning("Replica %s taken out of rotation", engine.url)
+
+    def is_healthy(self, engine: Engine) -> bool:
+        """Check that a replica answers and is not lagging too far behind."""
+        try:
+            with engine.connect() as conn:
+                if self.max_lag_seconds <= 0:
+                    conn.execute(text("SELECT 1"))
+                    return True
+                lag = conn.execute(
+                    text(
+                        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+                        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+                        "THEN 0 ELSE extract(epoch FROM "
+                        "now() - pg_last_xact_replay_timestamp()) END"
+                    )
+                ).scalar()
+        except SQLAlchemyError as exc:
+            logger.warning("Replica %s failed health check: %s", engine.url, exc)
+            return False
+        if lag is not None and lag > self.max_lag_seconds:
+            logger.warning("Replica %s is %.1fs behind", engine.url, lag)
+            return False
+        return True
+
+    def check_health(self) -> None:
+        """Re-check every replica and update the rotation."""
+        healthy = [engine for engine in self.engines if self.is_healthy(engine)]
+        with self._lock:
+            self._healthy = healthy
+        metrics.incr("replicas.health_checks")
+
+
+replicas = ReplicaPool.from_urls(
+    settings.database_replica_urls, settings.replica_max_lag_seconds
+)
+
+
+class RecentWriters:
+    """Users who wrote recently, each until their primary-read window ends.
+
+    Args:
+        clock: Time source (for tests)
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._until: dict[UUID, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: UUID, seconds: float) -> None:
+        """Send ``user_id``'s reads to the primary for ``seconds``."""
+        now = self.clock()
+        with self._lock:
+            # Drop expired windows so only recent writers are kept
+            self._until = {
+                key: until for key, until in self._until.items() if until > now
+            }
+            self._until[user_id] = now + seconds
+
+    def __contains__(self, user_id: Optional[UUID]) -> bool:
+        until = self._until.get(user_id)
+        return until is not None and until > self.clock()
+
+
+recent_writers = RecentWriters()
+
+
+def _user_id(headers: Headers) -> Optional[UUID]:
+    """The user a bearer token belongs to, or None without a valid one."""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return get_current_user_id(token)
+    except HTTPException:
+        return None
+
+
+def read_session(primary: bool = False) -> Session:
+    """Open a session on a healthy replica, or on the primary if none is.
+
+    Args:
+        primary: Skip the replicas (e.g. the client wrote recently)
+    """
+    engine = None if primary else replicas.choose()
+    if engine is not None:
+        db = ReplicaSession(bind=engine)
+        try:
+            db.connection()  # fail over now rather than mid-request
+            metrics.incr("replicas.reads")
+            return db
+        except SQLAlchemyError:
+            db.close()
+            replicas.mark_failed(engine)
+    metrics.incr("replicas.primary_reads")
+    return SessionLocal()
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: a replica when possible, else primary.
+
+    Yields:
+        Session bound to a healthy replica, or a primary session when no
+        replica is available or the user wrote recently
+    """
+    batch = getattr(request.state, "batch", None)
+    if batch is not None:  # POST /api/batch runs everything on its session
+        yield batch.db
+        return
+
+    db = read_session(primary=_user_id(request.headers) in recent_writers)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    """Pin a user's reads to the primary for a while after they write.
+
+    Args:
+        app: ASGI application
+        sticky_seconds: How long reads stay on the primary after a write
+        writers: Where the windows are kept (for tests)
+    """
+
+    def __init__(
+        self, app, sticky_seconds: float, writers: Optional[RecentWriters] = None
+    ):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+        self.writers = writers if writers is not None else recent_writers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                user_id = _user_id(Headers(scope=scope))
+                if user_id is not None:
+                    self.writers.mark(user_id, self.sticky_seconds)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
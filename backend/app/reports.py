@@ -0,0 +1,217 @@
+"""Annual spending reports, built as background jobs (``app.jobs``).
+
+``POST /api/reports`` queues a ``report`` job. A worker streams the user's
+transactions for the year into a CSV file, one month (one partition) at a
+time with a server-side cursor, so memory use does not grow with the
+number of transactions; archived ones (``app.archive``) are read from
+their yearly file and merged in. Each transaction is a ``transaction`` row, and
+every month ends with ``month_total`` rows per category and type; the
+year's ``year_total`` rows come last. Amounts are in cents.
+
+The file is written under ``settings.report_dir`` as
+``<user_id>/<job_id>.csv.part`` and renamed into place once complete, so
+a download never sees half a report. Progress is reported after every
+month and every ``PROGRESS_EVERY_ROWS`` transactions, which is also where
+a cancelled job stops (and removes its partial file). Files older than
+``settings.job_retention_days`` are removed by the purge, along with their
+jobs.
+"""
+
+import csv
+import heapq
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import archive, jobs, models
+from .config import settings
+from .replicas import read_session
+
+KIND = "report"
+PROGRESS_EVERY_ROWS = 5000
+COLUMNS = (
+    "row",
+    "month",
+    "date",
+    "category",
+    "type",
+    "description",
+    "amount_cents",
+    "count",
+)
+
+MONTH_TRANSACTIONS = text(
+    """
+    SELECT t.occurred_at, t.type, t.amount_cents, t.description,
+           coalesce(c.name, 'Uncategorized') AS category
+    FROM transactions t
+    LEFT JOIN categories c ON c.id = t.category_id
+    WHERE t.user_id = :user_id AND t.occurred_at >= :start AND t.occurred_at < :end
+    ORDER BY t.occurred_at, t.id
+    """
+)
+
+
+def report_path(user_id, job_id) -> Path:
+    """Where the finished report of job ``job_id`` is stored."""
+    return Path(settings.report_dir) / str(user_id) / f"{job_id}.csv"
+
+
+def _month_start(year: int, month: int) -> datetime:
+    if month > 12:
+        year, month = year + 1, month - 12
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+
+def _total_rows(kind: str, month: str, totals: Counter, counts: Counter) -> Iterator:
+    for (category, type_), amount in sorted(totals.items()):
+        yield (kind, month, "", category, type_, "", amount, counts[category, type_])
+
+
+def archived_by_month(db: Session, user_id, year: int) -> dict[int, list]:
+    """The user's archived transactions in ``year``, as MONTH_TRANSACTIONS rows.
+
+    Returns:
+        Month number -> rows in ``occurred_at`` order
+    """
+    rows = archive.select(
+        db,
+        user_id,
+        start=_month_start(year, 1),
+        end=_month_start(year, 13),
+        end_inclusive=False,
+    )
+    if not len(rows):
+        return {}
+    names = dict(
+        db.query(models.Category.id, models.Category.name).filter(
+            models.Category.user_id == user_id
+        )
+    )
+    months = {}
+    for values in zip(
+        rows.values("occurred_at"),
+        rows.values("type"),
+        rows.values("amount_cents"),
+        rows.values("description"),
+        rows.values("category_id"),
+    ):
+        occurred_at, type_, amount_cents, description, category_id = values
+        months.setdefault(occurred_at.month, []).append(
+            SimpleNamespace(
+                occurred_at=occurred_at,
+                type=type_,
+                amount_cents=amount_cents,
+                description=description,
+                category=names.get(category_id, "Uncategorized"),
+            )
+        )
+    return months
+
+
+def build_report(job: jobs.JobContext) -> dict:
+    """Job handler: write the annual report for ``job.params["year"]``.
+
+    Returns:
+        The file name, and transaction count and totals by type
+
+    Raises:
+        JobCancelled: If the job is cancelled along the way
+    """
+    year = job.params["year"]
+    path = report_path(job.user_id, job.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".part")
+    year_totals, year_counts = Counter(), Counter()
+    rows_written = 0
+    try:
+        with open(partial, "w", newline="") as f, read_session() as db:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            archived = archived_by_month(db, job.user_id, year)
+            for month in range(1, 13):
+                label = f"{year}-{month:02d}"
+                totals, counts = Counter(), Counter()
+                result = db.execute(
+                    MONTH_TRANSACTIONS,
+                    {
+                        "user_id": job.user_id,
+                        "start": _month_start(year, month),
+                        "end": _month_start(year, month + 1),
+                    },
+                    execution_options={"yield_per": 1000},
+                )
+                rows = heapq.merge(
+                    archived.get(month, []), result, key=lambda row: row.occurred_at
+                )
+                for row in rows:
+                    writer.writerow(
+                        (
+                            "transaction",
+                            label,
+                            row.occurred_at.astimezone(timezone.utc).date(),
+                            row.category,
+                            row.type,
+                            row.description or "",
+                            row.amount_cents,
+                            1,
+                        )
+                    )
+                    totals[row.category, row.type] += row.amount_cents
+                    counts[row.category, row.type] += 1
+                    rows_written += 1
+                    if rows_written % PROGRESS_EVERY_ROWS == 0:
+                        job.progress((month - 1) / 12)
+                writer.writerows(_total_rows("month_total", label, totals, counts))
+                year_totals.update(totals)
+                year_counts.update(counts)
+                job.progress(month / 12)
+            writer.writerows(
+                _total_rows("year_total", str(year), year_totals, year_counts)
+            )
+        os.replace(partial, path)
+    finally:
+        partial.unlink(missing_ok=True)
+
+    by_type = Counter()
+    for (_, type_), amount in year_totals.items():
+        by_type[type_] += amount
+    return {
+        "file": path.name,
+        "transactions": rows_written,
+        "income_cents": by_type["income"],
+        "expense_cents": by_type["expense"],
+    }
+
+
+def purge_files(max_age_days: Optional[int] = None) -> int:
+    """Remove report files (and leftover partial files) older than the jobs.
+
+    Args:
+        max_age_days: Defaults to settings.job_retention_days
+
+    Returns:
+        Number of files removed
+    """
+    if max_age_days is None:
+        max_age_days = settings.job_retention_days
+    root = Path(settings.report_dir)
+    if not root.is_dir():
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for path in root.glob("*/*.csv*"):
+        if path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+jobs.register(KIND, build_report)
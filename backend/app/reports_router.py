@@ -0,0 +1,195 @@
+"""Annual spending reports, generated in the background (see ``app.reports``)."""
+
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from . import jobs, models, reports, schemas
+from .config import settings
+from .db import get_db
+from .deps import get_current_user
+from .idempotency import Idempotency, claim_idempotency_key
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+ACTIVE = ("queued", "running")
+
+
+def report_out(job: models.Job) -> schemas.ReportOut:
+    """Response for a report job, with its download link once it succeeded."""
+    result = job.result or {}
+    return schemas.ReportOut(
+        id=job.id,
+        year=job.params["year"],
+        status=job.status,
+        progress=job.progress,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error,
+        download_url=(
+            f"/api/reports/{job.id}/download" if job.status == "succeeded" else None
+        ),
+        transactions=result.get("transactions"),
+        income_cents=result.get("income_cents"),
+        expense_cents=result.get("expense_cents"),
+    )
+
+
+def get_user_report(db: Session, user: models.User, report_id: UUID) -> models.Job:
+    """Load one of the user's report jobs.
+
+    Raises:
+        HTTPException: If there is no such report (404 Not Found)
+    """
+    job = (
+        db.query(models.Job)
+        .filter(
+            models.Job.id == report_id,
+            models.Job.user_id == user.id,
+            models.Job.kind == reports.KIND,
+        )
+        .first()
+    )
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return job
+
+
+@router.post("", response_model=schemas.ReportOut, status_code=202)
+def create_report(
+    body: schemas.ReportCreate,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    idempotency: Annotated[Idempotency, Depends(claim_idempotency_key)],
+):
+    """Queue an annual report; poll ``GET /api/reports/{id}`` for progress.
+
+    Args:
+        body: The year to report on
+        db: Database session
+        current_user: The authenticated user
+        idempotency: Claimed ``Idempotency-Key``, if any
+
+    Returns:
+        The queued report
+
+    Raises:
+        HTTPException: If the user already has
+            ``settings.report_max_active_per_user`` reports queued or running
+            (429 Too Many Requests)
+    """
+    # Serializes this user's requests, so the limit below holds
+    (
+        db.query(models.User.id)
+        .filter(models.User.id == current_user.id)
+        .with_for_update()
+        .one()
+    )
+    active = (
+        db.query(models.Job)
+        .filter(
+            models.Job.user_id == current_user.id,
+            models.Job.kind == reports.KIND,
+            models.Job.status.in_(ACTIVE),
+        )
+        .count()
+    )
+    if active >= settings.report_max_active_per_user:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=(
+                f"{active} reports are already in progress; wait for one to "
+                "finish or cancel it"
+            ),
+        )
+    job = jobs.submit(db, current_user.id, reports.KIND, {"year": body.year})
+    db.flush()
+    db.refresh(job)  # created_at
+    response = report_out(job)
+    idempotency.save(202, response)
+    db.commit()
+    return response
+
+
+@router.get("", response_model=list[schemas.ReportOut])
+def list_reports(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """The current user's reports, newest first (kept for a week)."""
+    rows = (
+        db.query(models.Job)
+        .filter(models.Job.user_id == current_user.id, models.Job.kind == reports.KIND)
+        .order_by(models.Job.created_at.desc())
+        .limit(50)
+        .all()
+    )
+    return [report_out(job) for job in rows]
+
+
+@router.get("/{report_id}", response_model=schemas.ReportOut)
+def get_report(
+    report_id: UUID,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """Poll a report: ``progress`` is in percent, ``download_url`` set when done."""
+    return report_out(get_user_report(db, current_user, report_id))
+
+
+@router.post("/{report_id}/cancel", response_model=schemas.ReportOut)
+def cancel_report(
+    report_id: UUID,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """Cancel a queued or running report.
+
+    A running report stops (and discards its partial file) within a month's
+    worth of transactions.
+
+    Raises:
+        HTTPException: If the report does not exist (404) or has already
+            finished (409 Conflict)
+    """
+    job = get_user_report(db, current_user, report_id)
+    if not jobs.cancel(db, job.id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Report already {job.status}",
+        )
+    db.commit()
+    db.refresh(job)
+    return report_out(job)
+
+
+@router.get("/{report_id}/download")
+def download_report(
+    report_id: UUID,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """Download a finished report as CSV.
+
+    Raises:
+        HTTPException: If the report does not exist or its file has been
+            purged (404), or it has not succeeded (409 Conflict)
+    """
+    job = get_user_report(db, current_user, report_id)
+    if job.status != "succeeded":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Report is {job.status}",
+        )
+    path = reports.report_path(job.user_id, job.id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Report file no longer exists")
+    return FileResponse(
+        path,
+        media_type="text/csv",
+        filename=f"report-{job.params['year']}.csv",
+    )
@@ -0,0 +1,194 @@
+"""Per-category monthly totals maintained on transaction writes.
+
+Every transaction contributes its amount to one ``category_monthly_totals``
+row keyed by (user, category, UTC month, type). Writers call ``apply`` in
+the same database transaction as the insert/update/delete, so the rollup
+is always consistent with ``transactions`` and month-to-date figures are a
+single-row lookup instead of a scan over history.
+
+The upsert locks the rollup row, which also serializes concurrent writers
+for the same category and month.
+"""
+
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def month_of(occurred_at: datetime) -> date:
+    """First day of the UTC month containing ``occurred_at``."""
+    if occurred_at.tzinfo is None:
+        occurred_at = occurred_at.replace(tzinfo=timezone.utc)
+    return occurred_at.astimezone(timezone.utc).date().replace(day=1)
+
+
+@dataclass(frozen=True)
+class Contribution:
+    """What one transaction adds to the rollup."""
+
+    user_id: uuid.UUID
+    category_id: Optional[uuid.UUID]
+    month: date
+    type: str
+    amount_cents: int
+
+    @classmethod
+    def of(cls, transaction: models.Transaction) -> "Contribution":
+        """Capture a transaction's contribution (before it is modified)."""
+        return cls(
+            user_id=transaction.user_id,
+            category_id=transaction.category_id,
+            month=month_of(transaction.occurred_at),
+            type=transaction.type,
+            amount_cents=transaction.amount_cents,
+        )
+
+
+@dataclass(frozen=True)
+class MonthTotal:
+    """A rollup row after a change."""
+
+    user_id: uuid.UUID
+    category_id: Optional[uuid.UUID]
+    month: date
+    type: str
+    total_cents: int
+
+
+def _upsert(db: Session, key: Contribution, amount: int, count: int) -> MonthTotal:
+    table = models.CategoryMonthlyTotal.__table__
+    stmt = insert(table).values(
+        id=uuid.uuid4(),
+        user_id=key.user_id,
+        category_id=key.category_id,
+        month=key.month,
+        type=key.type,
+        total_cents=amount,
+        count=count,
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_category_monthly_totals_key",
+        set_={
+            "total_cents": table.c.total_cents + stmt.excluded.total_cents,
+            "count": table.c.count + stmt.excluded.count,
+        },
+    ).returning(table.c.total_cents)
+    total = db.execute(stmt).scalar_one()
+    return MonthTotal(key.user_id, key.category_id, key.month, key.type, total)
+
+
+def apply(db: Session, contribution: Contribution, sign: int = 1) -> MonthTotal:
+    """Add (sign=1) or remove (sign=-1) a contribution from the rollup.
+
+    Args:
+        db: Session whose transaction also holds the transaction write
+        contribution: Contribution of the transaction being written
+        sign: 1 for an insert, -1 for a delete
+
+    Returns:
+        The updated total for the contribution's rollup row
+    """
+    return _upsert(db, contribution, sign * contribution.amount_cents, sign)
+
+
+def replace(db: Session, old: Contribution, new: Contribution) -> list[MonthTotal]:
+    """Move a transaction's contribution after an update.
+
+    Returns:
+        Updated totals for the affected rows (one if the key did not change)
+    """
+    if (old.user_id, old.category_id, old.month, old.type) == (
+        new.user_id,
+        new.category_id,
+        new.month,
+        new.type,
+    ):
+        return [_upsert(db, new, new.amount_cents - old.amount_cents, 0)]
+    return [apply(db, old, sign=-1), apply(db, new)]
+
+
+def move(
+    db: Session, user_id: uuid.UUID, moved: list, category_id: Optional[uuid.UUID]
+) -> list[MonthTotal]:
+    """Move contributions to ``category_id`` after a bulk recategorization.
+
+    All affected rows are updated by one multi-row upsert.
+
+    Args:
+        db: Session whose transaction also holds the transaction writes
+        user_id: Owner of the transactions
+        moved: (old category_id, month, type, total_cents, count) per rollup
+            row the transactions left; old categories differ from
+            ``category_id``
+        category_id: New category (None for uncategorized)
+
+    Returns:
+        Updated totals for the affected rows
+    """
+    incoming = defaultdict(lambda: [0, 0])
+    rows = []
+    for old_category_id, month, type_, amount, count in moved:
+        rows.append((old_category_id, month, type_, -amount, -count))
+        incoming[month, type_][0] += amount
+        incoming[month, type_][1] += count
+    rows += [
+        (category_id, month, type_, amount, count)
+        for (month, type_), (amount, count) in incoming.items()
+    ]
+    if not rows:
+        return []
+
+    table = models.CategoryMonthlyTotal.__table__
+    stmt = insert(table).values(
+        [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "category_id": row[0],
+                "month": row[1],
+                "type": row[2],
+                "total_cents": row[3],
+                "count": row[4],
+            }
+            for row in rows
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_category_monthly_totals_key",
+        set_={
+            "total_cents": table.c.total_cents + stmt.excluded.total_cents,
+            "count": table.c.count + stmt.excluded.count,
+        },
+    ).returning(table.c.category_id, table.c.month, table.c.type, table.c.total_cents)
+    return [MonthTotal(user_id, *row) for row in db.execute(stmt)]
+
+
+def balance_cents(
+    db: Session, user_id: uuid.UUID, before: Optional[date] = None
+) -> int:
+    """Income minus expenses for a user, summed from the rollup.
+
+    Args:
+        db: Database session
+        user_id: Whose balance
+        before: Only count months before this one (first of a month);
+            all time if None
+    """
+    totals = models.CategoryMonthlyTotal
+    signed = case(
+        (totals.type == "income", totals.total_cents), else_=-totals.total_cents
+    )
+    query = db.query(func.coalesce(func.sum(signed), 0)).filter(
+        totals.user_id == user_id
+    )
+    if before is not None:
+        query = query.filter(totals.month < before)
+    return int(query.scalar())
@@ -0,0 +1,70 @@
+"""Periodic background tasks run inside the API process.
+
+Tasks run every ``interval`` seconds (the first run happens one interval
+after startup). Plain synchronous callables run on the threadpool so they
+never block the event loop; coroutine functions are awaited on the loop.
+A failing run is logged and counted in the metrics, and the task keeps its
+schedule.
+
+Every uvicorn worker runs its own scheduler, so tasks must be safe to run
+concurrently (the purge job is, thanks to ``SKIP LOCKED``).
+"""
+
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass
+from typing import Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicTask:
+    name: str
+    interval: float
+    fn: Callable[[], object]
+
+
+class Scheduler:
+    """Runs registered PeriodicTasks as asyncio tasks."""
+
+    def __init__(self):
+        self.tasks: list[PeriodicTask] = []
+        self._running: list[asyncio.Task] = []
+
+    def add(self, name: str, interval: float, fn: Callable[[], object]) -> None:
+        """Register ``fn`` to run every ``interval`` seconds once started."""
+        self.tasks.append(PeriodicTask(name, interval, fn))
+
+    def start(self) -> None:
+        """Start all registered tasks on the running event loop."""
+        for task in self.tasks:
+            self._running.append(asyncio.create_task(self._run(task)))
+
+    async def stop(self) -> None:
+        """Cancel running tasks and wait for them to finish."""
+        for running in self._running:
+            running.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        self._running.clear()
+
+    async def _run(self, task: PeriodicTask) -> None:
+        while True:
+            await asyncio.sleep(task.interval)
+            try:
+                with metrics.timer(f"scheduler.{task.name}"):
+                    if inspect.iscoroutinefunction(task.fn):
+                        await task.fn()
+                    else:
+                        await run_in_threadpool(task.fn)
+            except Exception:
+                metrics.incr(f"scheduler.{task.name}.errors")
+                logger.exception("Scheduled task %s failed", task.name)
+
+
+scheduler = Scheduler()
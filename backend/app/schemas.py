@@ -1,8 +1,8 @@
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime, timezone
+from typing import Any, Literal, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 
 
 # ================================
@@ -35,6 +35,12 @@ class TokenResponse(BaseModel):
     expires_in: int  # seconds
 
 
+class RefreshRequest(BaseModel):
+    """Schema for exchanging a refresh token for new tokens."""
+
+    refresh_token: str = Field(min_length=1, max_length=200)
+
+
 class PasswordResetRequest(BaseModel):
     """Schema for requesting a password reset."""
 
@@ -116,6 +122,13 @@ class CategoryOut(BaseModel):
         from_attributes = True
 
 
+class CategoryMergeOut(BaseModel):
+    """Result of merging a category into another."""
+
+    category: CategoryOut  # the category merged into
+    transactions: int  # transactions moved to it (archived ones included)
+
+
 # ================================
 # Transaction Schemas
 # ================================
@@ -168,12 +181,219 @@ class TransactionOut(BaseModel):
         default=None, description="Additional flexible data"
     )
     created_at: datetime
+    recurring_rule_id: Optional[UUID] = None
+    # True for future occurrences of a recurring rule (include_projected)
+    projected: bool = False
+    # True for rows read back from cold storage (app.archive); read-only
+    archived: bool = False
 
     model_config = {
         "from_attributes": True,
     }
 
 
+class RecategorizeFilter(BaseModel):
+    """Which transactions a bulk recategorization applies to.
+
+    The fields mean the same as the ``GET /api/transactions`` filters; at
+    least one must be set.
+    """
+
+    type: Optional[Literal["income", "expense"]] = None
+    category_id: Optional[UUID] = None
+    uncategorized: bool = Field(
+        False, description="Only transactions without a category"
+    )
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    min_amount: Optional[int] = None
+    max_amount: Optional[int] = None
+    q: Optional[str] = Field(None, min_length=1, max_length=200)
+    metadata: Optional[dict] = Field(None, description="Key/value pairs to match")
+    metadata_keys: Optional[list[str]] = None
+
+    @model_validator(mode="after")
+    def _not_everything(self):
+        if not self.model_dump(exclude_defaults=True):
+            raise ValueError("At least one filter is required")
+        if self.uncategorized and self.category_id:
+            raise ValueError("category_id and uncategorized are exclusive")
+        return self
+
+
+class RecategorizeRequest(BaseModel):
+    filter: RecategorizeFilter
+    category_id: Optional[UUID] = Field(
+        description="New category (must belong to user); null to uncategorize"
+    )
+
+
+class RecategorizeResult(BaseModel):
+    updated: int  # transactions whose category changed
+
+
+class BalancePoint(BaseModel):
+    """One bucket of the running balance series."""
+
+    period_start: date
+    income_cents: int
+    expense_cents: int
+    balance_cents: int  # balance at the end of the bucket
+
+
+class BalanceResponse(BaseModel):
+    granularity: str  # 'day', 'week' or 'month'
+    start_date: date
+    end_date: date
+    opening_balance_cents: int  # balance before start_date
+    points: list[BalancePoint]
+
+
+# ================================
+# Recurring Transaction Schemas
+# ================================
+
+
+class RecurringRuleCreate(BaseModel):
+    """A transaction template and the schedule it repeats on."""
+
+    rrule: str = Field(
+        max_length=200,
+        description="FREQ=DAILY|WEEKLY|MONTHLY|YEARLY with optional INTERVAL, "
+        "COUNT or UNTIL=YYYYMMDD, e.g. 'FREQ=MONTHLY;COUNT=12'",
+    )
+    starts_on: Optional[date] = Field(
+        None,
+        description="First occurrence (defaults to today); at most "
+        "recurring_max_backfill_days in the past",
+    )
+    active: bool = Field(True, description="Paused rules create no transactions")
+    category_id: Optional[UUID] = None
+    type: str = Field(pattern="^(income|expense)$")
+    amount_cents: int = Field(gt=0)
+    description: Optional[str] = Field(None, max_length=500)
+    metadata_: Optional[dict] = None
+
+
+class RecurringRuleOut(BaseModel):
+    id: UUID
+    user_id: UUID
+    rrule: str
+    starts_on: date
+    active: bool
+    category_id: Optional[UUID]
+    type: str
+    amount_cents: int
+    description: Optional[str]
+    metadata_: Optional[dict] = None
+    materialized_through: Optional[date]  # last occurrence created
+    next_occurrence_on: Optional[date]  # None once the schedule has ended
+    created_at: datetime
+
+
+# ================================
+# Forecast Schemas
+# ================================
+
+
+class EnvelopeForecast(BaseModel):
+    """Month-end projection for one expense category."""
+
+    category_id: UUID
+    category_name: str
+    monthly_limit_cents: Optional[int] = None
+    spent_cents: int  # month to date
+    projected_cents: int  # by the end of the month
+    daily_rate_cents: int  # projected spend per remaining day
+    overspend_on: Optional[date] = None  # day spending passes (or passed) the limit
+
+
+class ForecastResponse(BaseModel):
+    as_of: date  # last day of actual spending
+    method: str  # 'average', 'trend' or 'weekday'
+    month_start: date
+    month_end: date
+    envelopes: list[EnvelopeForecast]
+
+
+# ================================
+# Job Schemas
+# ================================
+
+
+class JobOut(BaseModel):
+    """A background job; poll until it is succeeded, failed or cancelled."""
+
+    id: UUID
+    kind: str
+    status: str  # 'queued', 'running', 'succeeded', 'failed' or 'cancelled'
+    progress: int = 0  # percent
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+# ================================
+# Report Schemas
+# ================================
+
+
+class ReportCreate(BaseModel):
+    year: int = Field(..., ge=2000, le=9999, description="Calendar year (UTC)")
+
+    @model_validator(mode="after")
+    def _year_not_in_future(self):
+        if self.year > datetime.now(timezone.utc).year:
+            raise ValueError("year must not be in the future")
+        return self
+
+
+class ReportOut(BaseModel):
+    """An annual report job; ``download_url`` is set once it has succeeded."""
+
+    id: UUID
+    year: int
+    status: str  # 'queued', 'running', 'succeeded', 'failed' or 'cancelled'
+    progress: int  # percent
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    download_url: Optional[str] = None
+    transactions: Optional[int] = None
+    income_cents: Optional[int] = None
+    expense_cents: Optional[int] = None
+
+
+# ================================
+# Admin Analytics Schemas
+# ================================
+
+
+class ActiveUsersParams(BaseModel):
+    months: int = Field(12, ge=1, le=60, description="Months back, this one included")
+
+
+class CategoryTotalsParams(BaseModel):
+    start_month: Optional[date] = Field(
+        None, description="First month (defaults to 11 months before end_month)"
+    )
+    end_month: Optional[date] = Field(None, description="Last month (default: this)")
+    type: Literal["income", "expense"] = "expense"
+
+
+class SpendDistributionParams(BaseModel):
+    month: Optional[date] = Field(
+        None, description="Month to measure (defaults to the last complete one)"
+    )
+    cohort: Literal["signup_month", "signup_year"] = "signup_month"
+
+
 # ================================
 # Notification Schemas
 # ================================
@@ -196,3 +416,112 @@ class NotificationPreferenceOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# ================================
+# Sync Schemas
+# ================================
+
+SYNC_MAX_CHANGES = 500
+
+
+class SyncTombstoneOut(BaseModel):
+    """A transaction or category deleted since the cursor."""
+
+    entity: str  # 'transaction' or 'category'
+    id: UUID = Field(validation_alias="entity_id")
+
+    model_config = {"from_attributes": True}
+
+
+class SyncResponse(BaseModel):
+    """Changes since the client's cursor.
+
+    When ``reset`` is true the lists hold the user's full data set and the
+    client should replace its local copy instead of merging.
+    """
+
+    cursor: str
+    reset: bool
+    transactions: list[TransactionOut]
+    categories: list[CategoryOut]
+    deleted: list[SyncTombstoneOut]
+
+
+class SyncChange(BaseModel):
+    """A record created, edited or deleted on the client."""
+
+    id: UUID = Field(description="Client-generated UUID for new records")
+    deleted: bool = False
+
+    @model_validator(mode="after")
+    def _data_unless_deleted(self):
+        if not self.deleted and self.data is None:
+            raise ValueError("data is required unless deleted is true")
+        return self
+
+
+class SyncCategoryChange(SyncChange):
+    data: Optional[CategoryCreate] = None
+
+
+class SyncTransactionChange(SyncChange):
+    data: Optional[TransactionCreate] = None
+
+
+class SyncPush(BaseModel):
+    """Batched client-side changes, applied last-writer-wins."""
+
+    categories: list[SyncCategoryChange] = Field(
+        default_factory=list, max_length=SYNC_MAX_CHANGES
+    )
+    transactions: list[SyncTransactionChange] = Field(
+        default_factory=list, max_length=SYNC_MAX_CHANGES
+    )
+
+
+class SyncChangeResult(BaseModel):
+    """Outcome of one pushed change."""
+
+    entity: str
+    id: UUID
+    status: str  # 'applied' or 'rejected'
+    detail: Optional[str] = None
+
+
+class SyncPushResponse(BaseModel):
+    results: list[SyncChangeResult]
+
+
+# ================================
+# Batch Schemas
+# ================================
+
+
+class BatchRequestItem(BaseModel):
+    """One API call to run inside ``POST /api/batch``."""
+
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str = Field(
+        pattern=r"^/api/", description="Path with query string, e.g. /api/categories"
+    )
+    body: Any = None  # JSON request body, if any
+    headers: dict[str, str] = Field(
+        default_factory=dict, description="Extra headers such as Idempotency-Key"
+    )
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchRequestItem] = Field(min_length=1)
+
+
+class BatchResponseItem(BaseModel):
+    """Result of one sub-request, as the endpoint would have returned it."""
+
+    status: int
+    headers: dict[str, str]
+    body: Any = None  # parsed JSON, text, or None for an empty body
+
+
+class BatchResponse(BaseModel):
+    responses: list[BatchResponseItem]
@@ -1,12 +1,38 @@
+import asyncio
+import base64
 import hashlib
+import hmac
 import secrets
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from typing import Optional
 
 from jose import jwt
 from passlib.hash import bcrypt
 
 from .config import settings
+from .metrics import metrics
+
+# bcrypt handler pinned to the configured cost factor
+password_hasher = bcrypt.using(rounds=settings.bcrypt_rounds)
+
+# Dedicated pool so a burst of logins cannot starve Starlette's threadpool
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt"
+)
+_hash_pending = 0  # submitted but not finished; only touched on the event loop
+
+metrics.register_gauge("password_hash.pending", lambda: _hash_pending)
+metrics.register_gauge(
+    "password_hash.queued",
+    lambda: max(_hash_pending - settings.password_hash_workers, 0),
+)
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing queue is full."""
 
 
 def hash_password(plain: str) -> str:
@@ -18,7 +44,7 @@ def hash_password(plain: str) -> str:
     Returns:
         The bcrypt hashed password
     """
-    return bcrypt.hash(plain)
+    return password_hasher.hash(plain)
 
 
 def verify_password(plain: str, hashed: str) -> bool:
@@ -34,6 +60,62 @@ def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.verify(plain, hashed)
 
 
+def password_needs_rehash(hashed: str) -> bool:
+    """Check whether a stored hash uses a different cost than configured.
+
+    Args:
+        hashed: The bcrypt hashed password
+
+    Returns:
+        True if the hash should be recomputed with the current settings
+    """
+    return password_hasher.needs_update(hashed)
+
+
+async def _run_on_hash_pool(fn, *args):
+    """Run a bcrypt call on the dedicated pool, enforcing the queue bound."""
+    global _hash_pending
+    if _hash_pending >= settings.password_hash_max_pending:
+        metrics.incr("password_hash.rejected")
+        raise PasswordHashingBusy()
+
+    submitted = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        metrics.observe("password_hash.wait", started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            metrics.observe("password_hash.duration", time.perf_counter() - started)
+
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, timed)
+    finally:
+        _hash_pending -= 1
+        metrics.incr("password_hash.completed")
+
+
+async def hash_password_async(plain: str) -> str:
+    """Hash a password on the bounded bcrypt pool.
+
+    Raises:
+        PasswordHashingBusy: If too many hashes are already pending
+    """
+    return await _run_on_hash_pool(hash_password, plain)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    """Verify a password on the bounded bcrypt pool.
+
+    Raises:
+        PasswordHashingBusy: If too many hashes are already pending
+    """
+    return await _run_on_hash_pool(verify_password, plain, hashed)
+
+
 def create_access_token(sub: str) -> tuple[str, int]:
     """Create a JWT access token.
 
@@ -53,27 +135,75 @@ def create_access_token(sub: str) -> tuple[str, int]:
     return token, int(settings.access_token_expire.total_seconds())
 
 
-def new_refresh_token() -> tuple[str, str, datetime]:
+def new_refresh_token() -> tuple[str, str, str, datetime]:
     """Generate a new refresh token.
 
+    The raw token is ``"<selector>.<verifier>"``. The selector is stored in
+    plain text and indexed for lookup; the verifier is stored only as a keyed
+    HMAC, which (unlike bcrypt) is fast and deterministic to check.
+
     Returns:
-        Tuple of (raw_token, hashed_token, expiration_datetime)
-        Store only the hashed token in the database.
+        Tuple of (raw_token, selector, verifier_hash, expiration_datetime)
+        Store only the selector and verifier hash in the database.
     """
-    raw = secrets.token_urlsafe(48)
-    hashed = bcrypt.hash(raw)
+    selector = secrets.token_urlsafe(12)
+    verifier = secrets.token_urlsafe(32)
     exp = datetime.now(timezone.utc) + settings.refresh_token_expire
-    return raw, hashed, exp
+    return f"{selector}.{verifier}", selector, hash_refresh_verifier(verifier), exp
+
+
+def hash_refresh_verifier(verifier: str) -> str:
+    """Compute the keyed HMAC-SHA256 of a refresh token verifier.
+
+    Args:
+        verifier: The secret half of a refresh token
+
+    Returns:
+        Hex digest to store in (or compare with) ``sessions.refresh_token_hash``
+    """
+    return hmac.new(
+        settings.refresh_token_secret.encode(), verifier.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def split_refresh_token(raw: str) -> Optional[tuple[str, str]]:
+    """Split a raw refresh token into (selector, verifier).
+
+    Returns:
+        None if the token is not in ``"<selector>.<verifier>"`` form
+    """
+    selector, sep, verifier = raw.partition(".")
+    if not sep or not selector or not verifier:
+        return None
+    return selector, verifier
+
+
+def verify_refresh_verifier(verifier: str, stored_hash: str) -> bool:
+    """Check a refresh token verifier against its stored HMAC in constant time."""
+    return hmac.compare_digest(hash_refresh_verifier(verifier), stored_hash)
+
+
+def reset_token_for(token_id: uuid.UUID) -> str:
+    """Compute the raw password reset token of a ``password_reset_tokens`` row.
+
+    The token is a keyed HMAC of the row's random id, so the email can be
+    built at send time from the id alone and the token is never stored.
+    """
+    digest = hmac.new(
+        settings.reset_token_secret.encode(), token_id.bytes, hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
 
 
-def new_reset_token() -> tuple[str, str, datetime]:
+def new_reset_token() -> tuple[uuid.UUID, str, datetime]:
     """Generate a new password reset token.
 
     Returns:
-        Tuple of (raw_token, hashed_token, expiration_datetime)
-        Send the raw token to the user, store only the hashed token in the database.
+        Tuple of (token_id, hashed_token, expiration_datetime)
+        Store the id and hashed token; ``reset_token_for(token_id)`` gives
+        the raw token to send to the user.
     """
-    raw = secrets.token_urlsafe(32)
-    hashed = hashlib.sha256(raw.encode()).hexdigest()
+    token_id = uuid.uuid4()
+    hashed = hashlib.sha256(reset_token_for(token_id).encode()).hexdigest()
     exp = datetime.now(timezone.utc) + settings.reset_token_expire
-    return raw, hashed, exp
+    return token_id, hashed, exp
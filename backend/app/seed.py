@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta, timezone
 from uuid import UUID
 
-from . import models
+from . import models, rollups
 from .db import Base, SessionLocal, engine
 from .security import hash_password
 
@@ -55,6 +55,7 @@ def seed(db):
         session = models.Session(
             id=session_id,
             user_id=courage_id,
+            refresh_token_selector="seed-example",
             refresh_token_hash="refhash_abc123",
             expires_at=datetime.now(timezone.utc) + timedelta(days=30),
         )
@@ -127,6 +128,8 @@ def seed(db):
                 description=desc,
             )
             db.add(transaction)
+            db.flush()
+            rollups.apply(db, rollups.Contribution.of(transaction))
             print(f"✓ Created transaction: {desc}")
 
     # ================================
@@ -0,0 +1,135 @@
+"""Delta sync for offline-first clients.
+
+Every write to ``transactions`` and ``categories`` stamps the row's
+``change_xid`` with the ID of the database transaction that made it, and
+every delete leaves a row in ``sync_tombstones`` (both by trigger, see
+``models.SYNC_TRIGGERS``). A sync cursor is the *snapshot xmin* at the
+time of the previous sync: the oldest transaction ID that was still
+running then. Everything that changed in a transaction older than that was
+committed and already returned; anything at or after it may not have been
+visible yet, so the next sync returns rows with ``change_xid >= cursor``.
+
+Using the snapshot xmin rather than the largest stamp seen means a slow
+transaction that commits after a client synced is never skipped. The price
+is that changes made while another transaction was open can be sent twice,
+which clients handle by upserting.
+
+The cursor also carries the time it was issued. Tombstones are purged
+after ``settings.sync_tombstone_days``, so an older cursor gets a full
+resync (``reset``) instead of a delta that might miss deletions. Rows that
+leave the table without a DELETE (partitions archived by
+``app.partitions``) produce no tombstones.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import exists, text
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+ENTITY_MODELS = {"transaction": models.Transaction, "category": models.Category}
+
+
+def encode_cursor(xmin: int, issued_at: datetime) -> str:
+    """Opaque cursor string handed to clients."""
+    return f"{xmin}.{int(issued_at.timestamp())}"
+
+
+def decode_cursor(cursor: str) -> tuple[int, datetime]:
+    """Parse a cursor from ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    xmin, issued = cursor.split(".")
+    return int(xmin), datetime.fromtimestamp(int(issued), tz=timezone.utc)
+
+
+def snapshot_xmin(db: Session) -> int:
+    """Oldest transaction ID still running, as seen by a new snapshot."""
+    return db.execute(
+        text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+    ).scalar_one()
+
+
+@dataclass
+class Changes:
+    """What a client needs to apply to catch up."""
+
+    cursor: str
+    reset: bool
+    transactions: list[models.Transaction]
+    categories: list[models.Category]
+    deleted: list[models.SyncTombstone]
+
+
+def changes_since(
+    db: Session,
+    user_id: UUID,
+    cursor: Optional[str],
+    now: Optional[datetime] = None,
+) -> Changes:
+    """Collect the user's changes since ``cursor`` (everything if None).
+
+    Args:
+        db: Database session (primary, so the cursor matches what was read)
+        user_id: Whose data to sync
+        cursor: Cursor from the previous sync, or None for a full sync
+        now: Current time (for tests)
+
+    Returns:
+        Changed rows, tombstones and the cursor for the next sync
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    now = now or datetime.now(timezone.utc)
+    since = None
+    if cursor is not None:
+        since, issued_at = decode_cursor(cursor)
+        if issued_at < now - timedelta(days=settings.sync_tombstone_days):
+            since = None  # tombstones may have been purged since
+
+    # Taken before reading, so nothing committed after this point is missed
+    next_cursor = encode_cursor(snapshot_xmin(db), now)
+
+    transactions = db.query(models.Transaction).filter(
+        models.Transaction.user_id == user_id
+    )
+    categories = db.query(models.Category).filter(models.Category.user_id == user_id)
+    deleted = []
+    if since is not None:
+        transactions = transactions.filter(models.Transaction.change_xid >= since)
+        categories = categories.filter(models.Category.change_xid >= since)
+        tombstones = models.SyncTombstone
+        candidates = (
+            db.query(tombstones)
+            .filter(tombstones.user_id == user_id, tombstones.change_xid >= since)
+            .order_by(tombstones.change_xid)
+            .all()
+        )
+        # Drop tombstones for IDs that exist again (re-created offline)
+        seen = set()
+        for tombstone in candidates:
+            model = ENTITY_MODELS[tombstone.entity]
+            key = (tombstone.entity, tombstone.entity_id)
+            if (
+                key in seen
+                or db.query(exists().where(model.id == tombstone.entity_id)).scalar()
+            ):
+                continue
+            seen.add(key)
+            deleted.append(tombstone)
+
+    return Changes(
+        cursor=next_cursor,
+        reset=since is None,
+        transactions=transactions.order_by(models.Transaction.occurred_at).all(),
+        categories=categories.order_by(models.Category.name).all(),
+        deleted=deleted,
+    )
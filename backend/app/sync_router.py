@@ -0,0 +1,176 @@
+"""Delta sync endpoints for offline-first clients (see ``app.sync``)."""
+
+from typing import Annotated, Callable, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .categories_router import (
+    create_category_record,
+    delete_category_record,
+    update_category_record,
+)
+from .db import get_db
+from .deps import get_current_user
+from .events import category_event
+from .idempotency import Idempotency, claim_idempotency_key
+from .sync import changes_since
+from .transactions_router import (
+    create_transaction_record,
+    delete_transaction_record,
+    publish_events,
+    update_transaction_record,
+)
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+@router.get("", response_model=schemas.SyncResponse)
+def pull_changes(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    since: Annotated[
+        Optional[str], Query(description="Cursor from the last sync")
+    ] = None,
+):
+    """Return transactions and categories changed since the cursor.
+
+    Without ``since`` (first sync), or with a cursor older than the
+    tombstone retention period, the full data set is returned with
+    ``reset`` set. Keep the returned ``cursor`` for the next call.
+
+    Args:
+        db: Database session (always the primary, so cursors are consistent)
+        current_user: The authenticated user
+        since: Cursor returned by the previous sync
+
+    Returns:
+        Changed rows, deleted IDs and the next cursor
+
+    Raises:
+        HTTPException: If the cursor is malformed (400 Bad Request)
+    """
+    try:
+        changes = changes_since(db, current_user.id, since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync cursor"
+        )
+    return schemas.SyncResponse.model_validate(changes, from_attributes=True)
+
+
+def _owned(db: Session, model, user: models.User, record_id: UUID):
+    """The user's record with this ID, or None.
+
+    Raises:
+        HTTPException: If the ID belongs to another user's record (409)
+    """
+    record = db.query(model).filter(model.id == record_id).first()
+    if record is not None and record.user_id != user.id:
+        raise HTTPException(status_code=409, detail="ID is already in use")
+    return record
+
+
+def _apply(
+    db: Session, entity: str, change: schemas.SyncChange, fn: Callable[[], list]
+) -> tuple[schemas.SyncChangeResult, list]:
+    """Run one change in a savepoint so a rejected change leaves the rest."""
+    try:
+        with db.begin_nested():
+            events = fn()
+    except HTTPException as exc:
+        return (
+            schemas.SyncChangeResult(
+                entity=entity, id=change.id, status="rejected", detail=str(exc.detail)
+            ),
+            [],
+        )
+    except IntegrityError:
+        return (
+            schemas.SyncChangeResult(
+                entity=entity, id=change.id, status="rejected", detail="Conflict"
+            ),
+            [],
+        )
+    return schemas.SyncChangeResult(entity=entity, id=change.id, status="applied"), (
+        events
+    )
+
+
+@router.post("", response_model=schemas.SyncPushResponse)
+def push_changes(
+    body: schemas.SyncPush,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    idempotency: Annotated[Idempotency, Depends(claim_idempotency_key)],
+):
+    """Apply a batch of changes made on the client while offline.
+
+    Changes are applied last-writer-wins with the same validation as the
+    regular endpoints. New records use the client's UUIDs, and deleting a
+    record that is already gone succeeds. Each change is applied on its own,
+    so a rejected change is reported in ``results`` without undoing the
+    others. Category upserts go first and category deletions last, so a
+    batch may create a category, move transactions into it and delete the
+    old one.
+
+    Pull afterwards (``GET /api/sync``) to receive the merged state. Send
+    an ``Idempotency-Key`` header so a retried push is not applied twice.
+
+    Args:
+        body: Category and transaction changes (at most 500 of each)
+        db: Database session
+        current_user: The authenticated user
+        idempotency: Claimed ``Idempotency-Key``, if any
+
+    Returns:
+        One result per change, in the order they were applied
+    """
+    user = current_user
+    results, events = [], []
+
+    def upsert_category(change):
+        category = _owned(db, models.Category, user, change.id)
+        if category is None:
+            category = create_category_record(db, user, change.data, change.id)
+            return [category_event("created", category)]
+        update_category_record(db, user, category, change.data)
+        return [category_event("updated", category)]
+
+    def delete_category(change):
+        category = _owned(db, models.Category, user, change.id)
+        if category is None:
+            return []
+        event = category_event("deleted", category)
+        delete_category_record(db, category)
+        return [event]
+
+    def apply_transaction(change):
+        transaction = _owned(db, models.Transaction, user, change.id)
+        if change.deleted:
+            if transaction is None:
+                return []
+            return delete_transaction_record(db, transaction)
+        if transaction is None:
+            _, created = create_transaction_record(db, user, change.data, change.id)
+            return created
+        return update_transaction_record(db, user, transaction, change.data)
+
+    steps = (
+        [("category", c, upsert_category) for c in body.categories if not c.deleted]
+        + [("transaction", t, apply_transaction) for t in body.transactions]
+        + [("category", c, delete_category) for c in body.categories if c.deleted]
+    )
+    for entity, change, fn in steps:
+        result, applied = _apply(db, entity, change, lambda: fn(change))
+        results.append(result)
+        events.extend(applied)
+
+    response = schemas.SyncPushResponse(results=results)
+    idempotency.save(200, response)
+    db.commit()
+    publish_events(user.id, events)
+    return response
@@ -1,28 +1,84 @@
 """Transaction CRUD endpoints for income and expense management."""
 
-from datetime import datetime, timedelta, timezone
+import json
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
 from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func, literal, or_, orm, text
+from sqlalchemy.dialects.postgresql import array
 from sqlalchemy.orm import Session
 
-from . import models, schemas
+from . import alerts, archive, models, recategorize, recurrence, rollups, schemas
 from .db import get_db
 from .deps import get_current_user
+from .events import RESYNC, broker, envelope_events, transaction_event
+from .idempotency import Idempotency, claim_idempotency_key
+from .replicas import get_read_db
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
 
+LIST_SORT_COLUMNS = ("occurred_at", "amount_cents", "category_id")
+NIL_UUID = UUID(int=0)
 
-@router.post("", response_model=schemas.TransactionOut, status_code=201)
-def create_transaction(
-    body: schemas.TransactionCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
-    """Create a new transaction (income or expense)."""
+# Running balance: bucket step and default window (in steps) per granularity
+BALANCE_STEPS = {"day": "1 day", "week": "1 week", "month": "1 month"}
+BALANCE_DEFAULT_POINTS = {"day": 90, "week": 52, "month": 24}
+BALANCE_MAX_POINTS = 1000
+
+# Gap-filled buckets joined to per-bucket flows; the window sum turns net
+# flows into a running balance starting from :opening
+BALANCE_SERIES = text(
+    """
+    WITH buckets AS (
+        SELECT generate_series(
+            CAST(:first AS timestamp), CAST(:last AS timestamp),
+            CAST(:step AS interval)
+        ) AS bucket
+    ),
+    flows AS (
+        SELECT date_trunc(:unit, occurred_at AT TIME ZONE 'UTC') AS bucket,
+               sum(amount_cents) FILTER (WHERE type = 'income') AS income,
+               sum(amount_cents) FILTER (WHERE type = 'expense') AS expense
+        FROM transactions
+        WHERE user_id = :user_id AND occurred_at >= :start AND occurred_at < :end
+        GROUP BY 1
+    )
+    SELECT CAST(b.bucket AS date) AS period_start,
+           coalesce(f.income, 0) AS income_cents,
+           coalesce(f.expense, 0) AS expense_cents,
+           CAST(:opening + sum(coalesce(f.income, 0) - coalesce(f.expense, 0))
+                OVER (ORDER BY b.bucket) AS bigint) AS balance_cents
+    FROM buckets b
+    LEFT JOIN flows f ON f.bucket = b.bucket
+    ORDER BY b.bucket
+    """
+)
+# Net flow between the start of the first bucket's month and the bucket
+MONTH_TO_DATE_NET = text(
+    """
+    SELECT coalesce(sum(CASE WHEN type = 'income' THEN amount_cents
+                             ELSE -amount_cents END), 0)
+    FROM transactions
+    WHERE user_id = :user_id AND occurred_at >= :month_start AND occurred_at < :start
+    """
+)
+
+
+def validate_transaction_body(
+    db: Session, user: models.User, body: schemas.TransactionCreate
+) -> datetime:
+    """Check a create/update body against the business rules.
 
+    Returns:
+        The effective ``occurred_at`` (now if the body has none)
+
+    Raises:
+        HTTPException: If the date is in the future (400) or the category
+            does not belong to the user (404)
+    """
     # Validate: no future dates
     occurred_at = body.occurred_at or datetime.now(timezone.utc)
     if occurred_at > datetime.now(timezone.utc):
@@ -36,7 +92,7 @@ def create_transaction(
             db.query(models.Category)
             .filter(
                 models.Category.id == body.category_id,
-                models.Category.user_id == current_user.id,
+                models.Category.user_id == user.id,
             )
             .first()
         )
@@ -44,10 +100,44 @@ def create_transaction(
             raise HTTPException(
                 status_code=404, detail="Category not found or does not belong to user"
             )
+    return occurred_at
+
+
+def find_transaction(
+    db: Session, user: models.User, transaction_id: UUID
+) -> Optional[models.Transaction]:
+    """Look up a transaction the user may modify (admins may modify any)."""
+    query = db.query(models.Transaction).filter(models.Transaction.id == transaction_id)
+    if user.role != "admin":
+        query = query.filter(models.Transaction.user_id == user.id)
+    return query.first()
+
 
-    # Create transaction
+def create_transaction_record(
+    db: Session,
+    user: models.User,
+    body: schemas.TransactionCreate,
+    transaction_id: Optional[UUID] = None,
+    recurring_rule_id: Optional[UUID] = None,
+) -> tuple[models.Transaction, list[dict]]:
+    """Insert a transaction along with its rollup contribution and alerts.
+
+    Every write path goes through these ``*_record`` helpers so the rollup,
+    alerts and live updates stay consistent. They do not commit.
+
+    Args:
+        db: Database session (the caller commits)
+        user: Owner of the new transaction
+        body: Validated request body
+        transaction_id: Client-chosen ID (offline sync); generated if None
+        recurring_rule_id: Rule this transaction is an occurrence of
+
+    Returns:
+        The new transaction and the events to publish after the commit
+    """
+    occurred_at = validate_transaction_body(db, user, body)
     transaction = models.Transaction(
-        user_id=current_user.id,
+        user_id=user.id,
         category_id=body.category_id,
         type=body.type,
         amount_cents=body.amount_cents,
@@ -55,14 +145,147 @@ def create_transaction(
         description=body.description,
         receipt_url=body.receipt_url,
         metadata_=body.metadata_,
+        recurring_rule_id=recurring_rule_id,
     )
+    if transaction_id is not None:
+        transaction.id = transaction_id
 
     db.add(transaction)
-    db.commit()
+    db.flush()
+    changed = rollups.apply(db, rollups.Contribution.of(transaction))
+    alerts.evaluate(db, user.id, [changed])
+    events = [transaction_event("created", transaction)]
+    return transaction, events + envelope_events(db, [changed])
+
+
+def update_transaction_record(
+    db: Session,
+    user: models.User,
+    transaction: models.Transaction,
+    body: schemas.TransactionCreate,
+) -> list[dict]:
+    """Replace a transaction's fields and move its rollup contribution.
+
+    Returns:
+        Events to publish after the commit
+    """
+    occurred_at = validate_transaction_body(db, user, body)
+
+    old = rollups.Contribution.of(transaction)
+    transaction.category_id = body.category_id
+    transaction.type = body.type
+    transaction.amount_cents = body.amount_cents
+    transaction.occurred_at = occurred_at
+    transaction.description = body.description
+    transaction.receipt_url = body.receipt_url
+    transaction.metadata_ = body.metadata_
+
+    db.flush()
+    changed = rollups.replace(db, old, rollups.Contribution.of(transaction))
+    alerts.evaluate(db, transaction.user_id, changed)
+    events = [transaction_event("updated", transaction)]
+    return events + envelope_events(db, changed)
+
+
+def delete_transaction_record(
+    db: Session, transaction: models.Transaction
+) -> list[dict]:
+    """Delete a transaction and remove its rollup contribution.
+
+    Returns:
+        Events to publish after the commit
+    """
+    changed = rollups.apply(db, rollups.Contribution.of(transaction), sign=-1)
+    events = [transaction_event("deleted", transaction)]
+    db.delete(transaction)
+    db.flush()
+    alerts.evaluate(db, transaction.user_id, [changed])
+    return events + envelope_events(db, [changed])
+
+
+def publish_events(user_id: UUID, events: list[dict]) -> None:
+    """Push committed changes to the user's live update streams."""
+    for event in events:
+        broker.publish(user_id, event)
+
+
+def get_caught_up_read_db(
+    request: Request, current_user: models.User = Depends(get_current_user)
+):
+    """``get_read_db`` once the user's due recurring transactions exist.
+
+    Catching up before the session is opened lets a read that just created
+    transactions go to the primary instead of a replica that may not have
+    them yet (see ``recurrence.catch_up``).
+    """
+    recurrence.catch_up(current_user.id)
+    yield from get_read_db(request)
+
+
+@router.post("", response_model=schemas.TransactionOut, status_code=201)
+def create_transaction(
+    body: schemas.TransactionCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(claim_idempotency_key),
+):
+    """Create a new transaction (income or expense).
+
+    Send an ``Idempotency-Key`` header to make retries safe: a retry with
+    the same key returns the original response instead of a duplicate.
+    """
+    transaction, events = create_transaction_record(db, current_user, body)
     db.refresh(transaction)
 
     # Return as dict to avoid SQLAlchemy metadata conflict
-    return schemas.TransactionOut.model_validate(transaction, from_attributes=True)
+    response = schemas.TransactionOut.model_validate(transaction, from_attributes=True)
+    idempotency.save(201, response)
+    db.commit()
+    publish_events(current_user.id, events)
+    return response
+
+
+@router.post("/recategorize", response_model=schemas.RecategorizeResult)
+def recategorize_transactions(
+    body: schemas.RecategorizeRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(claim_idempotency_key),
+):
+    """Move every transaction matching a filter to another category.
+
+    The filter takes the list's filters (see ``RecategorizeFilter``); the
+    matching transactions are updated with one statement, however many
+    there are. Archived transactions are read-only and keep their category.
+    Honors ``Idempotency-Key``; open event streams get a ``resync``.
+
+    Raises:
+        HTTPException: If the new category does not belong to the user (404)
+    """
+    if body.category_id is not None:
+        category = (
+            db.query(models.Category.id)
+            .filter(
+                models.Category.id == body.category_id,
+                models.Category.user_id == current_user.id,
+            )
+            .first()
+        )
+        if category is None:
+            raise HTTPException(
+                status_code=404, detail="Category not found or does not belong to user"
+            )
+
+    updated, changed = recategorize.recategorize(
+        db, current_user, body.filter, body.category_id
+    )
+    alerts.evaluate(db, current_user.id, changed)
+    events = [RESYNC] + envelope_events(db, changed) if updated else []
+    response = schemas.RecategorizeResult(updated=updated)
+    idempotency.save(200, response)
+    db.commit()
+    publish_events(current_user.id, events)
+    return response
 
 
 @router.get("", response_model=list[schemas.TransactionOut])
@@ -73,25 +296,320 @@ def list_transactions(
     end_date: Optional[datetime] = None,
     min_amount: Optional[int] = None,
     max_amount: Optional[int] = None,
-    sort_by: str = Query(
-        "occurred_at", pattern="^(occurred_at|amount_cents|category_id)$"
+    q: Optional[str] = Query(None, min_length=1, max_length=100),
+    metadata: Optional[str] = Query(
+        None, description='JSON object the metadata must contain, e.g. {"tag": "x"}'
     ),
+    metadata_keys: Optional[List[str]] = Query(None, alias="metadata_keys[]"),
+    sort_by: str = Query("occurred_at", pattern=f"^({'|'.join(LIST_SORT_COLUMNS)})$"),
     sort_order: str = Query("desc", pattern="^(asc|desc)$"),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    include_projected: bool = False,
+    db: Session = Depends(get_caught_up_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """
     List transactions with filtering, sorting, and pagination.
 
-    Users see only their own transactions. Admins see all transactions.
+    Users see only their own transactions. Admins see all transactions still
+    in the database; archived ones are only listed for their owner.
+
+    - **q**: Search descriptions. Matches whole words (full-text), partial
+      words and near-misses (trigram); results are ranked by relevance first.
+    - **metadata**: JSON object that the transaction metadata must contain
+    - **metadata_keys[]**: Metadata keys that must be present (can pass multiple)
+    - **include_projected**: Also list the user's upcoming recurring
+      transactions (``projected: true``, up to RECURRING_PROJECTION_DAYS
+      ahead). Requires sort_by=occurred_at and no q.
+
+    Transactions moved to cold storage (``archived: true``, see
+    ``app.archive``) are listed with the rest when the date range reaches
+    back to them. There, **q** matches descriptions containing every word
+    of it, and archived matches follow the ranked ones.
+    """
+    if include_projected and (q or sort_by != "occurred_at"):
+        raise HTTPException(
+            status_code=400,
+            detail="include_projected requires sort_by=occurred_at and no q",
+        )
+
+    query = build_list_query(
+        db,
+        current_user,
+        type=type,
+        category_id=category_id,
+        start_date=start_date,
+        end_date=end_date,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        q=q,
+        metadata=metadata,
+        metadata_keys=metadata_keys,
+        sort_by=sort_by,
+        sort_order=sort_order,
+    )
+
+    # Apply pagination
+    offset = (page - 1) * limit
+    newest_archived = None
+    if current_user.role != "admin":
+        newest_archived = archive.reaches(current_user.id, start_date)
+    if newest_archived is None and not include_projected:
+        transactions = query.offset(offset).limit(limit).all()
+
+        # Return as validated models to avoid SQLAlchemy metadata conflict
+        return [
+            schemas.TransactionOut.model_validate(t, from_attributes=True)
+            for t in transactions
+        ]
+
+    descending = sort_order == "desc"
+
+    def archived():
+        return archived_transactions(
+            db,
+            current_user,
+            start_date=start_date,
+            end_date=end_date,
+            type=type,
+            category_ids=[category_id] if category_id else None,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            metadata=metadata,
+            metadata_keys=metadata_keys,
+            q=q,
+        ).order_by(sort_by, descending)
+
+    if newest_archived is not None and q:
+        return page_of_segments([query, archived], offset, limit)
+    if newest_archived is not None and sort_by != "occurred_at":
+        return page_with_archived(query, archived(), sort_by, descending, offset, limit)
+
+    # In date order, archived transactions come before stored ones and
+    # projected ones after; each is only fetched if the page reaches it
+    stored, older, future = query, None, None
+    if newest_archived is not None:
+        stored = query.filter(models.Transaction.occurred_at > newest_archived)
+        stragglers = query.filter(models.Transaction.occurred_at <= newest_archived)
+
+        def older():
+            return with_stragglers(archived(), stragglers, descending)
+
+    if include_projected:
+        projected = projected_transactions(
+            db,
+            current_user,
+            start_date=start_date,
+            end_date=end_date,
+            type=type,
+            category_ids=[category_id] if category_id else None,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            metadata=metadata,
+            metadata_keys=metadata_keys,
+        )
+        future = [o.as_transaction() for o in projected]
+        if descending:
+            future.reverse()
+    segments = [future, stored, older] if descending else [older, stored, future]
+    return page_of_segments([s for s in segments if s is not None], offset, limit)
+
+
+def projected_transactions(
+    db: Session,
+    user: models.User,
+    *,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    type: Optional[str] = None,
+    category_ids: Optional[List[UUID]] = None,
+    min_amount: Optional[int] = None,
+    max_amount: Optional[int] = None,
+    metadata: Optional[str] = None,
+    metadata_keys: Optional[List[str]] = None,
+) -> list[recurrence.ProjectedOccurrence]:
+    """The user's projected recurring occurrences that pass the filters.
+
+    Applies the same filters as ``build_list_query`` and
+    ``build_aggregate_query``, in Python, to the bounded list from
+    ``recurrence.projected``.
+    """
+    wanted = _metadata_filter(metadata)
+    matching = []
+    for occurrence in recurrence.projected(db, user.id, start_date, end_date):
+        rule = occurrence.rule
+        tags = rule.metadata_ or {}
+        if (
+            (type and rule.type != type)
+            or (category_ids and rule.category_id not in category_ids)
+            or (min_amount is not None and rule.amount_cents < min_amount)
+            or (max_amount is not None and rule.amount_cents > max_amount)
+            or (wanted is not None and not _json_contains(tags, wanted))
+            or (metadata_keys and not all(key in tags for key in metadata_keys))
+        ):
+            continue
+        matching.append(occurrence)
+    return matching
+
+
+def page_of_segments(segments: list, offset: int, limit: int) -> list:
+    """One page across segments that follow one another in the sort order.
+
+    A segment is a query, a sequence of ``TransactionOut`` or a function
+    returning one. Only the segments the page reaches are queried or
+    called, and only their share of the page is fetched: a query's row
+    count is needed only when the page starts beyond its end.
+    """
+    page = []
+    for segment in segments:
+        wanted = limit - len(page)
+        if wanted <= 0:
+            break
+        if isinstance(segment, orm.Query):
+            rows = segment.offset(offset).limit(wanted).all()
+            page += [
+                schemas.TransactionOut.model_validate(t, from_attributes=True)
+                for t in rows
+            ]
+            if len(rows) < wanted:
+                size = offset + len(rows) if rows else segment.order_by(None).count()
+                offset = max(0, offset - size)
+            continue
+        rows = segment() if callable(segment) else segment
+        page += rows[offset : offset + wanted]
+        offset = max(0, offset - len(rows))
+    return page
+
+
+def archived_transactions(
+    db: Session,
+    user: models.User,
+    *,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    type: Optional[str] = None,
+    category_ids: Optional[List[UUID]] = None,
+    min_amount: Optional[int] = None,
+    max_amount: Optional[int] = None,
+    metadata: Optional[str] = None,
+    metadata_keys: Optional[List[str]] = None,
+    q: Optional[str] = None,
+) -> archive.ArchivedRows:
+    """The user's archived transactions that pass the list/aggregate filters.
+
+    ``q`` matches descriptions that contain each of its words, ignoring
+    case (there is no full-text index in the archive).
+    """
+    rows = archive.select(
+        db,
+        user.id,
+        start=start_date,
+        end=end_date,
+        type=type,
+        category_ids=category_ids,
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
+    wanted = _metadata_filter(metadata)
+    if len(rows) and (wanted is not None or metadata_keys):
+        rows = rows.where(
+            [
+                tags is not None
+                and (wanted is None or _json_contains(tags, wanted))
+                and all(key in tags for key in metadata_keys or ())
+                for tags in rows.values("metadata")
+            ]
+        )
+    if len(rows) and q:
+        words = q.lower().split()
+        rows = rows.where(
+            [
+                all(word in (description or "").lower() for word in words)
+                for description in rows.values("description")
+            ]
+        )
+    return rows
+
+
+def with_stragglers(archived: archive.ArchivedRows, stragglers, descending: bool):
+    """Archived transactions (in date order) plus stored ones as old as them.
+
+    Transactions dated before the archive horizon that were added after the
+    archive run (``stragglers``) stay in the table until the next run.
+    """
+    stored = stragglers.all()
+    if not stored:
+        return archived
+    rows = archived[:] + [
+        schemas.TransactionOut.model_validate(t, from_attributes=True) for t in stored
+    ]
+    rows.sort(key=lambda t: t.occurred_at, reverse=descending)
+    return rows
+
+
+def page_with_archived(
+    query,
+    archived: archive.ArchivedRows,
+    sort_by: str,
+    descending: bool,
+    offset: int,
+    limit: int,
+) -> list[schemas.TransactionOut]:
+    """One page of stored and archived transactions sorted by ``sort_by``.
+
+    The page is among the first ``offset + limit`` rows of either source,
+    so that many are taken from each and merged.
     """
+    end = offset + limit
+    rows = [
+        schemas.TransactionOut.model_validate(t, from_attributes=True)
+        for t in query.limit(end).all()
+    ] + archived[:end]
+    if sort_by == "category_id":  # NULLs last ascending, as in Postgres
+        rows.sort(
+            key=lambda t: (t.category_id is None, t.category_id or NIL_UUID),
+            reverse=descending,
+        )
+    else:
+        rows.sort(key=lambda t: getattr(t, sort_by), reverse=descending)
+    return rows[offset:end]
+
 
+def build_list_query(
+    db: Session,
+    user: models.User,
+    *,
+    type: Optional[str] = None,
+    category_id: Optional[UUID] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[int] = None,
+    max_amount: Optional[int] = None,
+    q: Optional[str] = None,
+    metadata: Optional[str] = None,
+    metadata_keys: Optional[List[str]] = None,
+    sort_by: str = "occurred_at",
+    sort_order: str = "desc",
+):
+    """Build the filtered, sorted (unpaginated) query behind list_transactions.
+
+    Also used by ``app.index_advisor`` to EXPLAIN every query shape the
+    endpoint can produce.
+
+    Args:
+        db: Database session
+        user: Requesting user; admins are not limited to their own rows
+        sort_by: One of LIST_SORT_COLUMNS
+        sort_order: 'asc' or 'desc'
+
+    Returns:
+        SQLAlchemy query over Transaction
+    """
     # Base query - users see own, admins see all
     query = db.query(models.Transaction)
-    if current_user.role != "admin":
-        query = query.filter(models.Transaction.user_id == current_user.id)
+    if user.role != "admin":
+        query = query.filter(models.Transaction.user_id == user.id)
 
     # Apply filters
     if type:
@@ -112,78 +630,238 @@ def list_transactions(
     if max_amount is not None:
         query = query.filter(models.Transaction.amount_cents <= max_amount)
 
+    query = _apply_metadata_filters(query, metadata, metadata_keys)
+
+    # Apply search (ranked by relevance ahead of the requested sort)
+    if q:
+        query, rank = _apply_search(query, q)
+        query = query.order_by(rank.desc())
+
     # Apply sorting
     sort_column = getattr(models.Transaction, sort_by)
     if sort_order == "desc":
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column.asc())
+        return query.order_by(sort_column.desc())
+    return query.order_by(sort_column.asc())
 
-    # Apply pagination
-    offset = (page - 1) * limit
-    transactions = query.offset(offset).limit(limit).all()
 
-    # Return as validated models to avoid SQLAlchemy metadata conflict
-    return [
-        schemas.TransactionOut.model_validate(t, from_attributes=True)
-        for t in transactions
-    ]
+def _apply_search(query, q: str):
+    """Filter a transaction query by a description search term.
+
+    Combines three index-backed matches (GIN on ``search_vector`` and the
+    pg_trgm GIN on ``description``): full-text word match, substring match
+    and fuzzy word similarity for typos.
+
+    Returns:
+        Tuple of (filtered_query, rank_expression)
+    """
+    tsquery = func.websearch_to_tsquery("english", q)
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    term = literal(q)
+
+    query = query.filter(
+        or_(
+            models.Transaction.search_vector.op("@@")(tsquery),
+            models.Transaction.description.ilike(f"%{escaped}%", escape="\\"),
+            term.op("<%")(models.Transaction.description),
+        )
+    )
+    rank = func.ts_rank_cd(
+        models.Transaction.search_vector, tsquery
+    ) + func.word_similarity(term, models.Transaction.description)
+    return query, rank
+
+
+def _apply_metadata_filters(
+    query, metadata: Optional[str], metadata_keys: Optional[List[str]]
+):
+    """Filter a transaction query on the JSONB ``metadata`` column.
+
+    Both filters are served by the ``ix_transactions_metadata`` GIN index:
+    containment (``@>``) for key/value matches and ``?&`` for key existence.
+
+    Raises:
+        HTTPException: If ``metadata`` is not a JSON object (400 Bad Request)
+    """
+    wanted = _metadata_filter(metadata)
+    if wanted is not None:
+        query = query.filter(models.Transaction.metadata_.contains(wanted))
+
+    if metadata_keys:
+        query = query.filter(models.Transaction.metadata_.has_all(array(metadata_keys)))
+
+    return query
+
+
+def _metadata_filter(metadata: Optional[str]) -> Optional[dict]:
+    """Parse the ``metadata`` query parameter.
+
+    Raises:
+        HTTPException: If it is not a JSON object (400 Bad Request)
+    """
+    if not metadata:
+        return None
+    try:
+        wanted = json.loads(metadata)
+    except ValueError:
+        wanted = None
+    if not isinstance(wanted, dict):
+        raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+    return wanted
+
+
+def _json_contains(value, wanted) -> bool:
+    """JSONB ``@>`` in Python, for filtering projected occurrences."""
+    if isinstance(wanted, dict):
+        return isinstance(value, dict) and all(
+            key in value and _json_contains(value[key], item)
+            for key, item in wanted.items()
+        )
+    if isinstance(wanted, list):
+        return isinstance(value, list) and all(
+            any(_json_contains(element, item) for element in value) for item in wanted
+        )
+    return value == wanted
 
 
 @router.get("/aggregates")
 def get_transaction_aggregates(
-    group_by: str = Query("category", pattern="^(category|period)$"),
+    group_by: str = Query("category", pattern="^(category|period|metadata)$"),
     period: str = Query("monthly", pattern="^(weekly|monthly|yearly)$"),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     type: Optional[str] = Query(None, pattern="^(income|expense)$"),
     category_ids: Optional[List[UUID]] = Query(None, alias="category_ids[]"),
-    db: Session = Depends(get_db),
+    metadata: Optional[str] = None,
+    metadata_keys: Optional[List[str]] = Query(None, alias="metadata_keys[]"),
+    metadata_key: Optional[str] = Query(None, min_length=1, max_length=100),
+    include_projected: bool = False,
+    db: Session = Depends(get_caught_up_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """
-    Aggregate transactions by category or time period.
+    Aggregate transactions by category, time period or a metadata tag.
 
-    - **group_by**: 'category' or 'period'
+    - **group_by**: 'category', 'period' or 'metadata'
     - **period**: 'weekly', 'monthly', or 'yearly' (used when group_by='period')
     - **start_date**: Filter transactions from this date
     - **end_date**: Filter transactions until this date
     - **type**: Filter by 'income' or 'expense'
     - **category_ids[]**: Filter by specific categories (can pass multiple)
+    - **metadata**: JSON object that the transaction metadata must contain
+    - **metadata_keys[]**: Metadata keys that must be present (can pass multiple)
+    - **metadata_key**: Metadata key to group by (required when group_by='metadata')
+    - **include_projected**: Also count the user's upcoming recurring
+      transactions in the range
+
+    Archived transactions (``app.archive``) in the range are counted too
+    (for the user's own transactions; admins' totals cover the database only).
 
     Returns aggregated data with totals and metadata.
     """
+    archived = archive.ArchivedRows.empty()
+    if current_user.role != "admin" and archive.reaches(current_user.id, start_date):
+        archived = archived_transactions(
+            db,
+            current_user,
+            start_date=start_date,
+            end_date=end_date,
+            type=type,
+            category_ids=category_ids,
+            metadata=metadata,
+            metadata_keys=metadata_keys,
+        )
+    projected = []
+    if include_projected:
+        projected = projected_transactions(
+            db,
+            current_user,
+            start_date=start_date,
+            end_date=end_date,
+            type=type,
+            category_ids=category_ids,
+            metadata=metadata,
+            metadata_keys=metadata_keys,
+        )
 
-    # Base query - users see only their own transactions
-    query = db.query(models.Transaction)
-    if current_user.role != "admin":
-        query = query.filter(models.Transaction.user_id == current_user.id)
-
-    # Apply filters
-    if type:
-        query = query.filter(models.Transaction.type == type)
-
-    if category_ids:
-        query = query.filter(models.Transaction.category_id.in_(category_ids))
-
-    if start_date:
-        query = query.filter(models.Transaction.occurred_at >= start_date)
-
-    if end_date:
-        query = query.filter(models.Transaction.occurred_at <= end_date)
+    query = build_aggregate_query(
+        db,
+        current_user,
+        start_date=start_date,
+        end_date=end_date,
+        type=type,
+        category_ids=category_ids,
+        metadata=metadata,
+        metadata_keys=metadata_keys,
+    )
 
-    # Aggregate by category
-    if group_by == "category":
+    # Aggregate by metadata tag (e.g. payment_method, semester)
+    if group_by == "metadata":
+        if not metadata_key:
+            raise HTTPException(
+                status_code=400,
+                detail="metadata_key is required when group_by is 'metadata'",
+            )
+        tag = models.Transaction.metadata_[metadata_key].astext
         results = (
-            query.with_entities(
-                models.Transaction.category_id,
+            query.filter(models.Transaction.metadata_.has_key(metadata_key))
+            .with_entities(
+                tag.label("value"),
                 models.Transaction.type,
                 func.sum(models.Transaction.amount_cents).label("total_cents"),
                 func.count(models.Transaction.id).label("count"),
             )
-            .group_by(models.Transaction.category_id, models.Transaction.type)
+            .group_by(tag, models.Transaction.type)
+            .order_by(tag)
             .all()
         )
+        if projected or len(archived):
+            extra = [
+                (
+                    (_astext(o.rule.metadata_[metadata_key]), o.rule.type),
+                    o.rule.amount_cents,
+                )
+                for o in projected
+                if metadata_key in (o.rule.metadata_ or {})
+            ] + [
+                ((_astext(tags[metadata_key]), type_), amount)
+                for tags, type_, amount in zip(
+                    archived.values("metadata"),
+                    archived.values("type"),
+                    archived.values("amount_cents"),
+                )
+                if metadata_key in (tags or {})
+            ]
+            results = add_totals(results, extra, ("value", "type"))
+            results.sort(key=lambda row: (row.value is None, row.value or ""))
+
+        return {
+            "group_by": "metadata",
+            "metadata_key": metadata_key,
+            "aggregates": [
+                {
+                    "value": row.value,
+                    "type": row.type,
+                    "total_cents": row.total_cents or 0,
+                    "count": row.count,
+                }
+                for row in results
+            ],
+        }
+
+    # Aggregate by category
+    if group_by == "category":
+        results = category_totals(query).all()
+        if projected or len(archived):
+            extra = [
+                ((o.rule.category_id, o.rule.type), o.rule.amount_cents)
+                for o in projected
+            ] + list(
+                zip(
+                    zip(archived.values("category_id"), archived.values("type")),
+                    archived.values("amount_cents"),
+                )
+            )
+            results = add_totals(results, extra, ("category_id", "type"))
 
         # Fetch category details and format response
         aggregates = []
@@ -214,28 +892,21 @@ def get_transaction_aggregates(
 
     # Aggregate by time period
     else:  # group_by == "period"
-        # Determine the date truncation based on period
-        if period == "weekly":
-            # PostgreSQL: date_trunc('week', occurred_at)
-            # SQLite: strftime('%Y-%W', occurred_at) - but we'll use PostgreSQL
-            date_group = func.date_trunc("week", models.Transaction.occurred_at)
-        elif period == "monthly":
-            date_group = func.date_trunc("month", models.Transaction.occurred_at)
-        else:  # yearly
-            date_group = func.date_trunc("year", models.Transaction.occurred_at)
-
-        # Query with date grouping
-        results = (
-            query.with_entities(
-                date_group.label("period_start"),
-                models.Transaction.type,
-                func.sum(models.Transaction.amount_cents).label("total_cents"),
-                func.count(models.Transaction.id).label("count"),
-            )
-            .group_by("period_start", models.Transaction.type)
-            .order_by("period_start")
-            .all()
-        )
+        results = period_totals(query, period).all()
+        if projected or len(archived):
+            extra = [
+                ((_period_start(o.day, period), o.rule.type), o.rule.amount_cents)
+                for o in projected
+            ] + [
+                ((_period_start(occurred.date(), period), type_), amount)
+                for occurred, type_, amount in zip(
+                    archived.values("occurred_at"),
+                    archived.values("type"),
+                    archived.values("amount_cents"),
+                )
+            ]
+            results = add_totals(results, extra, ("period_start", "type"))
+            results.sort(key=lambda row: row.period_start)
 
         # Format response with period labels
         aggregates = []
@@ -275,10 +946,335 @@ def get_transaction_aggregates(
         }
 
 
+def build_aggregate_query(
+    db: Session,
+    user: models.User,
+    *,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    type: Optional[str] = None,
+    category_ids: Optional[List[UUID]] = None,
+    metadata: Optional[str] = None,
+    metadata_keys: Optional[List[str]] = None,
+):
+    """Build the filtered query that get_transaction_aggregates groups.
+
+    Also used by ``app.index_advisor``.
+
+    Returns:
+        SQLAlchemy query over Transaction
+    """
+    # Base query - users see only their own transactions
+    query = db.query(models.Transaction)
+    if user.role != "admin":
+        query = query.filter(models.Transaction.user_id == user.id)
+
+    # Apply filters
+    if type:
+        query = query.filter(models.Transaction.type == type)
+
+    if category_ids:
+        query = query.filter(models.Transaction.category_id.in_(category_ids))
+
+    if start_date:
+        query = query.filter(models.Transaction.occurred_at >= start_date)
+
+    if end_date:
+        query = query.filter(models.Transaction.occurred_at <= end_date)
+
+    return _apply_metadata_filters(query, metadata, metadata_keys)
+
+
+def category_totals(query):
+    """Group a transaction query into totals per (category_id, type)."""
+    return query.with_entities(
+        models.Transaction.category_id,
+        models.Transaction.type,
+        func.sum(models.Transaction.amount_cents).label("total_cents"),
+        func.count(models.Transaction.id).label("count"),
+    ).group_by(models.Transaction.category_id, models.Transaction.type)
+
+
+def add_totals(
+    rows, amounts: list[tuple[tuple, int]], group: tuple[str, ...]
+) -> list[SimpleNamespace]:
+    """Add transactions from outside the query to grouped total rows.
+
+    Used for projected occurrences and archived transactions that pass the
+    same filters as the query.
+
+    Args:
+        rows: Rows with the ``group`` columns, ``total_cents`` and ``count``
+        amounts: (values for the ``group`` columns, amount_cents) per
+            transaction
+        group: Names of the grouping columns
+
+    Returns:
+        Rows with the same attributes, the extra amounts included
+    """
+    totals = {
+        tuple(getattr(row, name) for name in group): [row.total_cents or 0, row.count]
+        for row in rows
+    }
+    for key, amount in amounts:
+        entry = totals.setdefault(key, [0, 0])
+        entry[0] += amount
+        entry[1] += 1
+    return [
+        SimpleNamespace(**dict(zip(group, values)), total_cents=total, count=count)
+        for values, (total, count) in totals.items()
+    ]
+
+
+def _period_start(day: date, period: str) -> datetime:
+    """Python counterpart of ``period_totals``' date_trunc (UTC)."""
+    if period == "weekly":
+        day -= timedelta(days=day.weekday())
+    elif period == "monthly":
+        day = day.replace(day=1)
+    else:  # yearly
+        day = day.replace(month=1, day=1)
+    return _utc_midnight(day)
+
+
+def _astext(value) -> Optional[str]:
+    """Python counterpart of JSONB ``->>``."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def period_totals(query, period: str):
+    """Group a transaction query into totals per (period_start, type).
+
+    Args:
+        query: Filtered transaction query
+        period: 'weekly', 'monthly' or 'yearly'
+    """
+    # Determine the date truncation based on period
+    if period == "weekly":
+        date_group = func.date_trunc("week", models.Transaction.occurred_at)
+    elif period == "monthly":
+        date_group = func.date_trunc("month", models.Transaction.occurred_at)
+    else:  # yearly
+        date_group = func.date_trunc("year", models.Transaction.occurred_at)
+
+    return (
+        query.with_entities(
+            date_group.label("period_start"),
+            models.Transaction.type,
+            func.sum(models.Transaction.amount_cents).label("total_cents"),
+            func.count(models.Transaction.id).label("count"),
+        )
+        .group_by("period_start", models.Transaction.type)
+        .order_by("period_start")
+    )
+
+
+@router.get("/balance", response_model=schemas.BalanceResponse)
+def get_running_balance(
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    include_projected: bool = False,
+    db: Session = Depends(get_caught_up_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Running balance (income minus expenses) over time, for charting.
+
+    - **granularity**: 'day', 'week' (starting Monday) or 'month', in UTC
+    - **start_date**: First bucket (defaults to 90 days, 52 weeks or 24
+      months before end_date)
+    - **end_date**: Last bucket (defaults to today)
+    - **include_projected**: Count upcoming recurring transactions, for a
+      forward-looking balance (pass an end_date in the future)
+
+    Every bucket in the range is returned, including ones without
+    transactions, with its income, expenses and the balance at its end. The
+    range is capped at 1000 buckets, so the response size does not depend
+    on how many transactions there are. Archived transactions
+    (``app.archive``) are included.
+    """
+    end = bucket_start(end_date or datetime.now(timezone.utc).date(), granularity)
+    if start_date is None:
+        start = step_buckets(end, granularity, 1 - BALANCE_DEFAULT_POINTS[granularity])
+    else:
+        start = bucket_start(start_date, granularity)
+    if start > end:
+        raise HTTPException(
+            status_code=400, detail="start_date must not be after end_date"
+        )
+    if count_buckets(start, end, granularity) > BALANCE_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range exceeds {BALANCE_MAX_POINTS} {granularity} buckets",
+        )
+
+    opening = opening_balance(db, current_user.id, start)
+    rows = db.execute(
+        BALANCE_SERIES,
+        {
+            "first": start,
+            "last": end,
+            "step": BALANCE_STEPS[granularity],
+            "unit": granularity,
+            "user_id": current_user.id,
+            "start": _utc_midnight(start),
+            "end": _utc_midnight(step_buckets(end, granularity, 1)),
+            "opening": opening,
+        },
+    ).all()
+    points = [schemas.BalancePoint.model_validate(row._mapping) for row in rows]
+    if archive.reaches(current_user.id, _utc_midnight(start.replace(day=1))):
+        opening = add_archived_balance(db, current_user, points, granularity, opening)
+    if include_projected:
+        opening = add_projected_balance(db, current_user, points, granularity, opening)
+
+    return schemas.BalanceResponse(
+        granularity=granularity,
+        start_date=start,
+        end_date=end,
+        opening_balance_cents=opening,
+        points=points,
+    )
+
+
+def add_projected_balance(
+    db: Session,
+    user: models.User,
+    points: list[schemas.BalancePoint],
+    granularity: str,
+    opening: int,
+) -> int:
+    """Fold projected recurring occurrences into a balance series in place.
+
+    Occurrences before the first bucket move the opening balance, later ones
+    the flows of their bucket; the running balance is then recomputed.
+
+    Returns:
+        The new opening balance
+    """
+    buckets = {point.period_start: point for point in points}
+    last = step_buckets(points[-1].period_start, granularity, 1)
+    for occurrence in recurrence.projected(db, user.id, end=_utc_midnight(last)):
+        amount = occurrence.rule.amount_cents
+        signed = amount if occurrence.rule.type == "income" else -amount
+        point = buckets.get(bucket_start(occurrence.day, granularity))
+        if occurrence.day < points[0].period_start:
+            opening += signed
+        elif point is not None:
+            if occurrence.rule.type == "income":
+                point.income_cents += amount
+            else:
+                point.expense_cents += amount
+
+    running_balance(points, opening)
+    return opening
+
+
+def add_archived_balance(
+    db: Session,
+    user: models.User,
+    points: list[schemas.BalancePoint],
+    granularity: str,
+    opening: int,
+) -> int:
+    """Fold archived transactions into a balance series in place.
+
+    The opening balance already has every whole month before the first
+    bucket (from the rollup, which keeps archived months); archived
+    transactions between the start of that month and the first bucket move
+    it, later ones the flows of their bucket.
+
+    Returns:
+        The new opening balance
+    """
+    first = points[0].period_start
+    buckets = {point.period_start: point for point in points}
+    rows = archive.select(
+        db,
+        user.id,
+        start=_utc_midnight(first.replace(day=1)),
+        end=_utc_midnight(step_buckets(points[-1].period_start, granularity, 1)),
+        end_inclusive=False,
+    )
+    for occurred, type_, amount in zip(
+        rows.values("occurred_at"), rows.values("type"), rows.values("amount_cents")
+    ):
+        day = occurred.date()
+        if day < first:
+            opening += amount if type_ == "income" else -amount
+        elif type_ == "income":
+            buckets[bucket_start(day, granularity)].income_cents += amount
+        else:
+            buckets[bucket_start(day, granularity)].expense_cents += amount
+
+    running_balance(points, opening)
+    return opening
+
+
+def running_balance(points: list[schemas.BalancePoint], opening: int) -> None:
+    """Recompute each point's balance from its flows, in place."""
+    balance = opening
+    for point in points:
+        balance += point.income_cents - point.expense_cents
+        point.balance_cents = balance
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """First day of the day/week/month bucket containing ``day``."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def step_buckets(start: date, granularity: str, steps: int) -> date:
+    """Bucket start ``steps`` buckets after (or before) ``start``."""
+    if granularity == "month":
+        months = start.year * 12 + start.month - 1 + steps
+        return date(months // 12, months % 12 + 1, 1)
+    days = 7 if granularity == "week" else 1
+    return start + timedelta(days=days * steps)
+
+
+def count_buckets(start: date, end: date, granularity: str) -> int:
+    """Number of buckets from ``start`` to ``end`` inclusive."""
+    if granularity == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    days = 7 if granularity == "week" else 1
+    return (end - start).days // days + 1
+
+
+def opening_balance(db: Session, user_id: UUID, start: date) -> int:
+    """Balance before ``start``: whole months from the rollup, then the rest.
+
+    Only the days between the first of ``start``'s month and ``start`` are
+    summed from ``transactions``, so this stays cheap however long the
+    user's history is.
+    """
+    month_start = start.replace(day=1)
+    net = db.execute(
+        MONTH_TO_DATE_NET,
+        {
+            "user_id": user_id,
+            "month_start": _utc_midnight(month_start),
+            "start": _utc_midnight(start),
+        },
+    ).scalar()
+    return rollups.balance_cents(db, user_id, before=month_start) + net
+
+
+def _utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+
+
 @router.get("/{transaction_id}", response_model=schemas.TransactionOut)
 def get_transaction(
     transaction_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """Get a single transaction by ID."""
@@ -303,53 +1299,23 @@ def update_transaction(
     body: schemas.TransactionCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(claim_idempotency_key),
 ):
-    """Update a transaction (full replacement)."""
+    """Update a transaction (full replacement); honors ``Idempotency-Key``."""
 
     # Find transaction (users can only update their own)
-    query = db.query(models.Transaction).filter(models.Transaction.id == transaction_id)
-    if current_user.role != "admin":
-        query = query.filter(models.Transaction.user_id == current_user.id)
-
-    transaction = query.first()
+    transaction = find_transaction(db, current_user, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    # Validate: no future dates
-    occurred_at = body.occurred_at or datetime.now(timezone.utc)
-    if occurred_at > datetime.now(timezone.utc):
-        raise HTTPException(
-            status_code=400, detail="Transaction date cannot be in the future"
-        )
-
-    # Validate: category belongs to user (if provided)
-    if body.category_id:
-        category = (
-            db.query(models.Category)
-            .filter(
-                models.Category.id == body.category_id,
-                models.Category.user_id == current_user.id,
-            )
-            .first()
-        )
-        if not category:
-            raise HTTPException(
-                status_code=404, detail="Category not found or does not belong to user"
-            )
-
-    # Update fields
-    transaction.category_id = body.category_id
-    transaction.type = body.type
-    transaction.amount_cents = body.amount_cents
-    transaction.occurred_at = occurred_at
-    transaction.description = body.description
-    transaction.receipt_url = body.receipt_url
-    transaction.metadata_ = body.metadata_
-
-    db.commit()
+    events = update_transaction_record(db, current_user, transaction, body)
     db.refresh(transaction)
 
-    return schemas.TransactionOut.model_validate(transaction, from_attributes=True)
+    response = schemas.TransactionOut.model_validate(transaction, from_attributes=True)
+    idempotency.save(200, response)
+    db.commit()
+    publish_events(transaction.user_id, events)
+    return response
 
 
 @router.delete("/{transaction_id}", status_code=204)
@@ -357,19 +1323,19 @@ def delete_transaction(
     transaction_id: UUID,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(claim_idempotency_key),
 ):
-    """Delete a transaction."""
+    """Delete a transaction; honors ``Idempotency-Key``."""
 
     # Find transaction (users can only delete their own)
-    query = db.query(models.Transaction).filter(models.Transaction.id == transaction_id)
-    if current_user.role != "admin":
-        query = query.filter(models.Transaction.user_id == current_user.id)
-
-    transaction = query.first()
+    transaction = find_transaction(db, current_user, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    db.delete(transaction)
+    user_id = transaction.user_id
+    events = delete_transaction_record(db, transaction)
+    idempotency.save(204)
     db.commit()
+    publish_events(user_id, events)
 
     return None
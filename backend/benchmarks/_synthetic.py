@@ -0,0 +1,145 @@
+"""Shared helpers for database benchmarks.
+
+Benchmarks run against the database in ``DATABASE_URL`` and create their
+own throwaway user so they never touch real data. Rows are generated
+server-side with ``generate_series`` so a million-row dataset loads in
+seconds rather than minutes.
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+MERCHANTS = [
+    "Chipotle",
+    "Trader Joe's groceries",
+    "Campus bookstore textbooks",
+    "City bus pass",
+    "Starbucks coffee",
+    "Monthly rent",
+    "Netflix subscription",
+    "Shell gas station",
+    "Target household",
+    "Pizza night with roommates",
+    "Tuition installment",
+    "Pharmacy",
+]
+
+
+def create_user(conn, email_prefix: str = "bench") -> uuid.UUID:
+    """Insert a throwaway user and return its id."""
+    user_id = uuid.uuid4()
+    conn.execute(
+        text(
+            "INSERT INTO users (id, email, password_hash, role) "
+            "VALUES (:id, :email, 'x', 'student')"
+        ),
+        {"id": user_id, "email": f"{email_prefix}-{user_id}@bench.invalid"},
+    )
+    return user_id
+
+
+def insert_users(conn, rows: int, email_prefix: str = "bench", start: int = 1) -> None:
+    """Bulk-insert users ``<prefix>-<n>@bench.invalid`` for n in [start, start+rows)."""
+    conn.execute(
+        text(
+            """
+            INSERT INTO users (id, email, password_hash, role)
+            SELECT gen_random_uuid(), :prefix || '-' || g || '@bench.invalid',
+                   'x', 'student'
+            FROM generate_series(:start, :start + :rows - 1) AS g
+            """
+        ),
+        {"prefix": email_prefix, "start": start, "rows": rows},
+    )
+
+
+def delete_users(conn, email_prefix: str = "bench") -> None:
+    """Remove users created by insert_users."""
+    conn.execute(
+        text("DELETE FROM users WHERE email LIKE :pattern"),
+        {"pattern": f"{email_prefix}-%@bench.invalid"},
+    )
+
+
+def create_categories(conn, user_id: uuid.UUID, count: int = 8) -> list[uuid.UUID]:
+    """Insert ``count`` expense categories for a user."""
+    ids = [uuid.uuid4() for _ in range(count)]
+    for i, cat_id in enumerate(ids):
+        conn.execute(
+            text(
+                "INSERT INTO categories (id, user_id, name, type, "
+                "monthly_limit_cents, is_default) "
+                "VALUES (:id, :user_id, :name, 'expense', :limit, false)"
+            ),
+            {
+                "id": cat_id,
+                "user_id": user_id,
+                "name": f"Bench category {i}",
+                "limit": 50000 + 10000 * i,
+            },
+        )
+    return ids
+
+
+def insert_transactions(
+    conn,
+    user_id: uuid.UUID,
+    rows: int,
+    category_ids: list[uuid.UUID] = (),
+    days: int = 3 * 365,
+) -> None:
+    """Bulk-insert ``rows`` synthetic transactions spread over ``days``."""
+    conn.execute(
+        text(
+            """
+            INSERT INTO transactions
+                (id, user_id, category_id, type, amount_cents, occurred_at,
+                 description, metadata)
+            SELECT
+                gen_random_uuid(),
+                :user_id,
+                (CAST(:categories AS uuid[]))[1 + g % greatest(:n_categories, 1)],
+                CASE WHEN g % 10 = 0 THEN 'income' ELSE 'expense' END,
+                100 + (random() * 20000)::int,
+                now() - (random() * :days) * interval '1 day',
+                (CAST(:merchants AS text[]))[1 + g % :n_merchants] || ' #' || g,
+                jsonb_build_object(
+                    'payment_method', (ARRAY['card', 'cash', 'venmo'])[1 + g % 3]
+                )
+            FROM generate_series(1, :rows) AS g
+            """
+        ),
+        {
+            "user_id": user_id,
+            "categories": [str(c) for c in category_ids],
+            "n_categories": len(category_ids),
+            "merchants": MERCHANTS,
+            "n_merchants": len(MERCHANTS),
+            "days": days,
+            "rows": rows,
+        },
+    )
+
+
+def delete_user(conn, user_id: uuid.UUID) -> None:
+    """Remove a benchmark user and (via cascades) everything it owns."""
+    conn.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+
+
+def explain(conn, sql: str, params: dict) -> tuple[str, float]:
+    """Run EXPLAIN ANALYZE and return (plan_text, wall_clock_ms)."""
+    start = time.perf_counter()
+    rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params).all()
+    elapsed = (time.perf_counter() - start) * 1000
+    return "\n".join(r[0] for r in rows), elapsed
+
+
+@contextmanager
+def timed(label: str):
+    """Print how long the wrapped block took."""
+    start = time.perf_counter()
+    yield
+    print(f"{label}: {time.perf_counter() - start:.2f}s")
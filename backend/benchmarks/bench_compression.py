@@ -0,0 +1,118 @@
+"""Compression benchmark: CPU time versus bytes saved for API payloads.
+
+Builds synthetic ``list_transactions`` and ``aggregates`` responses and
+compresses them at several gzip levels (and brotli qualities when the
+``brotli`` package is installed).
+
+Usage:
+    python -m benchmarks.bench_compression [--rows 100] [--repeat 200]
+"""
+
+import argparse
+import json
+import random
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVELS = [1, 4, 6, 9]
+BROTLI_QUALITIES = [1, 4, 6, 11]
+
+
+def make_transactions(rows: int) -> bytes:
+    """Build a JSON page shaped like ``GET /api/transactions``."""
+    user_id = str(uuid.uuid4())
+    categories = [str(uuid.uuid4()) for _ in range(8)]
+    now = datetime.now(timezone.utc)
+    items = []
+    for i in range(rows):
+        occurred = now - timedelta(hours=random.randint(0, 24 * 365))
+        items.append(
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "category_id": random.choice(categories),
+                "type": "expense" if i % 5 else "income",
+                "amount_cents": random.randint(100, 200000),
+                "occurred_at": occurred.isoformat(),
+                "description": random.choice(
+                    ["Groceries", "Chipotle", "Bus pass", "Textbooks", "Rent"]
+                ),
+                "receipt_url": None,
+                "metadata_": {"payment_method": random.choice(["card", "cash"])},
+                "created_at": now.isoformat(),
+            }
+        )
+    return json.dumps(items).encode()
+
+
+def make_aggregates(groups: int) -> bytes:
+    """Build a JSON body shaped like ``GET /api/transactions/aggregates``."""
+    aggregates = [
+        {
+            "category_id": str(uuid.uuid4()),
+            "category_name": f"Category {i}",
+            "type": "expense",
+            "total_cents": random.randint(1000, 500000),
+            "count": random.randint(1, 300),
+        }
+        for i in range(groups)
+    ]
+    return json.dumps(
+        {"group_by": "category", "period": "monthly", "aggregates": aggregates}
+    ).encode()
+
+
+def bench(name: str, payload: bytes, compress, repeat: int) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = compress(payload)
+    elapsed = (time.perf_counter() - start) / repeat
+    ratio = len(out) / len(payload)
+    throughput = len(payload) / elapsed / 1e6
+    print(
+        f"  {name:<12} {len(out):>9,} B  ratio {ratio:6.1%}  "
+        f"{elapsed * 1e6:9.1f} us/op  {throughput:8.1f} MB/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    payloads = {
+        f"transactions ({args.rows} rows)": make_transactions(args.rows),
+        "aggregates (25 groups)": make_aggregates(25),
+    }
+    for label, payload in payloads.items():
+        print(f"{label}: {len(payload):,} bytes uncompressed")
+        for level in GZIP_LEVELS:
+            bench(
+                f"gzip-{level}",
+                payload,
+                lambda data, lvl=level: zlib.compress(data, lvl),
+                args.repeat,
+            )
+        if brotli is not None:
+            for quality in BROTLI_QUALITIES:
+                bench(
+                    f"br-{quality}",
+                    payload,
+                    lambda data, q=quality: brotli.compress(data, quality=q),
+                    args.repeat,
+                )
+        else:
+            print("  (brotli not installed; skipping br)")
+        print()
+
+
+if __name__ == "__main__":
+    main()
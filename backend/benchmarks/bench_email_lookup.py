@@ -0,0 +1,74 @@
+"""Login email lookup benchmark at growing user counts.
+
+Grows a throwaway set of users up to ``--users`` (default one million) and,
+at each size, compares the old ``email ILIKE :email`` lookup with the
+``lower(email) = lower(:email)`` lookup backed by ``ix_users_email_lower``.
+The ILIKE plan scans every row, so its time and buffer count grow with the
+table; the index lookup touches a handful of pages at every size.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... \\
+        python -m benchmarks.bench_email_lookup [--users 1000000]
+"""
+
+import argparse
+import re
+
+from sqlalchemy import text
+
+from app.db import engine
+from benchmarks._synthetic import delete_users, explain, insert_users, timed
+
+PREFIX = "bench-login"
+
+LOOKUPS = {
+    "ilike": "SELECT id FROM users WHERE email ILIKE :email",
+    "lower(email) =": "SELECT id FROM users WHERE lower(email) = lower(:email)",
+}
+
+
+def plan_summary(plan: str) -> str:
+    """Return the scan node and buffer count of a plan."""
+    scan = next(
+        (
+            line.strip(" ->").split("  (")[0]
+            for line in plan.splitlines()
+            if "Scan" in line
+        ),
+        "?",
+    )
+    buffers = re.search(r"Buffers: shared hit=(\d+)(?: read=(\d+))?", plan)
+    pages = sum(int(n) for n in buffers.groups() if n) if buffers else 0
+    exec_ms = re.search(r"Execution Time: ([\d.]+)", plan).group(1)
+    return f"{float(exec_ms):9.3f} ms  {pages:>7} pages  {scan}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    sizes = [n for n in (10_000, 100_000, 1_000_000) if n < args.users]
+    sizes.append(args.users)
+
+    loaded = 0
+    try:
+        for size in sizes:
+            with engine.begin() as conn, timed(f"\ngrow to {size:,} users"):
+                insert_users(conn, size - loaded, PREFIX, start=loaded + 1)
+                conn.execute(text("ANALYZE users"))
+            loaded = size
+
+            # Mixed case, as typed by a user on the login form
+            params = {"email": f"{PREFIX.upper()}-{size // 2}@Bench.Invalid"}
+            with engine.connect() as conn:
+                for label, sql in LOOKUPS.items():
+                    plan, _ = explain(conn, sql, params)
+                    print(f"  {label:<15} {plan_summary(plan)}")
+    finally:
+        with engine.begin() as conn:
+            delete_users(conn, PREFIX)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Forecast benchmark for users with many transactions.
+
+For each ``--rows`` size (default 10k and 100k) loads that many expenses
+over the forecast history window for a throwaway user, then times:
+
+* ``load``: the grouped daily-totals query into a NumPy array
+* ``compute``: ``forecast_month`` for each projection method
+* ``row loop``: the same month-to-date and average-pace figures computed by
+  fetching every transaction and looping in Python, for comparison
+* ``endpoint``: ``GET /api/forecast`` end to end
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... \\
+        python -m benchmarks.bench_forecast [--rows 10000 100000] [--repeat 5]
+"""
+
+import argparse
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import analytics
+from app.config import settings
+from app.db import SessionLocal, engine
+from app.main import app
+from app.partitions import add_months, ensure_partitions
+from app.security import create_access_token
+from benchmarks._synthetic import (
+    create_categories,
+    create_user,
+    delete_user,
+    insert_transactions,
+    timed,
+)
+
+ROW_LOOP_SQL = text(
+    """
+    SELECT category_id, occurred_at, amount_cents
+    FROM transactions
+    WHERE user_id = :user_id AND type = 'expense' AND occurred_at >= :start
+    """
+)
+
+
+def median_ms(fn, repeat: int) -> float:
+    """Median wall-clock time of ``fn()`` over ``repeat`` runs, in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def row_loop(db, user_id, month_start, window_start):
+    """Month-to-date spend and average daily pace, one transaction at a time."""
+    spent, recent = defaultdict(int), defaultdict(int)
+    rows = db.execute(
+        ROW_LOOP_SQL,
+        {"user_id": user_id, "start": min(month_start, window_start)},
+    )
+    for category_id, occurred_at, amount_cents in rows:
+        day = occurred_at.astimezone(timezone.utc).date()
+        if day >= month_start:
+            spent[category_id] += amount_cents
+        if day >= window_start:
+            recent[category_id] += amount_cents
+    return spent, recent
+
+
+def run(size: int, repeat: int) -> None:
+    today = datetime.now(timezone.utc).date()
+    history_days = settings.forecast_history_days
+    with engine.begin() as conn:
+        user_id = create_user(conn)
+        categories = create_categories(conn, user_id)
+        with timed(f"\ninsert {size:,} rows"):
+            insert_transactions(conn, user_id, size, categories, history_days - 1)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE transactions"))
+        conn.commit()
+
+    start = min(today.replace(day=1), today - timedelta(days=history_days - 1))
+    end = today + timedelta(days=1)
+    limits = np.full(len(categories), 150_000, dtype=np.float64)
+    window_start = today - timedelta(days=settings.forecast_window_days - 1)
+    try:
+        with SessionLocal() as db:
+            load_ms = median_ms(
+                lambda: analytics.load_daily_totals(
+                    db, user_id, categories, start, end
+                ),
+                repeat,
+            )
+            history = analytics.load_daily_totals(db, user_id, categories, start, end)
+            print(f"  load       {load_ms:8.2f} ms  ({history.amounts.shape} array)")
+            for method in analytics.METHODS:
+                compute_ms = median_ms(
+                    lambda: analytics.forecast_month(
+                        history, limits, today, method, settings.forecast_window_days
+                    ),
+                    repeat,
+                )
+                print(f"  compute    {compute_ms:8.2f} ms  ({method})")
+            loop_ms = median_ms(
+                lambda: row_loop(db, user_id, today.replace(day=1), window_start),
+                repeat,
+            )
+            print(f"  row loop   {loop_ms:8.2f} ms  (fetch every row, average only)")
+
+        token, _ = create_access_token(str(user_id))
+        client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+        for method in analytics.METHODS:
+            endpoint_ms = median_ms(
+                lambda: client.get(
+                    "/api/forecast", params={"method": method}
+                ).raise_for_status(),
+                repeat,
+            )
+            print(f"  endpoint   {endpoint_ms:8.2f} ms  ({method})")
+    finally:
+        with engine.begin() as conn:
+            delete_user(conn, user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    months_back = settings.forecast_history_days // 28 + 1
+    ensure_partitions(engine, add_months(this_month, -months_back), this_month)
+    for size in args.rows:
+        run(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
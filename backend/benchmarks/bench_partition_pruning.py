@@ -0,0 +1,120 @@
+"""Partition pruning check for the transaction list and aggregate endpoints.
+
+Loads ``--rows`` transactions spread over three years for a throwaway user
+(creating the monthly partitions first), calls ``GET /api/transactions`` and
+``GET /api/transactions/aggregates`` with and without date filters, captures
+the SQL each request runs and prints how many partitions its plan touches.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... \\
+        python -m benchmarks.bench_partition_pruning [--rows 200000] [--verbose]
+"""
+
+import argparse
+import re
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+
+from app.db import engine
+from app.main import app
+from app.partitions import add_months, ensure_partitions, list_partitions
+from app.security import create_access_token
+from benchmarks._synthetic import (
+    create_categories,
+    create_user,
+    delete_user,
+    explain,
+    insert_transactions,
+    timed,
+)
+
+MONTHS = 36
+
+
+def requests_to_check(this_month):
+    """(label, path, params) for each request whose plan is inspected."""
+    one_month = {
+        "start_date": add_months(this_month, -2).isoformat() + "T00:00:00Z",
+        "end_date": add_months(this_month, -1).isoformat() + "T00:00:00Z",
+    }
+    quarter = {
+        "start_date": add_months(this_month, -6).isoformat() + "T00:00:00Z",
+        "end_date": add_months(this_month, -3).isoformat() + "T00:00:00Z",
+    }
+    return [
+        ("list, no dates", "/api/transactions", {}),
+        ("list, one month", "/api/transactions", one_month),
+        (
+            "aggregates by category, one month",
+            "/api/transactions/aggregates",
+            {"group_by": "category", **one_month},
+        ),
+        (
+            "aggregates by month, quarter",
+            "/api/transactions/aggregates",
+            {"group_by": "period", "period": "monthly", **quarter},
+        ),
+        (
+            "aggregates by month, no dates",
+            "/api/transactions/aggregates",
+            {"group_by": "period", "period": "monthly"},
+        ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--verbose", action="store_true", help="print full plans")
+    args = parser.parse_args()
+
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    ensure_partitions(engine, add_months(this_month, -MONTHS - 1), this_month)
+
+    with engine.begin() as conn:
+        user_id = create_user(conn)
+        categories = create_categories(conn, user_id)
+        with timed(f"insert {args.rows:,} rows"):
+            insert_transactions(conn, user_id, args.rows, categories, MONTHS * 30)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE transactions"))
+        conn.commit()
+        total = len(list_partitions(conn))
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if re.search(r"\bFROM transactions\b", statement):
+            captured.append((statement, parameters))
+
+    token, _ = create_access_token(str(user_id))
+    client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        for label, path, params in requests_to_check(this_month):
+            captured.clear()
+            response = client.get(path, params=params)
+            response.raise_for_status()
+            statement, parameters = captured[-1]
+
+            with engine.connect() as conn:
+                # Run the statement exactly as psycopg2 sent it
+                sql = conn.connection.cursor().mogrify(statement, parameters).decode()
+                plan, elapsed = explain(conn, sql.replace("%", "%%"), {})
+            scanned = sorted(set(re.findall(r"on (transactions_\w+)", plan)))
+            print(
+                f"\n== {label}: {len(scanned)} of {total} partitions, {elapsed:.1f} ms"
+            )
+            print(f"   {', '.join(scanned) if len(scanned) <= 4 else '...'}")
+            if args.verbose:
+                print(plan)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+        with engine.begin() as conn:
+            delete_user(conn, user_id)
+
+
+if __name__ == "__main__":
+    main()
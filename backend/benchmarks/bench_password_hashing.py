@@ -0,0 +1,68 @@
+"""bcrypt cost benchmark for tuning BCRYPT_ROUNDS and the hashing pool.
+
+Prints the single-hash latency for a range of cost factors, then pushes a
+burst of concurrent verifications through the bounded hashing pool to show
+queueing delay for the configured PASSWORD_HASH_WORKERS.
+
+Usage:
+    python -m benchmarks.bench_password_hashing [--burst 32]
+"""
+
+import argparse
+import asyncio
+import time
+
+from passlib.hash import bcrypt
+
+from app import security
+from app.config import settings
+from app.metrics import metrics
+
+
+def bench_rounds():
+    print("rounds  ms/hash")
+    for rounds in range(8, 15):
+        hasher = bcrypt.using(rounds=rounds)
+        start = time.perf_counter()
+        hasher.hash("correct horse battery staple")
+        print(f"{rounds:>6}  {(time.perf_counter() - start) * 1000:7.1f}")
+
+
+async def bench_burst(burst: int):
+    hashed = security.hash_password("correct horse battery staple")
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            security.verify_password_async("correct horse battery staple", hashed)
+            for _ in range(burst)
+        ),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+    rejected = sum(isinstance(r, security.PasswordHashingBusy) for r in results)
+    timers = metrics.snapshot()["timers"]
+    print(
+        f"\nburst of {burst} verifications at {settings.bcrypt_rounds} rounds, "
+        f"{settings.password_hash_workers} workers: {elapsed:.2f}s total, "
+        f"{rejected} rejected"
+    )
+    for name in ("password_hash.wait", "password_hash.duration"):
+        t = timers.get(name)
+        if t:
+            print(
+                f"  {name:<24} avg {t['avg_seconds'] * 1000:7.1f} ms  "
+                f"max {t['max_seconds'] * 1000:7.1f} ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=32)
+    args = parser.parse_args()
+
+    bench_rounds()
+    asyncio.run(bench_burst(args.burst))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Description search benchmark over a large synthetic transaction set.
+
+Loads ``--rows`` transactions (default one million) for a throwaway user,
+then compares the index-backed search used by ``list_transactions?q=``
+against a plain sequential ILIKE scan.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... \\
+        python -m benchmarks.bench_search [--rows 1000000] [--keep]
+"""
+
+import argparse
+
+from sqlalchemy import text
+
+from app.db import engine
+from benchmarks._synthetic import (
+    create_user,
+    delete_user,
+    explain,
+    insert_transactions,
+    timed,
+)
+
+SEARCH_SQL = """
+    SELECT id, description,
+           ts_rank_cd(search_vector, websearch_to_tsquery('english', :q))
+           + word_similarity(:q, description) AS rank
+    FROM transactions
+    WHERE user_id = :user_id
+      AND (search_vector @@ websearch_to_tsquery('english', :q)
+           OR description ILIKE :pattern
+           OR :q <% description)
+    ORDER BY rank DESC, occurred_at DESC
+    LIMIT 50
+"""
+
+SEQSCAN_SQL = """
+    SELECT id, description
+    FROM transactions
+    WHERE user_id = :user_id AND lower(description) LIKE lower(:pattern)
+    ORDER BY occurred_at DESC
+    LIMIT 50
+"""
+
+TERMS = ["chipotle", "chipolte", "textbook", "bus pass", "netfl"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--keep", action="store_true", help="keep benchmark rows")
+    parser.add_argument("--verbose", action="store_true", help="print full plans")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        user_id = create_user(conn)
+        with timed(f"insert {args.rows:,} rows"):
+            insert_transactions(conn, user_id, args.rows)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE transactions"))
+        conn.commit()
+
+    try:
+        with engine.connect() as conn:
+            for term in TERMS:
+                params = {"q": term, "pattern": f"%{term}%", "user_id": user_id}
+                print(f"\n== q={term!r}")
+                for label, sql in (("indexed", SEARCH_SQL), ("seqscan", SEQSCAN_SQL)):
+                    if label == "seqscan":
+                        conn.execute(text("SET LOCAL enable_bitmapscan = off"))
+                    plan, elapsed = explain(conn, sql, params)
+                    summary = [
+                        line.strip()
+                        for line in plan.splitlines()
+                        if "Scan" in line or "Execution Time" in line
+                    ]
+                    print(f"  {label:<8} {elapsed:9.1f} ms")
+                    for line in plan.splitlines() if args.verbose else summary:
+                        print(f"    {line}")
+                conn.rollback()
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                delete_user(conn, user_id)
+
+
+if __name__ == "__main__":
+    main()
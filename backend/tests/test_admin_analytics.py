@@ -0,0 +1,34 @@
+"""Tests for admin access and report registration."""
+
+import uuid
+
+import pytest
+
+try:
+    from fastapi import HTTPException
+
+    from app import admin_analytics, jobs, models
+    from app.deps import require_admin
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_require_admin():
+    admin = models.User(id=uuid.uuid4(), role="admin")
+    assert require_admin(admin) is admin
+    with pytest.raises(HTTPException) as excinfo:
+        require_admin(models.User(id=uuid.uuid4(), role="student"))
+    assert excinfo.value.status_code == 403
+
+
+def test_reports_run_as_jobs():
+    assert jobs.HANDLERS["admin_analytics"] is admin_analytics.run_report_job
+    for model, _ in admin_analytics.REPORTS.values():
+        model()  # every parameter has a default
+
+
+def test_submit_rejects_unknown_kinds():
+    with pytest.raises(ValueError):
+        jobs.submit(None, uuid.uuid4(), "no-such-kind", {})
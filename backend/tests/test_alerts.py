@@ -0,0 +1,49 @@
+"""Tests for rollup keys and alert deduplication keys."""
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+try:
+    from app import models
+    from app.alerts import channels_for, dedupe_key
+    from app.rollups import Contribution, month_of
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_month_of_uses_utc():
+    east = timezone(timedelta(hours=10))
+    assert month_of(datetime(2024, 3, 1, 5, 0, tzinfo=east)) == date(2024, 2, 1)
+    assert month_of(datetime(2024, 3, 31, 23, 0)) == date(2024, 3, 1)
+
+
+def test_contribution_of_transaction():
+    transaction = models.Transaction(
+        user_id=uuid.uuid4(),
+        category_id=None,
+        type="expense",
+        amount_cents=1250,
+        occurred_at=datetime(2024, 5, 17, tzinfo=timezone.utc),
+    )
+    contribution = Contribution.of(transaction)
+    assert contribution.month == date(2024, 5, 1)
+    assert contribution.amount_cents == 1250
+    assert contribution.category_id is None
+
+
+def test_dedupe_key_is_per_month_and_channel():
+    ref = uuid.uuid4()
+    key = dedupe_key("CATEGORY_THRESHOLD", ref, date(2024, 5, 1), "email")
+    assert key == f"CATEGORY_THRESHOLD:{ref}:2024-05:email"
+    assert key != dedupe_key("CATEGORY_THRESHOLD", ref, date(2024, 6, 1), "email")
+    assert key != dedupe_key("CATEGORY_THRESHOLD", ref, date(2024, 5, 1), "sms")
+
+
+def test_channels_follow_preferences():
+    assert channels_for(None) == ["inapp", "email"]
+    preference = models.NotificationPreference(email_enabled=False, sms_enabled=True)
+    assert channels_for(preference) == ["inapp", "sms"]
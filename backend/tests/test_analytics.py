@@ -0,0 +1,75 @@
+"""Tests for the vectorized forecast math."""
+
+import uuid
+from datetime import date
+
+import pytest
+
+try:
+    import numpy as np
+
+    from app.analytics import (
+        DailyTotals,
+        forecast_month,
+        linear_trend,
+        moving_average,
+        project,
+        weekday_profile,
+    )
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def daily(*rows, start=date(2024, 6, 1)) -> DailyTotals:
+    amounts = np.array(rows, dtype=np.int64)
+    return DailyTotals([uuid.uuid4() for _ in rows], start, amounts)
+
+
+def test_moving_average():
+    amounts = np.array([[1, 2, 3, 4, 5], [0, 0, 10, 0, 0]])
+    np.testing.assert_allclose(
+        moving_average(amounts, 2), [[1.5, 2.5, 3.5, 4.5], [0, 5, 5, 0]]
+    )
+
+
+def test_linear_trend_recovers_a_line():
+    slope, intercept = linear_trend(np.array([[3, 5, 7, 9], [4, 4, 4, 4]]))
+    np.testing.assert_allclose(slope, [2, 0])
+    np.testing.assert_allclose(intercept, [3, 4])
+
+
+def test_weekday_profile_and_projection():
+    # 2024-06-03 is a Monday; spend 700 every Saturday for two weeks
+    history = daily([0, 0, 0, 0, 0, 700, 0] * 2, start=date(2024, 6, 3))
+    np.testing.assert_allclose(weekday_profile(history)[0], [0] * 5 + [700, 0])
+    # The next day is a Monday again
+    np.testing.assert_allclose(
+        project(history, 7, "weekday", 28)[0], [0] * 5 + [700, 0]
+    )
+
+
+def test_trend_projection_never_goes_negative():
+    history = daily([40, 30, 20, 10])
+    np.testing.assert_allclose(project(history, 3, "trend", 4)[0], [0, 0, 0])
+
+
+def test_forecast_month_finds_the_overspend_day():
+    # June 1-10 at 100/day; the average pace passes 2000 on day 21
+    history = daily([100] * 10, [100] * 10, [0] * 10)
+    limits = np.array([2000, np.nan, 500], dtype=np.float64)
+    forecast = forecast_month(history, limits, date(2024, 6, 10), "average", 7)
+
+    np.testing.assert_array_equal(forecast.spent, [1000, 1000, 0])
+    np.testing.assert_allclose(forecast.projected, [3000, 3000, 0])
+    np.testing.assert_array_equal(forecast.overspend_day, [21, 0, 0])
+
+
+def test_forecast_month_reports_a_limit_already_passed():
+    history = daily([0, 600, 0], start=date(2024, 5, 31))
+    forecast = forecast_month(
+        history, np.array([500.0]), date(2024, 6, 2), "average", 3
+    )
+    assert forecast.spent[0] == 600
+    assert forecast.overspend_day[0] == 1
@@ -0,0 +1,198 @@
+"""Tests for the columnar transaction archive files."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+try:
+    from app import archive
+    from app.config import settings
+    from app.transactions_router import page_of_segments
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+START = datetime(2021, 3, 1, tzinfo=timezone.utc)
+
+
+def make_row(day, amount=1000, type="expense", category_id=None, **extra):
+    values = {
+        "id": uuid.uuid4(),
+        "category_id": category_id,
+        "recurring_rule_id": None,
+        "type": type,
+        "amount_cents": amount,
+        "occurred_at": START + timedelta(days=day),
+        "created_at": START + timedelta(days=day, hours=1),
+        "description": f"Row {day}",
+        "receipt_url": None,
+        "metadata": None,
+    }
+    values.update(extra)
+    return SimpleNamespace(**values)
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path))
+    return tmp_path
+
+
+def test_columns_round_trip():
+    category = uuid.uuid4()
+    rows = [
+        make_row(0, metadata={"payment_method": "cash", "note": "café"}),
+        make_row(1, 2500, "income", category, description=None),
+    ]
+    columns = archive._to_columns(rows)
+    columns["user_id"] = uuid.uuid4()
+    selected = archive.ArchivedRows(columns, np.arange(2))
+
+    assert selected.values("id") == [row.id for row in rows]
+    assert selected.values("category_id") == [None, category]
+    assert selected.values("type") == ["expense", "income"]
+    assert selected.values("occurred_at") == [row.occurred_at for row in rows]
+    assert selected.values("metadata") == [rows[0].metadata, None]
+    assert selected.values("description") == ["Row 0", None]
+
+    out = selected[1:]
+    assert len(out) == 1 and out[0].archived
+    assert out[0].amount_cents == 2500 and out[0].user_id == columns["user_id"]
+
+
+def test_append_skips_known_rows_and_keeps_order(archive_dir):
+    user_id = uuid.uuid4()
+    first = [make_row(10), make_row(20)]
+    assert archive.append(user_id, 2021, archive._to_columns(first)) == 2
+    # A repeated run adds nothing; a new row lands in occurred_at order
+    assert archive.append(user_id, 2021, archive._to_columns(first)) == 0
+    assert archive.append(user_id, 2021, archive._to_columns([make_row(15)])) == 1
+
+    assert archive.archived_years(user_id) == [2021]
+    columns = archive.load(user_id, [2020, 2021])
+    rows = archive.ArchivedRows(columns, np.arange(3))
+    assert rows.values("description") == ["Row 10", "Row 15", "Row 20"]
+    assert archive.newest(user_id) == first[1].occurred_at
+    assert not list(archive_dir.glob("*/*.part"))
+
+
+def test_reaches_only_ranges_into_the_archive(archive_dir):
+    user_id = uuid.uuid4()
+    assert archive.reaches(user_id, None) is None
+    archive.append(user_id, 2021, archive._to_columns([make_row(5)]))
+    newest = START + timedelta(days=5)
+
+    assert archive.reaches(user_id, None) == newest
+    assert archive.reaches(user_id, datetime(2021, 3, 2)) == newest
+    assert archive.reaches(user_id, datetime(2021, 4, 1)) is None
+
+
+def test_order_by_category_puts_nulls_last():
+    a, b = sorted([uuid.uuid4(), uuid.uuid4()], key=str)
+    rows = [make_row(0, category_id=b), make_row(1), make_row(2, category_id=a)]
+    selected = archive.ArchivedRows(archive._to_columns(rows), np.arange(3))
+
+    ascending = selected.order_by("category_id")
+    assert ascending.values("category_id") == [a, b, None]
+    descending = selected.order_by("category_id", descending=True)
+    assert descending.values("category_id") == [None, b, a]
+    by_amount = selected.where([True, False, True]).order_by("amount_cents")
+    assert len(by_amount) == 2
+
+
+def test_page_of_segments_spans_segments():
+    segments = [[1, 2, 3], lambda: [4, 5], [6, 7, 8, 9]]
+
+    assert page_of_segments(segments, 0, 4) == [1, 2, 3, 4]
+    assert page_of_segments(segments, 4, 4) == [5, 6, 7, 8]
+    assert page_of_segments(segments, 8, 4) == [9]
+    assert page_of_segments(segments, 12, 4) == []
+
+
+def test_recategorize_rewrites_matching_rows(archive_dir):
+    user_id, old, new = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    rows = [make_row(0, category_id=old), make_row(1), make_row(400, category_id=old)]
+    archive.append(user_id, 2021, archive._to_columns(rows[:2]))
+    archive.append(user_id, 2022, archive._to_columns(rows[2:]))
+
+    assert archive.recategorize(user_id, old, new) == 2
+    assert archive.recategorize(user_id, old, new) == 0
+    columns = archive.load(user_id, [2021, 2022])
+    selected = archive.ArchivedRows(columns, np.arange(3))
+    assert selected.values("category_id") == [new, None, new]
+
+
+def test_staged_rows_are_invisible_until_published(archive_dir):
+    user_id, partition = uuid.uuid4(), "transactions_y2021m03"
+    archive.append(user_id, 2021, archive._to_columns([make_row(1)]))
+    staged = [make_row(2), make_row(3)]
+
+    assert archive.append(user_id, 2021, archive._to_columns(staged), partition) == 2
+    assert len(archive.load(user_id, [2021])["id"]) == 1
+    archive.discard(partition)
+    assert archive.publish(partition) == 0
+
+    archive.append(user_id, 2021, archive._to_columns(staged), partition)
+    assert archive.publish(partition) == 1
+    assert len(archive.load(user_id, [2021])["id"]) == 3
+    assert [path.name for path in (archive_dir / str(user_id)).iterdir()] == [
+        "2021.npz"
+    ]
+
+
+def test_count_includes_every_year(archive_dir):
+    user_id, category = uuid.uuid4(), uuid.uuid4()
+    archive.append(
+        user_id, 2021, archive._to_columns([make_row(0, category_id=category)])
+    )
+    archive.append(
+        user_id,
+        2022,
+        archive._to_columns([make_row(400, category_id=category), make_row(401)]),
+    )
+
+    assert archive.count(user_id, category) == 2
+    assert archive.count(user_id, uuid.uuid4()) == 0
+
+
+def test_recategorize_also_rewrites_staged_files(archive_dir):
+    user_id, old, new = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    partition = "transactions_y2021m04"
+    archive.append(user_id, 2021, archive._to_columns([make_row(0, category_id=old)]))
+    archive.append(
+        user_id, 2021, archive._to_columns([make_row(31, category_id=old)]), partition
+    )
+
+    assert archive.recategorize(user_id, old, new) == 1  # live rows only
+    archive.publish(partition)
+    assert archive.count(user_id, new) == 2
+
+
+def test_select_reads_the_utc_year_of_offset_bounds(archive_dir):
+    user_id = uuid.uuid4()
+    new_years_eve = datetime(2022, 12, 31, 22, tzinfo=timezone.utc)
+    new_year = datetime(2023, 1, 1, 1, tzinfo=timezone.utc)
+    archive.append(
+        user_id, 2022, archive._to_columns([make_row(0, occurred_at=new_years_eve)])
+    )
+    archive.append(
+        user_id, 2023, archive._to_columns([make_row(1, occurred_at=new_year)])
+    )
+    db = SimpleNamespace(query=lambda *_: SimpleNamespace(filter=lambda *_: []))
+    plus_five = timezone(timedelta(hours=5))
+    minus_five = timezone(timedelta(hours=-5))
+
+    # 02:00+05:00 on Jan 1 is still Dec 31 in UTC, so the 2022 file counts
+    start = datetime(2023, 1, 1, 2, tzinfo=plus_five)
+    rows = archive.select(db, user_id, start=start)
+    assert rows.values("occurred_at") == [new_years_eve, new_year]
+    assert archive.reaches(user_id, start) == new_year
+
+    # 23:30-05:00 on Dec 31 is already Jan 1 in UTC, so the 2023 file counts
+    end = datetime(2022, 12, 31, 23, 30, tzinfo=minus_five)
+    rows = archive.select(db, user_id, end=end)
+    assert rows.values("occurred_at") == [new_years_eve, new_year]
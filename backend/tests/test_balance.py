@@ -0,0 +1,33 @@
+"""Tests for the running balance bucket arithmetic."""
+
+from datetime import date
+
+import pytest
+
+try:
+    from app.transactions_router import bucket_start, count_buckets, step_buckets
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_bucket_start():
+    day = date(2024, 12, 5)  # a Thursday
+    assert bucket_start(day, "day") == day
+    assert bucket_start(day, "week") == date(2024, 12, 2)
+    assert bucket_start(day, "month") == date(2024, 12, 1)
+
+
+def test_step_buckets_across_year_boundaries():
+    assert step_buckets(date(2024, 12, 1), "month", 1) == date(2025, 1, 1)
+    assert step_buckets(date(2024, 1, 1), "month", -23) == date(2022, 2, 1)
+    assert step_buckets(date(2024, 12, 30), "week", 1) == date(2025, 1, 6)
+    assert step_buckets(date(2024, 3, 1), "day", -1) == date(2024, 2, 29)
+
+
+def test_count_buckets_is_inclusive():
+    assert count_buckets(date(2024, 1, 1), date(2024, 1, 1), "day") == 1
+    assert count_buckets(date(2024, 1, 1), date(2024, 12, 31), "day") == 366
+    assert count_buckets(date(2024, 12, 2), date(2025, 1, 6), "week") == 6
+    assert count_buckets(date(2023, 11, 1), date(2024, 2, 1), "month") == 4
@@ -0,0 +1,59 @@
+"""Tests for POST /api/batch limits and costs."""
+
+import pytest
+
+try:
+    from fastapi import HTTPException
+    from pydantic import ValidationError
+
+    from app.batch_router import check_limits, request_cost, route_path
+    from app.config import settings
+    from app.schemas import BatchRequestItem
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def item(path, method="GET"):
+    return BatchRequestItem(method=method, path=path)
+
+
+def test_costs_by_method_and_path():
+    assert request_cost(item("/api/categories")) == 1
+    assert request_cost(item("/api/transactions", "POST")) == 2
+    assert request_cost(item("/api/transactions/aggregates?group_by=category")) == 5
+    assert request_cost(item("/api//transactions/./balance/")) == 5
+
+
+def test_batch_within_limits_is_accepted():
+    check_limits([item("/api/categories"), item("/api/transactions?limit=10")])
+
+
+@pytest.mark.parametrize(
+    "items",
+    [
+        [item("/api/categories")] * (settings.batch_max_requests + 1),
+        [item("/api/sync")] * (settings.batch_max_cost // 5 + 1),
+        [item("/api/batch", "POST")],
+        [item("/api/events")],
+        [item("/api//batch", "POST")],
+        [item("/api/auth/../batch", "POST")],
+        [item("/api/./events/")],
+        [item("/api/../metrics")],
+    ],
+)
+def test_batch_over_limits_is_rejected(items):
+    with pytest.raises(HTTPException) as exc:
+        check_limits(items)
+    assert exc.value.status_code == 400
+
+
+def test_paths_outside_the_api_are_rejected():
+    with pytest.raises(ValidationError):
+        item("/metrics")
+
+
+def test_route_path_resolves_dot_segments():
+    assert route_path("/api/auth/../categories/?type=income") == "/api/categories"
+    assert route_path("/api//sync") == "/api/sync"
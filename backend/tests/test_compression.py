@@ -0,0 +1,88 @@
+"""Tests for the response compression middleware."""
+
+import pytest
+
+try:
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, Response
+    from fastapi.testclient import TestClient
+
+    from app.compression import (
+        CompressionMiddleware,
+        is_compressible,
+        negotiate_encoding,
+        no_compression,
+    )
+except ImportError:  # pragma: no cover
+    pytest.skip("FastAPI not available in test environment", allow_module_level=True)
+
+
+LARGE = [{"id": i, "description": "Groceries at the market"} for i in range(200)]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/large")
+    def large():
+        return JSONResponse(LARGE)
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/image")
+    def image():
+        return Response(b"\x89PNG" + b"\x00" * 5000, media_type="image/png")
+
+    @app.get("/exempt")
+    @no_compression
+    def exempt():
+        return JSONResponse(LARGE)
+
+    return TestClient(app)
+
+
+def test_large_json_is_gzipped(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.json() == LARGE
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_images_are_passed_through(client):
+    response = client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content.startswith(b"\x89PNG")
+
+
+def test_route_opt_out(client):
+    response = client.get("/exempt", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_identity_only_client(client):
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("*") in ("br", "gzip")
+
+
+def test_is_compressible():
+    assert is_compressible("application/json")
+    assert is_compressible("image/svg+xml")
+    assert not is_compressible("image/jpeg")
+    assert not is_compressible("application/pdf")
+    assert not is_compressible("text/event-stream; charset=utf-8")
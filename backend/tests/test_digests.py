@@ -0,0 +1,45 @@
+"""Tests for weekly digest scheduling and rendering."""
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+try:
+    from app.channels import Message, render
+    from app.digests import DIGEST, last_complete_week
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_last_complete_week_is_the_monday_before_this_week():
+    monday = date(2024, 6, 10)
+    for offset in range(7):
+        now = datetime(2024, 6, 10, 12, tzinfo=timezone.utc) + timedelta(days=offset)
+        assert last_complete_week(now) == date(2024, 6, 3) == monday - timedelta(7)
+
+
+def test_last_complete_week_uses_utc():
+    # Monday 01:00 in UTC+3 is still Sunday in UTC
+    now = datetime(2024, 6, 10, 1, tzinfo=timezone(timedelta(hours=3)))
+    assert last_complete_week(now) == date(2024, 5, 27)
+
+
+def test_render_digest_lists_categories_with_deltas():
+    payload = {
+        "week": "2024-06-03",
+        "total_cents": 12500,
+        "previous_total_cents": 10000,
+        "categories": [
+            {"name": "Food", "total_cents": 10000, "delta_cents": 3000},
+            {"name": "Uncategorized", "total_cents": 2500, "delta_cents": -500},
+        ],
+    }
+    message = Message(uuid.uuid4(), uuid.uuid4(), DIGEST, "email", payload)
+    subject, body = render(message)
+    assert "2024-06-03" in subject
+    assert "$125.00" in body and "$100.00" in body
+    assert "Food: $100.00 (+$30.00" in body
+    assert "Uncategorized: $25.00 (-$5.00" in body
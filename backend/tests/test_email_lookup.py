@@ -0,0 +1,67 @@
+"""Tests for case-insensitive email lookups (no database needed)."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    from fastapi import HTTPException
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.orm import Query
+    from sqlalchemy.schema import CreateIndex
+    from starlette.requests import Request
+
+    from app import auth_router, models, schemas
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+STORED = "mixed.case@example.com"
+
+
+def fake_db(executed: list):
+    """A session whose queries are compiled and answered from ``STORED``."""
+
+    class CapturingQuery(Query):
+        def first(self):
+            sql = self.statement.compile(dialect=postgresql.dialect())
+            executed.append(sql)
+            return models.User(email=STORED) if STORED in sql.params.values() else None
+
+    return SimpleNamespace(query=lambda *entities: CapturingQuery(entities))
+
+
+def test_lookup_compares_lowercased_email():
+    executed = []
+
+    user = auth_router._find_user_by_email(fake_db(executed), "Mixed.Case@Example.COM")
+
+    assert user is not None and user.email == STORED
+    [sql] = executed
+    assert "WHERE lower(users.email) = %(lower_1)s" in str(sql)
+    assert sql.params["lower_1"] == STORED
+
+
+def test_register_rejects_a_mixed_case_duplicate():
+    executed = []
+    body = schemas.RegisterRequest(email="MIXED.Case@example.com", password="x" * 12)
+    request = Request({"type": "http", "method": "POST", "headers": [], "client": None})
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(auth_router.register(request, body, fake_db(executed)))
+
+    assert exc_info.value.status_code == 409
+    assert executed[0].params["lower_1"] == STORED
+
+
+def test_unique_index_is_on_lower_email():
+    index = next(
+        index
+        for index in models.User.__table__.indexes
+        if index.name == "ix_users_email_lower"
+    )
+    ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+
+    assert ddl == "CREATE UNIQUE INDEX ix_users_email_lower ON users (lower(email))"
@@ -0,0 +1,61 @@
+"""Tests for the live update broker and SSE formatting."""
+
+import asyncio
+import json
+import uuid
+
+import pytest
+
+try:
+    from app.events import RESYNC, LocalBroker, Subscription
+    from app.events_router import format_event
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_full_queue_is_replaced_by_a_resync():
+    async def scenario():
+        subscription = Subscription(uuid.uuid4(), maxsize=2)
+        for n in range(3):
+            subscription.put({"type": "transaction.created", "n": n})
+        return [
+            subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())
+        ]
+
+    assert asyncio.run(scenario()) == [RESYNC]
+
+
+def test_publish_reaches_only_the_users_streams():
+    alice, bob = uuid.uuid4(), uuid.uuid4()
+
+    async def scenario():
+        broker = LocalBroker(queue_size=10)
+        await broker.start()
+        a1, a2, b = (
+            broker.subscribe(alice),
+            broker.subscribe(alice),
+            broker.subscribe(bob),
+        )
+        # Publishers on the threadpool hand events to the loop thread
+        await asyncio.to_thread(broker.publish, alice, {"type": "category.created"})
+        events = await asyncio.wait_for(asyncio.gather(a1.get(), a2.get()), 1)
+        broker.unsubscribe(a1)
+        broker.unsubscribe(a2)
+        broker.publish(alice, {"type": "category.deleted"})
+        await asyncio.sleep(0)
+        return events, b.queue.empty(), broker._subscriptions
+
+    events, bob_empty, remaining = asyncio.run(scenario())
+    assert events == [{"type": "category.created"}] * 2
+    assert bob_empty
+    assert list(remaining) == [bob]
+
+
+def test_format_event():
+    event = {"type": "envelope.usage", "percent_used": 82.0}
+    name, data, end = format_event(event).split("\n", 2)
+    assert name == "event: envelope.usage"
+    assert json.loads(data.removeprefix("data: ")) == event
+    assert end == "\n"
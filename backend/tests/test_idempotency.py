@@ -0,0 +1,70 @@
+"""Tests for Idempotency-Key fingerprints and replays."""
+
+import asyncio
+import uuid
+
+import pytest
+
+try:
+    from fastapi import HTTPException
+    from starlette.requests import Request
+
+    from app import models, schemas
+    from app.idempotency import (
+        Idempotency,
+        IdempotentReplay,
+        _replay,
+        request_fingerprint,
+    )
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def make_request(method, path, body):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    return Request(scope, receive)
+
+
+def fingerprint(method, path, body):
+    return asyncio.run(request_fingerprint(make_request(method, path, body)))
+
+
+def test_fingerprint_covers_method_path_and_body():
+    base = fingerprint("POST", "/api/transactions", b'{"amount_cents": 5}')
+    assert base == fingerprint("POST", "/api/transactions", b'{"amount_cents": 5}')
+    assert base != fingerprint("POST", "/api/transactions", b'{"amount_cents": 6}')
+    assert base != fingerprint("POST", "/api/sync", b'{"amount_cents": 5}')
+    assert base != fingerprint("PUT", "/api/transactions", b'{"amount_cents": 5}')
+
+
+def test_same_request_replays_stored_response():
+    record = models.IdempotencyKey(
+        request_hash="abc", status_code=201, response={"id": "1"}
+    )
+    with pytest.raises(IdempotentReplay) as exc:
+        _replay(record, "abc")
+    assert (exc.value.status_code, exc.value.content) == (201, {"id": "1"})
+
+
+def test_reused_key_for_another_request_is_rejected():
+    record = models.IdempotencyKey(request_hash="abc", status_code=201)
+    with pytest.raises(HTTPException) as exc:
+        _replay(record, "def")
+    assert exc.value.status_code == 422
+
+
+def test_save_stores_json_and_is_a_no_op_without_a_key():
+    Idempotency().save(201, {"id": "1"})  # no key sent: nothing to store
+
+    record = models.IdempotencyKey()
+    result = schemas.SyncChangeResult(
+        entity="transaction", id=uuid.uuid4(), status="applied"
+    )
+    Idempotency(record).save(200, schemas.SyncPushResponse(results=[result]))
+    assert record.status_code == 200
+    assert record.response["results"][0]["id"] == str(result.id)
@@ -0,0 +1,67 @@
+"""Tests for the index advisor's plan analysis."""
+
+import pytest
+
+try:
+    from app.index_advisor import analyze_plan
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def _scan(node_type, relation, **extra):
+    return {"Node Type": node_type, "Relation Name": relation, **extra}
+
+
+def test_flags_large_seq_scans_and_sorts():
+    plan = {
+        "Node Type": "Limit",
+        "Total Cost": 7807.0,
+        "Plans": [
+            {
+                "Node Type": "Sort",
+                "Plan Rows": 41671,
+                "Sort Key": ["transactions.amount_cents DESC"],
+                "Plans": [
+                    {
+                        "Node Type": "Append",
+                        "Plans": [
+                            _scan("Seq Scan", "transactions_y2024m11"),
+                            _scan("Seq Scan", "transactions_y2024m12"),
+                            _scan("Seq Scan", "transactions_default"),
+                        ],
+                    }
+                ],
+            }
+        ],
+    }
+    table_rows = {
+        "transactions_y2024m11": 5000.0,
+        "transactions_y2024m12": 4000.0,
+        "transactions_default": 0.0,
+    }
+
+    report = analyze_plan(plan, table_rows, min_rows=1000)
+
+    assert report.cost == 7807.0
+    assert report.flags == [
+        "Seq Scan on 2 partition(s), ~9000 rows",
+        "Sort (transactions.amount_cents DESC) of ~41671 rows",
+    ]
+
+
+def test_index_scans_are_recorded_not_flagged():
+    plan = {
+        "Node Type": "Index Only Scan",
+        "Relation Name": "transactions_y2024m12",
+        "Index Name": "transactions_y2024m12_user_occurred_covering_idx",
+        "Total Cost": 51.0,
+    }
+
+    report = analyze_plan(plan, {"transactions_y2024m12": 5000.0}, min_rows=1000)
+
+    assert report.flags == []
+    assert report.access == [
+        "Index Only Scan using transactions_y2024m12_user_occurred_covering_idx"
+    ]
@@ -0,0 +1,138 @@
+"""Tests for outbox delivery decisions (no database needed)."""
+
+import asyncio
+import hashlib
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    from app.channels import (
+        PASSWORD_RESET,
+        MemoryChannel,
+        Message,
+        PermanentDeliveryError,
+        render,
+    )
+    from app.outbox import (
+        MARK_FAILED,
+        REDACT_KINDS,
+        Outcome,
+        OutboxWorker,
+        backoff_seconds,
+        quiet_until,
+    )
+    from app.security import new_reset_token
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+NIGHT = {"start": "22:00", "end": "07:00"}
+
+
+def at(hour, minute=0):
+    return datetime(2024, 6, 3, hour, minute, tzinfo=timezone.utc)
+
+
+def message(channel="email", kind="LOW_BALANCE", attempts=1, quiet_hours=None):
+    return Message(
+        event_id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        kind=kind,
+        channel=channel,
+        payload={"balance_cents": 100, "threshold_cents": 500},
+        attempts=attempts,
+        email="user@example.com",
+        quiet_hours=quiet_hours,
+    )
+
+
+def worker(clock, **channels):
+    return OutboxWorker(
+        channels, bind=None, max_attempts=3, backoff_base=10, clock=lambda: clock
+    )
+
+
+def test_quiet_until_wraps_midnight():
+    assert quiet_until(NIGHT, at(23)) == datetime(2024, 6, 4, 7, tzinfo=timezone.utc)
+    assert quiet_until(NIGHT, at(3)) == at(7)
+    assert quiet_until(NIGHT, at(12)) is None
+    assert quiet_until({"start": "01:00", "end": "05:00"}, at(2)) == at(5)
+
+
+def test_quiet_until_uses_timezone_and_ignores_bad_settings():
+    paris = {**NIGHT, "timezone": "Europe/Paris"}  # UTC+2 in June
+    assert quiet_until(paris, at(21)) == datetime(2024, 6, 4, 5, tzinfo=timezone.utc)
+    assert quiet_until({"start": "late"}, at(23)) is None
+    assert quiet_until(None, at(23)) is None
+
+
+def test_backoff_doubles_and_caps():
+    assert [backoff_seconds(n, 30, 100) for n in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+
+def test_quiet_hours_defer_email_but_not_inapp_or_resets():
+    email = MemoryChannel("email")
+    inapp = MemoryChannel("inapp")
+    w = worker(at(23), email=email, inapp=inapp)
+
+    deferred = asyncio.run(w.deliver(message(quiet_hours=NIGHT)))
+    assert deferred.status == "deferred"
+    assert deferred.retry_at == datetime(2024, 6, 4, 7, tzinfo=timezone.utc)
+
+    assert asyncio.run(w.deliver(message("inapp", quiet_hours=NIGHT))).status == "sent"
+    reset = message(kind=PASSWORD_RESET, quiet_hours=NIGHT)
+    assert asyncio.run(w.deliver(reset)).status == "sent"
+    assert email.sent == [reset]
+
+
+def test_transient_failures_retry_then_fail():
+    email = MemoryChannel("email", fail_times=5)
+    w = worker(at(12), email=email)
+
+    retry = asyncio.run(w.deliver(message(attempts=2)))
+    assert retry.status == "retry"
+    assert (retry.retry_at - at(12)).total_seconds() == 20
+    assert "unavailable" in retry.error
+
+    assert asyncio.run(w.deliver(message(attempts=3))).status == "failed"
+
+
+def test_unknown_channel_fails_permanently():
+    outcome = asyncio.run(worker(at(12)).deliver(message("pigeon")))
+    assert outcome.status == "failed"
+
+
+def test_reset_link_is_built_from_the_token_id():
+    token_id, token_hash, _ = new_reset_token()
+    reset = message(kind=PASSWORD_RESET)
+    reset.payload = {"reset_token_id": str(token_id)}
+
+    _, body = render(reset)
+    token = body.split("token=")[1].split()[0]
+    assert hashlib.sha256(token.encode()).hexdigest() == token_hash
+    assert token not in str(reset.payload)
+
+    reset.payload = None  # redacted
+    with pytest.raises(PermanentDeliveryError):
+        render(reset)
+
+
+def test_failed_resets_are_redacted():
+    executed = []
+
+    class Bind:
+        @contextmanager
+        def begin(self):
+            yield SimpleNamespace(execute=lambda *args: executed.append(args))
+
+    w = OutboxWorker({}, bind=Bind())
+    w.record([Outcome(message(kind=PASSWORD_RESET), "failed", error="bounced")])
+
+    [(statement, params)] = executed
+    assert statement is MARK_FAILED and "payload = CASE" in statement.text
+    assert params[0]["redact"] == list(REDACT_KINDS)
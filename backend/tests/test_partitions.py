@@ -0,0 +1,100 @@
+"""Tests for monthly partition helpers."""
+
+from datetime import date
+
+import pytest
+
+try:
+    from app.partitions import add_months, create_partition, parse_month, partition_name
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+@pytest.mark.parametrize(
+    "month, n, expected",
+    [
+        (date(2024, 12, 1), 1, date(2025, 1, 1)),
+        (date(2024, 1, 1), -1, date(2023, 12, 1)),
+        (date(2024, 3, 1), 24, date(2026, 3, 1)),
+        (date(2024, 3, 1), 0, date(2024, 3, 1)),
+    ],
+)
+def test_add_months(month, n, expected):
+    assert add_months(month, n) == expected
+
+
+def test_partition_names_sort_chronologically():
+    months = [date(2023, 11, 1), date(2024, 2, 1), date(2024, 10, 1)]
+    names = [partition_name(m) for m in months]
+
+    assert names[0] == "transactions_y2023m11"
+    assert names == sorted(names)
+
+
+def test_parse_month():
+    assert parse_month("2024-07") == date(2024, 7, 1)
+    with pytest.raises(ValueError):
+        parse_month("July 2024")
+
+
+class FakeConnection:
+    """Records statements; answers the existence checks with canned values."""
+
+    def __init__(self, exists: bool, stray: bool):
+        self.answers = {"SELECT to_regclass": exists, "SELECT EXISTS": stray}
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if sql.startswith("SELECT column_name"):
+            return [("id",), ("occurred_at",)]
+        answer = next(
+            (value for prefix, value in self.answers.items() if sql.startswith(prefix)),
+            None,
+        )
+        return FakeResult(answer)
+
+
+class FakeResult:
+    rowcount = 3
+
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+def test_create_partition_moves_stray_rows_out_of_the_default():
+    conn = FakeConnection(exists=False, stray=True)
+
+    assert create_partition(conn, date(2024, 7, 1))
+
+    assert conn.statements[2:] == [
+        "ALTER TABLE transactions DETACH PARTITION transactions_default",
+        "CREATE TABLE transactions_y2024m07 PARTITION OF transactions "
+        "FOR VALUES FROM ('2024-07-01 00:00+00') TO ('2024-08-01 00:00+00')",
+        conn.statements[4],
+        "WITH moved AS (DELETE FROM transactions_default "
+        "WHERE occurred_at >= :start AND occurred_at < :end "
+        "RETURNING id, occurred_at) "
+        "INSERT INTO transactions (id, occurred_at) SELECT id, occurred_at FROM moved",
+        "ALTER TABLE transactions ATTACH PARTITION transactions_default DEFAULT",
+    ]
+    assert conn.statements[4].startswith("SELECT column_name")
+
+
+def test_create_partition_without_stray_rows_only_creates():
+    conn = FakeConnection(exists=False, stray=False)
+
+    assert create_partition(conn, date(2024, 7, 1))
+    assert [sql.split(" PARTITION")[0] for sql in conn.statements[2:]] == [
+        "CREATE TABLE transactions_y2024m07"
+    ]
+
+    existing = FakeConnection(exists=True, stray=True)
+    assert not create_partition(existing, date(2024, 7, 1))
+    assert len(existing.statements) == 1
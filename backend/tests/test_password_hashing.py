@@ -0,0 +1,50 @@
+"""Tests for the bounded bcrypt pool and rehash-on-login checks."""
+
+import asyncio
+import json
+
+import pytest
+
+try:
+    from passlib.hash import bcrypt
+
+    from app import security
+    from app.config import settings
+    from app.main import password_hashing_busy_handler
+    from app.metrics import metrics
+    from app.security import PasswordHashingBusy
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_password_needs_rehash_when_cost_changes(monkeypatch):
+    monkeypatch.setattr(security, "password_hasher", bcrypt.using(rounds=5))
+    current = security.hash_password("correct horse")
+
+    assert not security.password_needs_rehash(current)
+    assert security.password_needs_rehash(bcrypt.using(rounds=4).hash("x"))
+    assert security.verify_password("correct horse", current)
+
+
+def test_hash_pool_runs_work_and_releases_its_slot():
+    assert asyncio.run(security._run_on_hash_pool(lambda a, b: a + b, 2, 3)) == 5
+    assert security._hash_pending == 0
+
+
+def test_full_hash_pool_is_rejected_with_503(monkeypatch):
+    monkeypatch.setattr(settings, "password_hash_max_pending", 0)
+    rejected = metrics.snapshot()["counters"].get("password_hash.rejected", 0)
+
+    with pytest.raises(PasswordHashingBusy):
+        asyncio.run(security.hash_password_async("secret"))
+    with pytest.raises(PasswordHashingBusy):
+        asyncio.run(security.verify_password_async("secret", "$2b$04$x"))
+    assert metrics.snapshot()["counters"]["password_hash.rejected"] == rejected + 2
+    assert security._hash_pending == 0
+
+    response = asyncio.run(password_hashing_busy_handler(None, PasswordHashingBusy()))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert "busy" in json.loads(response.body)["detail"]
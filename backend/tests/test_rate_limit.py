@@ -0,0 +1,106 @@
+"""Tests for the sliding-window rate limiter."""
+
+import pytest
+
+try:
+    from fastapi import HTTPException
+
+    from app import rate_limit
+    from app.rate_limit import MemoryBackend, RateLimit, RateLimiter
+except ImportError:  # pragma: no cover
+    pytest.skip("FastAPI not available in test environment", allow_module_level=True)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeRequest:
+    class client:
+        host = "203.0.113.7"
+
+
+def test_parse_rate_limit():
+    assert RateLimit.parse("5/minute") == RateLimit(limit=5, window=60)
+    assert RateLimit.parse("100/Hour") == RateLimit(limit=100, window=3600)
+    with pytest.raises(ValueError):
+        RateLimit.parse("lots/fortnight")
+
+
+def test_allows_up_to_limit_then_rejects():
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryBackend(), clock=clock)
+    rule = RateLimit(limit=3, window=60)
+
+    assert [limiter.check("k", rule) for _ in range(3)] == [None, None, None]
+    retry_after = limiter.check("k", rule)
+    assert retry_after is not None and 0 < retry_after <= 60
+
+
+def test_keys_are_independent():
+    limiter = RateLimiter(MemoryBackend(), clock=FakeClock())
+    rule = RateLimit(limit=1, window=60)
+
+    assert limiter.check("a", rule) is None
+    assert limiter.check("b", rule) is None
+    assert limiter.check("a", rule) is not None
+
+
+def test_previous_window_is_weighted():
+    clock = FakeClock(now=6000.0)  # start of a 60s window
+    limiter = RateLimiter(MemoryBackend(), clock=clock)
+    rule = RateLimit(limit=4, window=60)
+
+    for _ in range(4):
+        assert limiter.check("k", rule) is None
+
+    # 15s into the next window, 75% of the previous 4 hits still count
+    clock.now += 75
+    assert limiter.check("k", rule) is None
+    assert limiter.check("k", rule) is not None
+
+    # Two full windows later everything has expired
+    clock.now += 120
+    assert limiter.check("k", rule) is None
+
+
+def test_enforce_rate_limit_raises_429(monkeypatch):
+    limiter = RateLimiter(MemoryBackend(), clock=FakeClock())
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    monkeypatch.setitem(
+        rate_limit.LIMITS, "login", (RateLimit(100, 60), RateLimit(2, 60))
+    )
+
+    rate_limit.enforce_rate_limit(FakeRequest, "login", email="A@example.com")
+    rate_limit.enforce_rate_limit(FakeRequest, "login", email="a@example.com")
+    with pytest.raises(HTTPException) as excinfo:
+        rate_limit.enforce_rate_limit(FakeRequest, "login", email="a@example.com")
+
+    assert excinfo.value.status_code == 429
+    assert int(excinfo.value.headers["Retry-After"]) >= 1
+
+
+def test_minute_traffic_does_not_evict_hour_counters():
+    clock = FakeClock()
+    backend = MemoryBackend()
+    limiter = RateLimiter(backend, clock=clock)
+    per_hour, per_minute = RateLimit(3, 3600), RateLimit(20, 60)
+    for _ in range(3):
+        assert limiter.check("password_reset:email:victim", per_hour) is None
+    assert limiter.check("password_reset:email:victim", per_hour) is not None
+
+    # Many short-window keys come and go while the hour counter is live
+    for n in range(10):
+        clock.now += 30
+        limiter.check(f"login:ip:{n}", per_minute)
+
+    assert limiter.check("password_reset:email:victim", per_hour) is not None
+    # Minute counters expire two minutes after their window; the hour one stays
+    assert len(backend) == 1 + 4
+    clock.now += 2 * 3600
+    limiter.check("login:ip:last", per_minute)
+    assert len(backend) == 1
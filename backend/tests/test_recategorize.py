@@ -0,0 +1,40 @@
+"""Tests for bulk recategorization requests."""
+
+import uuid
+
+import pytest
+
+try:
+    from pydantic import ValidationError
+
+    from app import rollups, schemas
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_filter_requires_a_condition():
+    with pytest.raises(ValidationError):
+        schemas.RecategorizeFilter()
+    with pytest.raises(ValidationError):
+        schemas.RecategorizeRequest(filter={}, category_id=None)
+    assert schemas.RecategorizeFilter(uncategorized=True).uncategorized
+    assert schemas.RecategorizeFilter(metadata={"payment_method": "cash"}).metadata
+
+
+def test_filter_rejects_category_and_uncategorized():
+    with pytest.raises(ValidationError):
+        schemas.RecategorizeFilter(category_id=uuid.uuid4(), uncategorized=True)
+
+
+def test_request_requires_explicit_target():
+    # Moving transactions to "no category" must be asked for with null
+    with pytest.raises(ValidationError):
+        schemas.RecategorizeRequest(filter={"type": "expense"})
+    request = schemas.RecategorizeRequest(filter={"type": "expense"}, category_id=None)
+    assert request.category_id is None
+
+
+def test_move_without_rows_touches_nothing():
+    assert rollups.move(None, uuid.uuid4(), [], uuid.uuid4()) == []
@@ -0,0 +1,158 @@
+"""Tests for recurring rule schedules."""
+
+import uuid
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    from fastapi import HTTPException
+
+    from app import models, recurrence, schemas
+    from app.config import settings
+    from app.recurrence import format_rrule, occurrence, parse_rrule, reset_schedule
+    from app.recurring_router import apply_rule_body
+    from app.replicas import RecentWriters
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def make_rule(rrule: str, starts_on: date) -> models.RecurringRule:
+    schedule = parse_rrule(rrule)
+    return models.RecurringRule(
+        freq=schedule.freq,
+        interval=schedule.interval,
+        count=schedule.count,
+        until=schedule.until,
+        starts_on=starts_on,
+    )
+
+
+def test_parse_rrule():
+    schedule = parse_rrule("RRULE:FREQ=WEEKLY;INTERVAL=2;UNTIL=20250301T000000Z")
+    assert schedule.freq == "WEEKLY"
+    assert schedule.interval == 2
+    assert schedule.until == date(2025, 3, 1)
+    assert schedule.count is None
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "",
+        "FREQ=HOURLY",
+        "INTERVAL=2",
+        "FREQ=DAILY;BYDAY=MO",
+        "FREQ=DAILY;INTERVAL=0",
+        "FREQ=DAILY;COUNT=3;UNTIL=20250101",
+        "FREQ=DAILY;UNTIL=20251301",
+    ],
+)
+def test_parse_rrule_rejects_unsupported_rules(value):
+    with pytest.raises(ValueError):
+        parse_rrule(value)
+
+
+def test_format_rrule_round_trips():
+    rule = make_rule("FREQ=MONTHLY;INTERVAL=3;COUNT=4", date(2024, 1, 1))
+    assert format_rrule(rule) == "FREQ=MONTHLY;INTERVAL=3;COUNT=4"
+    assert format_rrule(make_rule("freq=daily", date(2024, 1, 1))) == "FREQ=DAILY"
+
+
+def test_monthly_occurrences_clamp_to_month_end():
+    rule = make_rule("FREQ=MONTHLY", date(2024, 1, 31))
+    assert [occurrence(rule, k) for k in range(4)] == [
+        date(2024, 1, 31),
+        date(2024, 2, 29),
+        date(2024, 3, 31),
+        date(2024, 4, 30),
+    ]
+    yearly = make_rule("FREQ=YEARLY", date(2024, 2, 29))
+    assert occurrence(yearly, 1) == date(2025, 2, 28)
+    assert occurrence(yearly, 4) == date(2028, 2, 29)
+
+
+def test_count_and_until_end_the_schedule():
+    rule = make_rule("FREQ=DAILY;COUNT=2", date(2024, 1, 1))
+    assert occurrence(rule, 1) == date(2024, 1, 2)
+    assert occurrence(rule, 2) is None
+
+    rule = make_rule("FREQ=WEEKLY;UNTIL=20240115", date(2024, 1, 1))
+    assert occurrence(rule, 2) == date(2024, 1, 15)
+    assert occurrence(rule, 3) is None
+
+
+def test_reset_schedule_continues_after_high_water_mark():
+    rule = make_rule("FREQ=WEEKLY", date(2024, 1, 1))
+    reset_schedule(rule)
+    assert (rule.generated_count, rule.next_occurrence_on) == (0, date(2024, 1, 1))
+
+    rule.materialized_through = date(2024, 1, 20)
+    reset_schedule(rule)
+    assert (rule.generated_count, rule.next_occurrence_on) == (3, date(2024, 1, 22))
+
+    rule.count = 3
+    reset_schedule(rule)
+    assert rule.next_occurrence_on is None
+
+
+def test_starts_on_is_bounded_unless_unchanged():
+    today = datetime.now(timezone.utc).date()
+    too_early = today - timedelta(days=settings.recurring_max_backfill_days + 1)
+    body = schemas.RecurringRuleCreate(
+        rrule="FREQ=DAILY", starts_on=too_early, type="expense", amount_cents=100
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        apply_rule_body(None, None, models.RecurringRule(), body)
+    assert exc_info.value.status_code == 400
+
+    # An existing rule keeps its start date through an update
+    rule = models.RecurringRule(starts_on=too_early)
+    apply_rule_body(None, None, rule, body)
+    assert rule.starts_on == too_early
+
+
+@pytest.fixture
+def offline_catch_up(monkeypatch):
+    """Run ``catch_up`` without a database; set ``created`` to fake new rows."""
+    state = SimpleNamespace(writers=RecentWriters(), created=0)
+    db = SimpleNamespace(commit=lambda: None)
+    due = SimpleNamespace(
+        filter=lambda *_: due, with_for_update=lambda **_: due, all=lambda: []
+    )
+    monkeypatch.setattr(recurrence, "recent_writers", state.writers)
+    monkeypatch.setattr(recurrence, "SessionLocal", lambda: nullcontext(db))
+    monkeypatch.setattr(recurrence, "_due", lambda *_: due)
+    monkeypatch.setattr(
+        recurrence, "_materialize_locked", lambda *_: (state.created, [])
+    )
+    monkeypatch.setattr(recurrence, "_caught_up", set())
+    return state
+
+
+def test_catch_up_sends_reads_to_the_primary_only_after_creating(offline_catch_up):
+    idle, busy = uuid.uuid4(), uuid.uuid4()
+
+    recurrence.catch_up(idle)
+    offline_catch_up.created = 2
+    recurrence.catch_up(busy)
+
+    assert busy in offline_catch_up.writers
+    assert idle not in offline_catch_up.writers
+    assert recurrence._caught_up == {idle, busy}
+
+
+def test_caught_up_users_are_capped(offline_catch_up, monkeypatch):
+    monkeypatch.setattr(recurrence, "CAUGHT_UP_MAX", 2)
+    first, second, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    recurrence.catch_up(first)
+    recurrence.catch_up(second)
+    recurrence.catch_up(third)
+
+    assert recurrence._caught_up == {third}
@@ -0,0 +1,177 @@
+"""Tests for refresh tokens: the selector/verifier helpers and rotation."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+try:
+    from fastapi import HTTPException
+    from sqlalchemy.sql import operators
+
+    from app import schemas
+    from app.auth_router import refresh
+    from app.config import settings
+    from app.models import Session as SessionModel
+    from app.security import (
+        new_refresh_token,
+        split_refresh_token,
+        verify_refresh_verifier,
+    )
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_new_refresh_token_round_trip():
+    raw, selector, hashed, _ = new_refresh_token()
+
+    assert split_refresh_token(raw)[0] == selector
+    _, verifier = split_refresh_token(raw)
+    assert verify_refresh_verifier(verifier, hashed)
+    assert not verify_refresh_verifier(verifier + "x", hashed)
+
+
+def test_selectors_are_unique():
+    assert new_refresh_token()[1] != new_refresh_token()[1]
+
+
+@pytest.mark.parametrize("raw", ["", "no-dot", ".verifier", "selector."])
+def test_split_rejects_malformed(raw):
+    assert split_refresh_token(raw) is None
+
+
+class FakeQuery:
+    """Evaluates ``column == value`` and ``column IS NULL`` filters in memory."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        def matches(row, criterion):
+            value = getattr(row, criterion.left.key)
+            if criterion.operator is operators.is_:
+                return value is None
+            return value == criterion.right.value
+
+        return FakeQuery(
+            [row for row in self.rows if all(matches(row, c) for c in criteria)]
+        )
+
+    def with_for_update(self):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def update(self, values, synchronize_session):
+        for row in self.rows:
+            for column, value in values.items():
+                setattr(row, column.key, value)
+        return len(self.rows)
+
+
+class FakeDb:
+    """Just enough of a Session for the refresh endpoint."""
+
+    def __init__(self):
+        self.sessions = []
+        self.commits = 0
+
+    def query(self, model):
+        assert model is SessionModel
+        return FakeQuery(self.sessions)
+
+    def add(self, row):
+        self.sessions.append(row)
+
+    def flush(self):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+
+def login(db, user_id, expires_in=timedelta(days=1)):
+    raw, selector, hashed, _ = new_refresh_token()
+    db.add(
+        SessionModel(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            refresh_token_selector=selector,
+            refresh_token_hash=hashed,
+            expires_at=datetime.now(timezone.utc) + expires_in,
+        )
+    )
+    return raw, db.sessions[-1]
+
+
+def call_refresh(db, raw):
+    return refresh(schemas.RefreshRequest(refresh_token=raw), db)
+
+
+@pytest.fixture
+def refresh_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "use_refresh_tokens", True)
+
+
+def test_refresh_is_404_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "use_refresh_tokens", False)
+    with pytest.raises(HTTPException) as exc_info:
+        call_refresh(FakeDb(), "selector.verifier")
+    assert exc_info.value.status_code == 404
+
+
+def test_refresh_rotates_the_session(refresh_enabled):
+    db, user_id = FakeDb(), uuid.uuid4()
+    raw, old = login(db, user_id)
+
+    response = call_refresh(db, raw)
+
+    new = db.sessions[-1]
+    assert response.refresh_token != raw and response.access_token
+    assert split_refresh_token(response.refresh_token)[0] == new.refresh_token_selector
+    assert old.revoked_at is not None and old.replaced_by_id == new.id
+    assert new.user_id == user_id and new.revoked_at is None
+    # The new token works in turn
+    call_refresh(db, response.refresh_token)
+    assert new.replaced_by_id == db.sessions[-1].id
+
+
+def test_replayed_token_revokes_the_whole_family(refresh_enabled):
+    db, user_id = FakeDb(), uuid.uuid4()
+    raw, _ = login(db, user_id)
+    _, other_device = login(db, user_id)
+    _, someone_else = login(db, uuid.uuid4())
+    call_refresh(db, raw)
+    rotated = db.sessions[-1]
+
+    with pytest.raises(HTTPException) as exc_info:
+        call_refresh(db, raw)
+
+    assert exc_info.value.status_code == 401
+    assert rotated.revoked_at is not None and other_device.revoked_at is not None
+    assert someone_else.revoked_at is None
+
+
+@pytest.mark.parametrize("case", ["expired", "wrong verifier", "unknown", "revoked"])
+def test_invalid_tokens_are_rejected_without_rotation(refresh_enabled, case):
+    db = FakeDb()
+    raw, session = login(
+        db, uuid.uuid4(), timedelta(seconds=-1 if case == "expired" else 60)
+    )
+    if case == "wrong verifier":
+        raw += "x"
+    elif case == "unknown":
+        raw = "unknown." + raw.split(".")[1]
+    elif case == "revoked":  # logged out, not rotated: no family revocation
+        session.revoked_at = datetime.now(timezone.utc)
+    _, bystander = login(db, session.user_id)
+
+    with pytest.raises(HTTPException) as exc_info:
+        call_refresh(db, raw)
+
+    assert exc_info.value.status_code == 401
+    assert len(db.sessions) == 2 and session.replaced_by_id is None
+    assert bystander.revoked_at is None
@@ -0,0 +1,125 @@
+"""Tests for read-replica routing."""
+
+import uuid
+
+import pytest
+
+try:
+    from fastapi import FastAPI, Response
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from starlette.requests import Request
+
+    from app import replicas as replicas_module
+    from app.replicas import ReadYourWritesMiddleware, RecentWriters, ReplicaPool
+    from app.security import create_access_token
+except ImportError:  # pragma: no cover
+    pytest.skip("FastAPI not available in test environment", allow_module_level=True)
+
+
+def _engine():
+    return create_engine("sqlite://", future=True)
+
+
+def _broken_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path}/missing/dir/db.sqlite", future=True)
+
+
+def _request(user_id=None) -> Request:
+    headers = []
+    if user_id is not None:
+        token, _ = create_access_token(str(user_id))
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_round_robin_over_healthy_replicas():
+    a, b = _engine(), _engine()
+    pool = ReplicaPool([a, b])
+
+    assert [pool.choose() for _ in range(4)] == [a, b, a, b]
+
+    pool.mark_failed(a)
+    assert [pool.choose() for _ in range(2)] == [b, b]
+
+    pool.mark_failed(b)
+    assert pool.choose() is None
+
+
+def test_health_check_restores_and_removes_replicas(tmp_path):
+    good, bad = _engine(), _broken_engine(tmp_path)
+    pool = ReplicaPool([good, bad])
+    pool.mark_failed(good)
+
+    pool.check_health()
+
+    assert pool.healthy == [good]
+
+
+def test_get_read_db_uses_replica_unless_user_wrote(monkeypatch):
+    replica, primary = _engine(), _engine()
+    now = [100.0]
+    writers = RecentWriters(clock=lambda: now[0])
+    monkeypatch.setattr(replicas_module, "replicas", ReplicaPool([replica]))
+    monkeypatch.setattr(replicas_module, "SessionLocal", sessionmaker(bind=primary))
+    monkeypatch.setattr(replicas_module, "recent_writers", writers)
+
+    def session_bind(request):
+        dependency = replicas_module.get_read_db(request)
+        db = next(dependency)
+        dependency.close()
+        return db.get_bind()
+
+    writer, other = uuid.uuid4(), uuid.uuid4()
+    writers.mark(writer, 5)
+    assert session_bind(_request()) is replica
+    assert session_bind(_request(other)) is replica
+    assert session_bind(_request(writer)) is primary
+    now[0] = 105.0
+    assert session_bind(_request(writer)) is replica
+
+
+def test_get_read_db_falls_back_when_replica_is_down(monkeypatch, tmp_path):
+    broken, primary = _broken_engine(tmp_path), _engine()
+    pool = ReplicaPool([broken])
+    monkeypatch.setattr(replicas_module, "replicas", pool)
+    monkeypatch.setattr(replicas_module, "SessionLocal", sessionmaker(bind=primary))
+
+    dependency = replicas_module.get_read_db(_request())
+    assert next(dependency).get_bind() is primary
+    assert pool.healthy == []
+
+
+def test_middleware_marks_users_after_successful_writes():
+    app = FastAPI()
+    writers = RecentWriters(clock=lambda: 100.0)
+
+    @app.get("/item")
+    def read_item():
+        return {}
+
+    @app.post("/item", status_code=201)
+    def create_item():
+        return {}
+
+    @app.delete("/item")
+    def delete_item():
+        return Response(status_code=404)
+
+    app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=5, writers=writers)
+    client = TestClient(app)
+
+    def headers(user_id):
+        token, _ = create_access_token(str(user_id))
+        return {"Authorization": f"Bearer {token}"}
+
+    reader, failed, writer = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    client.get("/item", headers=headers(reader))
+    client.delete("/item", headers=headers(failed))
+    client.post("/item", headers=headers(writer))
+    client.post("/item", headers={"Authorization": "Bearer not-a-token"})
+
+    assert writer in writers
+    assert reader not in writers and failed not in writers
+    assert writers._until == {writer: 105.0}
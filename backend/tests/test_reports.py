@@ -0,0 +1,81 @@
+"""Tests for annual report files and job cancellation."""
+
+import os
+import time
+import uuid
+from collections import Counter
+
+import pytest
+
+try:
+    from pydantic import ValidationError
+
+    from app import jobs, reports, schemas
+    from app.config import settings
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_reports_run_as_jobs():
+    assert jobs.HANDLERS[reports.KIND] is reports.build_report
+    assert "app.reports" in jobs.HANDLER_MODULES
+
+
+def test_report_year_validation():
+    assert schemas.ReportCreate(year=2024).year == 2024
+    with pytest.raises(ValidationError):
+        schemas.ReportCreate(year=9999)
+    with pytest.raises(ValidationError):
+        schemas.ReportCreate(year=1999)
+
+
+def test_total_rows_are_sorted_with_counts():
+    totals = Counter({("Rent", "expense"): 120000, ("Food", "expense"): 4550})
+    counts = Counter({("Rent", "expense"): 1, ("Food", "expense"): 3})
+    rows = list(reports._total_rows("month_total", "2024-03", totals, counts))
+    assert rows == [
+        ("month_total", "2024-03", "", "Food", "expense", "", 4550, 3),
+        ("month_total", "2024-03", "", "Rent", "expense", "", 120000, 1),
+    ]
+    assert all(len(row) == len(reports.COLUMNS) for row in rows)
+
+
+def test_month_start_rolls_over_the_year():
+    assert reports._month_start(2024, 13).isoformat() == "2025-01-01T00:00:00+00:00"
+
+
+def test_purge_files_removes_old_reports(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "report_dir", str(tmp_path))
+    user_dir = tmp_path / str(uuid.uuid4())
+    user_dir.mkdir()
+    old, partial, new = (user_dir / name for name in ("a.csv", "b.csv.part", "c.csv"))
+    for path in (old, partial, new):
+        path.write_text("row\n")
+    week_ago = time.time() - 8 * 86400
+    for path in (old, partial):
+        os.utime(path, (week_ago, week_ago))
+
+    assert reports.purge_files(7) == 2
+    assert [path.name for path in user_dir.iterdir()] == ["c.csv"]
+
+
+def test_cancelled_job_is_left_alone():
+    def handler(job):
+        raise jobs.JobCancelled("cancelled")
+
+    jobs.register("test-cancelled", handler)
+    try:
+        # The cancel already finished the job, so the database is not touched
+        status = jobs.run_job(None, uuid.uuid4(), uuid.uuid4(), "test-cancelled", {})
+        assert status == "cancelled"
+    finally:
+        del jobs.HANDLERS["test-cancelled"]
+
+
+def test_worker_pool_starts_lazily():
+    pool = jobs.WorkerPool(3)
+    assert pool.free_slots() == 3
+    pool.wait()  # nothing running
+    pool.shutdown()
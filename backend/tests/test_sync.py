@@ -0,0 +1,37 @@
+"""Tests for delta sync cursors and push validation."""
+
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+try:
+    from pydantic import ValidationError
+
+    from app import schemas
+    from app.sync import decode_cursor, encode_cursor
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def test_cursor_round_trip():
+    issued = datetime(2024, 12, 8, 12, 30, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(123456, issued)) == (123456, issued)
+
+
+@pytest.mark.parametrize("cursor", ["", "123", "abc.def", "1.2.3"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_upsert_requires_data():
+    with pytest.raises(ValidationError):
+        schemas.SyncTransactionChange(id=uuid.uuid4())
+
+
+def test_delete_needs_only_the_id():
+    change = schemas.SyncCategoryChange(id=uuid.uuid4(), deleted=True)
+    assert change.data is None
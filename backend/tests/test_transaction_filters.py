@@ -0,0 +1,68 @@
+"""Tests for the SQL built by the transaction list filters (no database)."""
+
+import pytest
+
+try:
+    from fastapi import HTTPException
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.orm import Query
+
+    from app import models
+    from app.transactions_router import (
+        _apply_metadata_filters,
+        _apply_search,
+        _metadata_filter,
+    )
+except ImportError:  # pragma: no cover
+    pytest.skip(
+        "App dependencies not available in test environment", allow_module_level=True
+    )
+
+
+def compiled(clause):
+    statement = clause.statement if isinstance(clause, Query) else clause
+    return statement.compile(dialect=postgresql.dialect())
+
+
+def test_search_combines_full_text_substring_and_trigram_matches():
+    query, rank = _apply_search(Query(models.Transaction), "coffee")
+    sql = compiled(query)
+    where = str(sql).split("WHERE", 1)[1].replace("%%", "%")
+
+    assert "transactions.search_vector @@ websearch_to_tsquery(" in where
+    assert "transactions.description ILIKE" in where
+    assert "<% transactions.description" in where  # word similarity, for typos
+    assert where.count(" OR ") == 2
+    assert sorted(sql.params.values()) == ["%coffee%", "coffee", "coffee", "english"]
+
+    rank_sql = str(compiled(rank))
+    assert "ts_rank_cd(transactions.search_vector, websearch_to_tsquery(" in rank_sql
+    assert "word_similarity(" in rank_sql
+
+
+def test_search_escapes_like_wildcards():
+    query, _ = _apply_search(Query(models.Transaction), "50%_off\\")
+    sql = compiled(query)
+
+    assert "ESCAPE" in str(sql)
+    assert "%50\\%\\_off\\\\%" in sql.params.values()
+    # The full-text and trigram matches get the term as typed
+    assert list(sql.params.values()).count("50%_off\\") == 2
+
+
+@pytest.mark.parametrize("value", ["{not json", "[1, 2]", '"cash"', "42", "null"])
+def test_metadata_filter_rejects_anything_but_an_object(value):
+    with pytest.raises(HTTPException) as exc_info:
+        _metadata_filter(value)
+    assert exc_info.value.status_code == 400
+
+
+def test_metadata_filters_use_containment_and_key_existence():
+    assert _metadata_filter(None) is None and _metadata_filter("") is None
+    query = _apply_metadata_filters(
+        Query(models.Transaction), '{"payment_method": "cash"}', ["store", "note"]
+    )
+    where = str(compiled(query)).split("WHERE", 1)[1]
+
+    assert "transactions.metadata @>" in where
+    assert "transactions.metadata ?& ARRAY[" in where
@@ -0,0 +1,5 @@
+#!/bin/bash
+# Runs once when the primary's data directory is initialized: allow the
+# db-replica service (docker-compose.replica.yml) to stream WAL.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"